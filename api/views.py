@@ -1,16 +1,22 @@
 import os
 import logging
-from fastapi import APIRouter, Form
-from fastapi.responses import JSONResponse
-from process import process_pdfs
+import anyio
+from fastapi import APIRouter, Form, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import jobs
+import uploads
+from parquet_writer import PARQUET_DIR_NAME
 
 router = APIRouter()
 
 
-@router.post("/process/", summary="Processar PDFs e salvar CSV", tags=["PDF Processing"])
+@router.post("/process/", summary="Processar PDFs e salvar CSV", tags=["PDF Processing"], status_code=202)
 async def process_pdf_api(
         pdf_path: str = Form(...),
-        output_dir: str = Form(...)
+        output_dir: str = Form(...),
+        incremental: bool = Form(False),
+        parquet: bool = Form(False)
 ):
     """
     **Processamento de PDF**
@@ -24,16 +30,24 @@ async def process_pdf_api(
 
     - `pdf_path`: Caminho do diretório contendo os arquivos PDF. *(Obrigatório)*
     - `output_dir`: Caminho do diretório onde o CSV será salvo. *(Obrigatório)*
+    - `incremental`: Processa apenas os PDFs novos ou alterados desde o último processamento e atualiza
+      no CSV existente somente as linhas desses empreendimentos. *(Opcional, padrão `false`)*
+    - `parquet`: Grava também um conjunto Parquet tipado (valor decimal, disponibilidade categórica, arquivo e
+      página de origem), particionado por empreendimento e data. *(Opcional, padrão `false`)*
 
     **Saída:**
 
-    - `message`: Confirmação de sucesso.
-    - `output_csv`: Caminho do CSV gerado.
+    - `message`: Confirmação de que o job foi criado.
+    - `job_id`: Identificador do job.
+    - `status_url`: Rota para acompanhar o progresso (`GET /api/jobs/{job_id}`).
+    - `output_csv`: Caminho onde o CSV será gerado.
+    - `output_parquet`: Pasta do conjunto Parquet (`null` se `parquet` for `false`).
 
     **Observações:**
 
     - O diretório de entrada (`pdf_path`) **precisa existir** e conter arquivos PDF.
     - O diretório de saída (`output_dir`) **precisa ser acessível**.
+    - O processamento é **assíncrono**: a resposta retorna imediatamente e o lote roda em segundo plano.
 
     """
 
@@ -51,13 +65,109 @@ async def process_pdf_api(
             status_code=400,
         )
 
-    # Definir caminho do CSV final
+    # Definir caminho do CSV final (e da pasta do conjunto Parquet, se solicitado)
     output_csv_path = os.path.join(output_dir, "resultado_imoveis.csv")
+    output_parquet = os.path.join(output_dir, PARQUET_DIR_NAME) if parquet else None
 
-    # Processar todos os PDFs dentro do diretório
-    process_pdfs(pdf_path, output_csv_path)
+    # Agendar o processamento de todos os PDFs do diretório fora do event loop
+    job_id = jobs.submit_job(pdf_path, output_csv_path, incremental=incremental, parquet_dir=output_parquet)
 
     return JSONResponse(
-        content={"message": "Processamento concluído!", "output_csv": output_csv_path},
-        status_code=200,
+        content={
+            "message": "Processamento iniciado!",
+            "job_id": job_id,
+            "status_url": f"/api/jobs/{job_id}",
+            "output_csv": output_csv_path,
+            "output_parquet": output_parquet,
+        },
+        status_code=202,
     )
+
+
+@router.post(
+    "/upload/",
+    summary="Enviar PDFs e receber os dados extraídos em NDJSON",
+    tags=["PDF Processing"],
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {"files": {"type": "array", "items": {"type": "string", "format": "binary"}}},
+                        "required": ["files"],
+                    }
+                }
+            },
+        }
+    },
+)
+async def upload_pdfs_api(request: Request):
+    """
+    **Upload e Processamento de PDFs**
+
+    - Recebe os PDFs diretamente no corpo da requisição (`multipart/form-data`, um ou vários arquivos).
+    - Cada arquivo é gravado em disco em blocos, em um diretório exclusivo da requisição, e começa a
+      ser processado **assim que termina de chegar**, enquanto os próximos ainda estão sendo enviados.
+
+    **Saída (`application/x-ndjson`):**
+
+    - Uma linha JSON por arquivo, na ordem de envio, com `arquivo`, `status` (`concluido`, `sem_dados`
+      ou `erro`), `linhas` (unidades no mesmo formato do CSV), `tempo_extracao`, `tempo_ia`,
+      `prompt_tokens`, `completion_tokens` e `erro`.
+    - Uma linha final com `status: "fim"` e os totais de arquivos e linhas.
+
+    """
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("multipart/form-data"):
+        return JSONResponse(
+            content={"error": "Envie os arquivos PDF como multipart/form-data."},
+            status_code=400,
+        )
+
+    batch = uploads.UploadBatch()
+    try:
+        spooler = uploads.MultipartSpooler(content_type, batch.directory, batch.add)
+        async for chunk in request.stream():
+            await run_in_threadpool(spooler.write, chunk)
+        await run_in_threadpool(spooler.finalize)
+    except Exception as e:
+        logging.exception("Erro ao receber upload de PDFs")
+        batch.cancel()
+        return JSONResponse(content={"error": f"Upload inválido: {e}"}, status_code=400)
+
+    batch.close()
+    if not spooler.files:
+        return JSONResponse(content={"error": "Nenhum arquivo PDF foi enviado."}, status_code=400)
+
+    async def stream_results():
+        # Se o cliente desconectar, o Starlette cancela este gerador (a espera pela próxima linha é
+        # cancelável) e o upload é interrompido sem aguardar o próximo arquivo ficar pronto
+        lines = batch.results()
+        finished = False
+        try:
+            while (line := await anyio.to_thread.run_sync(next, lines, None, cancellable=True)) is not None:
+                yield line
+            finished = True
+        finally:
+            if not finished:
+                logging.info(f"Cliente desconectado; cancelando o upload {batch.directory}")
+                batch.cancel()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+@router.get("/jobs/{job_id}", summary="Consultar progresso de um processamento", tags=["PDF Processing"])
+async def get_job_api(job_id: str):
+    """
+    **Progresso do Processamento**
+
+    Retorna o status do job (`pendente`, `processando`, `concluido`, `sem_dados`, `erro` ou `interrompido`),
+    o status e os tempos de extração/IA de cada arquivo e, ao final, o caminho do CSV gerado (`output_csv`).
+    """
+    job = jobs.get_job(job_id)
+    if job is None:
+        return JSONResponse(content={"error": "Job não encontrado."}, status_code=404)
+
+    return JSONResponse(content=job, status_code=200)
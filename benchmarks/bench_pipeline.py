@@ -0,0 +1,127 @@
+"""
+Benchmark offline do pipeline completo (`process.process_pdfs`).
+
+Gera um corpus sintético (texto, escaneado e misto), sobe um servidor local no lugar da
+API da OpenAI e mede, por estágio, tempo de parede, tempo de CPU (incluindo `pdftoppm` e
+`tesseract`), além do pico de memória (RSS), dos tokens por documento e do tempo até a primeira
+unidade lida do stream da IA.
+
+Uso:
+    python -m benchmarks.bench_pipeline --text-docs 4 --scanned-docs 2 --mixed-docs 2 --pages 10 --latency 1.5
+
+Os estágios vêm dos spans do módulo `metrics` (os mesmos expostos em `/metrics`); os tokens
+por documento são os informados pela API em cada chamada à IA.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+
+from benchmarks.mock_llm import MockLLMServer
+from benchmarks.synthetic_pdfs import generate_corpus
+
+
+def _children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def document_tokens(spans):
+    """
+    Soma os tokens dos spans `llm` e `classificacao_ia` de um documento e informa o menor tempo
+    até a primeira unidade lida do stream da IA (`None` se o documento não passou pela IA).
+    """
+    import metrics
+
+    tokens = metrics.totals(spans)
+    first_rows = [entry["primeira_linha"] for entry in spans if entry.get("primeira_linha") is not None]
+    tokens["primeira_linha"] = min(first_rows) if first_rows else None
+    return tokens
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline do pipeline de PDFs")
+    parser.add_argument("--text-docs", type=int, default=2)
+    parser.add_argument("--scanned-docs", type=int, default=2)
+    parser.add_argument("--mixed-docs", type=int, default=2)
+    parser.add_argument("--pages", type=int, default=5, help="páginas por documento")
+    parser.add_argument("--latency", type=float, default=1.0, help="latência simulada da IA por requisição (s)")
+    parser.add_argument("--latency-per-token", type=float, default=0.0, help="latência adicional por token gerado (s)")
+    parser.add_argument("--max-completion-tokens", type=int, default=None,
+                        help="corta as respostas da IA nesse limite (testa as continuações)")
+    parser.add_argument("--cpu-workers", type=int, default=None)
+    parser.add_argument("--llm-workers", type=int, default=None)
+    parser.add_argument("--json", dest="json_output", help="salva o relatório em JSON neste caminho")
+    args = parser.parse_args(argv)
+
+    server = MockLLMServer(latency=args.latency, latency_per_token=args.latency_per_token,
+                           max_completion_tokens=args.max_completion_tokens).start()
+
+    # Configuração precisa estar no ambiente antes de importar o pipeline
+    os.environ.update({
+        "OPENAI_API_KEY": "mock",
+        "OPENAI_BASE_URL": server.base_url,
+        "OPENAI_API_BASE": server.base_url,
+        "PDF_CACHE_MAX_MB": "0",
+    })
+
+    with tempfile.TemporaryDirectory(prefix="bench_pdfs_") as workdir:
+        corpus_dir = os.path.join(workdir, "corpus")
+        paths = generate_corpus(corpus_dir, args.text_docs, args.scanned_docs, args.mixed_docs, pages=args.pages)
+
+        import metrics
+        import process
+
+        documents = {}
+
+        def on_progress(file, status, info):
+            documents[file] = document_tokens(info["spans"])
+
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        process.process_pdfs(
+            corpus_dir, os.path.join(workdir, "resultado.csv"),
+            cpu_workers=args.cpu_workers, llm_workers=args.llm_workers, on_progress=on_progress,
+        )
+        total_wall, total_cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+
+        stages = metrics.snapshot()
+
+    server.stop()
+
+    report = {
+        "documentos": len(paths),
+        "paginas_por_documento": args.pages,
+        "parede_total": total_wall,
+        "cpu_processo_principal": total_cpu,
+        "cpu_subprocessos": _children_cpu(),
+        "pico_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "pico_rss_subprocessos_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+        "estagios": stages,
+        "tokens_por_documento": documents,
+        "servidor_llm": server.stats,
+    }
+
+    print(f"\nDocumentos: {report['documentos']} × {args.pages} página(s)")
+    print(f"Tempo total: {total_wall:.2f}s | pico RSS: {report['pico_rss_mb']:.0f} MB "
+          f"(subprocessos: {report['pico_rss_subprocessos_mb']:.0f} MB)\n")
+    print(f"{'estágio':<18}{'chamadas':>10}{'parede (s)':>14}{'cpu (s)':>12}")
+    for name, stage in sorted(stages.items(), key=lambda item: -item[1]["duracao"]):
+        print(f"{name:<18}{stage['spans']:>10}{stage['duracao']:>14.2f}{stage['cpu']:>12.2f}")
+    print(f"\n{'documento':<28}{'prompt':>10}{'resposta':>10}{'1ª linha (s)':>14}")
+    for name, tokens in sorted(documents.items(), key=lambda item: str(item[0])):
+        first_row = f"{tokens['primeira_linha']:.2f}" if tokens["primeira_linha"] is not None else "-"
+        print(f"{str(name):<28}{tokens['prompt_tokens']:>10}{tokens['completion_tokens']:>10}{first_row:>14}")
+    print(f"\nServidor LLM: {server.stats}")
+
+    if args.json_output:
+        with open(args.json_output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+
+    return report
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
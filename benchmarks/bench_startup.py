@@ -0,0 +1,118 @@
+"""
+Benchmark de inicialização: tempo de importação e de primeira execução em processos novos.
+
+Cada cenário roda em um interpretador limpo (como um worker recém-criado pelo autoscaling ou
+pelo pool de processos) e informa o tempo total do processo, o tempo gasto nas importações e
+quais dependências pesadas (OpenCV, LangChain, SDK da OpenAI, pytesseract, ...) foram carregadas.
+Com `--pool`, mede também a subida de um pool de processos com `spawn` até o primeiro resultado.
+
+Uso:
+    python -m benchmarks.bench_startup --repeat 5
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import time
+import statistics
+import subprocess
+
+from benchmarks.synthetic_pdfs import write_pdf
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dependências cujo carregamento domina a inicialização
+HEAVY_MODULES = [
+    "cv2", "numpy", "pandas", "pdf2image", "pytesseract",
+    "openai", "tiktoken", "langchain", "langchain_core", "langchain_openai", "langchain_community",
+]
+
+# Cenário: (importações, execução); `{pdf_texto}` é substituído pelo caminho de um PDF sintético
+SCENARIOS = {
+    "api": ("import main", ""),
+    "process": ("import process", ""),
+    "classificacao": ("import process", "process.classify_pdf({pdf_texto!r})"),
+    "tabela": ("import process", "process.extract_pdf({pdf_texto!r})"),
+    "ocr": ("import workers.layout, workers.ocr_pool, workers.preprocessing", ""),
+    "ia": ("import llm_client", "llm_client.get_chat_model(); llm_client.get_openai_client(); llm_client.retryable_errors()"),
+}
+
+_SNIPPET = """
+import sys, json, time
+start = time.perf_counter()
+{imports}
+imported = time.perf_counter()
+{run}
+done = time.perf_counter()
+print(json.dumps({{
+    "importacao": imported - start,
+    "execucao": done - imported,
+    "modulos": [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+_POOL_SNIPPET = """
+import sys, json, time, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+start = time.perf_counter()
+import process
+with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+    pool.submit(process.classify_pdf, {pdf_texto!r}).result()
+    first = time.perf_counter()
+print(json.dumps({{"importacao": 0.0, "execucao": first - start, "modulos": []}}))
+"""
+
+
+def _run(snippet, env):
+    """ Executa o trecho em um interpretador novo; retorna `(tempo_total, resultado)`. """
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-c", snippet], cwd=ROOT_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    elapsed = time.perf_counter() - start
+    return elapsed, json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de inicialização (importações) do pipeline")
+    parser.add_argument("--repeat", type=int, default=3, help="execuções por cenário (usa a mediana)")
+    parser.add_argument("--pool", action="store_true", help="mede a subida de um pool de processos com spawn")
+    parser.add_argument("--json", dest="json_output", help="salva o relatório em JSON neste caminho")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ, OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "mock"), PDF_CACHE_MAX_MB="0")
+    report = {}
+
+    with tempfile.TemporaryDirectory(prefix="bench_startup_") as workdir:
+        values = {"pdf_texto": write_pdf(os.path.join(workdir, "texto.pdf"), "texto", 2, seed=1)}
+        snippets = {
+            name: _SNIPPET.format(imports=imports, run=run.format(**values), heavy=HEAVY_MODULES)
+            for name, (imports, run) in SCENARIOS.items()
+        }
+        if args.pool:
+            snippets["pool_spawn"] = _POOL_SNIPPET.format(**values)
+
+        for name, snippet in snippets.items():
+            runs = [_run(snippet, env) for _ in range(args.repeat)]
+            report[name] = {
+                "processo": statistics.median(total for total, _ in runs),
+                "importacao": statistics.median(result["importacao"] for _, result in runs),
+                "execucao": statistics.median(result["execucao"] for _, result in runs),
+                "modulos": runs[-1][1]["modulos"],
+            }
+
+    print(f"\n{'cenário':<16}{'processo (s)':>14}{'importação (s)':>16}{'execução (s)':>14}  dependências pesadas")
+    for name, result in report.items():
+        print(f"{name:<16}{result['processo']:>14.2f}{result['importacao']:>16.2f}{result['execucao']:>14.2f}"
+              f"  {', '.join(result['modulos']) or '-'}")
+
+    if args.json_output:
+        with open(args.json_output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+
+    return report
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,190 @@
+"""
+Servidor local que imita a API de chat completions da OpenAI, para benchmarks offline.
+
+As respostas são montadas a partir do próprio prompt: linhas com unidade, situação e valor
+(em tabelas `;`-separadas ou texto de OCR) viram o array JSON de unidades esperado pelos
+workers, e prompts de classificação recebem `MIX`. A latência é configurável. Requisições com
+`tools` (saída estruturada) recebem uma chamada da função com as linhas compactas
+(`{"linhas": [[unidade, disponibilidade, valor], ...]}`).
+
+Requisições com `stream: true` recebem a resposta em eventos SSE, com a latência por token
+distribuída entre os pedaços. Com `max_completion_tokens`, as respostas são cortadas nesse
+limite (`finish_reason: "length"`); nas continuações (conversa com a resposta parcial ou com a
+lista dos elementos já recebidos), as unidades já enviadas não são repetidas.
+"""
+import re
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+UNIT_PATTERN = re.compile(
+    r"(?P<unidade>\b\d{2,5}[A-Z]?\b)\s*[;|]?\s*"
+    r"(?P<situacao>Dispon[íi]vel|Reservado|Permuta|Vendido)\s*[;|]?\s*"
+    r"(?P<valor>(?:R\$\s*)?[\d.]+,\d{2}|-)?",
+    re.IGNORECASE,
+)
+
+DOCUMENT_PATTERN = re.compile(r"^\s*(\d+): \{", re.MULTILINE)
+
+SENT_UNIT_PATTERN = re.compile(r'(?:"unidade":\s*|\[)"([^"]+)"')
+
+STREAM_PIECE_CHARS = 16  # Caracteres por evento do stream (~4 tokens)
+
+
+def _estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def build_completion(prompt, sent=(), compact=False):
+    """
+    Conteúdo da resposta simulada para o prompt recebido (sem as unidades em `sent`); com `compact`,
+    os argumentos da função de extração (linhas `[unidade, disponibilidade, valor]`).
+    """
+    if "TABELA`, `IMAGEM`, `MIX`" in prompt:
+        # Classificação em lote: um tipo para cada documento (`número: {...}`) listado no prompt
+        documents = DOCUMENT_PATTERN.findall(prompt)
+        return json.dumps({number: "MIX" for number in documents}) if documents else "MIX"
+
+    units = []
+    for match in UNIT_PATTERN.finditer(prompt):
+        if match.group("unidade") in sent:
+            continue
+        value = (match.group("valor") or "").replace("R$", "").strip()
+        units.append({
+            "nome_empreendimento": "Benchmark",
+            "unidade": match.group("unidade"),
+            "disponibilidade": match.group("situacao").capitalize(),
+            "valor": value if value and value != "-" else "Indisponível",
+        })
+    if compact:
+        rows = [[unit["unidade"], unit["disponibilidade"], unit["valor"]] for unit in units]
+        return json.dumps({"linhas": rows}, ensure_ascii=False)
+    return json.dumps(units, ensure_ascii=False)
+
+
+class MockLLMServer:
+    """ Servidor HTTP em thread; `stats` acumula requisições e tokens simulados. """
+
+    def __init__(self, latency=1.0, latency_per_token=0.0, host="127.0.0.1", port=0, max_completion_tokens=None):
+        self.latency = latency
+        self.latency_per_token = latency_per_token
+        self.max_completion_tokens = max_completion_tokens
+        self.stats = {"requisicoes": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                messages = body.get("messages", [])
+                # Prompt original: até a primeira mensagem do usuário; o restante é a continuação
+                # (resposta parcial ou lista dos elementos já recebidos)
+                first_user = next((index for index, message in enumerate(messages) if message.get("role") == "user"),
+                                  len(messages))
+                prompt = "\n".join(str(message.get("content", "")) for message in messages[:first_user + 1])
+                sent = {unit for message in messages[first_user + 1:]
+                        for unit in SENT_UNIT_PATTERN.findall(str(message.get("content", "")))}
+                tools = body.get("tools") or []
+                content = build_completion(prompt, sent, compact=bool(tools))
+
+                finish_reason = "stop"
+                if server.max_completion_tokens and _estimate_tokens(content) > server.max_completion_tokens:
+                    content, finish_reason = content[:server.max_completion_tokens * 4], "length"
+
+                prompt_tokens, completion_tokens = _estimate_tokens(prompt), _estimate_tokens(content)
+                with server._lock:
+                    server.stats["requisicoes"] += 1
+                    server.stats["prompt_tokens"] += prompt_tokens
+                    server.stats["completion_tokens"] += completion_tokens
+                usage = {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                }
+
+                # Com `tools`, a resposta é uma chamada da (primeira) função, com `content` nos argumentos
+                tool = tools[0]["function"]["name"] if tools else None
+                if tool and finish_reason == "stop":
+                    finish_reason = "tool_calls"
+
+                time.sleep(server.latency)
+                if body.get("stream"):
+                    self._stream(body, content, finish_reason, usage, tool)
+                    return
+                time.sleep(completion_tokens * server.latency_per_token)
+
+                message = {"role": "assistant", "content": content}
+                if tool:
+                    message = {"role": "assistant", "content": None, "tool_calls": [{
+                        "id": "call_mock", "type": "function", "function": {"name": tool, "arguments": content},
+                    }]}
+
+                payload = json.dumps({
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "mock"),
+                    "choices": [{
+                        "index": 0,
+                        "message": message,
+                        "finish_reason": finish_reason,
+                    }],
+                    "usage": usage,
+                }).encode("utf-8")
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, body, content, finish_reason, usage, tool=None):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+
+                def event(choices, **extra):
+                    chunk = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                             "model": body.get("model", "mock"), "choices": choices, **extra}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+
+                pieces = [content[start:start + STREAM_PIECE_CHARS] for start in range(0, len(content), STREAM_PIECE_CHARS)]
+                for index, piece in enumerate(pieces):
+                    delta = {"content": piece}
+                    if tool:
+                        function = {"arguments": piece, **({"name": tool} if index == 0 else {})}
+                        delta = {"tool_calls": [{"index": 0, "function": function,
+                                                 **({"id": "call_mock", "type": "function"} if index == 0 else {})}]}
+                    if index == 0:
+                        delta["role"] = "assistant"
+                    event([{"index": 0, "delta": delta, "finish_reason": None}])
+                    time.sleep(_estimate_tokens(piece) * server.latency_per_token)
+                event([{"index": 0, "delta": {}, "finish_reason": finish_reason}])
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    event([], usage=usage)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
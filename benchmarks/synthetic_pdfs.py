@@ -0,0 +1,215 @@
+"""
+Gerador de PDFs sintéticos de tabelas de preços imobiliárias para benchmarks.
+
+Produz três tipos de documento, sem dependências além do Pillow:
+- `texto`: tabelas desenhadas com camada de texto real (caminho TABELA);
+- `escaneado`: as mesmas tabelas rasterizadas como imagem de página inteira (caminho IMAGEM);
+- `misto`: capa com imagem de fachada, páginas de texto e páginas escaneadas (caminho MIX).
+"""
+import io
+import os
+import random
+from PIL import Image, ImageDraw, ImageFont
+
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 em pontos
+ROWS_PER_PAGE = 30
+STATUSES = ["Disponível", "Reservado", "Permuta", "Vendido"]
+HEADER = ["Unidade", "Situação", "Valor (R$)"]
+COLUMN_X = [60, 220, 400]
+SCAN_DPI = 200
+
+
+def _format_brl(value):
+    return f"{value:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def generate_units(count, seed=0):
+    """ Linhas `[unidade, situação, valor]` determinísticas para o `seed` informado. """
+    rng = random.Random(seed)
+    units = []
+    for index in range(count):
+        floor, number = divmod(index, 8)
+        status = rng.choice(STATUSES)
+        value = "-" if status == "Vendido" else _format_brl(rng.randint(350_000, 1_500_000) + rng.randint(0, 99) / 100)
+        units.append([f"{floor + 1}{number + 1:02d}", status, value])
+    return units
+
+
+def _escape_pdf_text(text):
+    raw = text.encode("cp1252", "replace")
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _text_page_stream(title, rows):
+    """ Conteúdo de uma página com título, grade da tabela e texto selecionável. """
+    ops = [b"BT /F1 16 Tf 60 790 Td (" + _escape_pdf_text(title) + b") Tj ET"]
+    top = 750
+    row_height = 22
+    table = [HEADER] + rows
+    for index, row in enumerate(table):
+        y = top - index * row_height
+        for x, cell in zip(COLUMN_X, row):
+            ops.append(b"BT /F1 10 Tf %d %d Td (" % (x + 4, y - 15) + _escape_pdf_text(cell) + b") Tj ET")
+    bottom = top - len(table) * row_height
+    for index in range(len(table) + 1):
+        y = top - index * row_height
+        ops.append(b"%d %d m %d %d l S" % (COLUMN_X[0], y, 540, y))
+    for x in COLUMN_X + [540]:
+        ops.append(b"%d %d m %d %d l S" % (x, top, x, bottom))
+    return b"\n".join(ops)
+
+
+def _load_font(size):
+    for path in ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", "/Library/Fonts/Arial.ttf", "arial.ttf"):
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+def _scanned_page_image(title, rows, rng):
+    """ Renderiza a mesma página como uma digitalização (levemente inclinada e com ruído). """
+    scale = SCAN_DPI / 72
+    image = Image.new("L", (int(PAGE_WIDTH * scale), int(PAGE_HEIGHT * scale)), 255)
+    draw = ImageDraw.Draw(image)
+    title_font, cell_font = _load_font(int(16 * scale)), _load_font(int(10 * scale))
+
+    def point(x, y):
+        return x * scale, (PAGE_HEIGHT - y) * scale
+
+    draw.text(point(60, 806), title, fill=0, font=title_font)
+    top, row_height = 750, 22
+    table = [HEADER] + rows
+    for index, row in enumerate(table):
+        y = top - index * row_height
+        for x, cell in zip(COLUMN_X, row):
+            draw.text(point(x + 4, y - 4), cell, fill=0, font=cell_font)
+    bottom = top - len(table) * row_height
+    for index in range(len(table) + 1):
+        y = top - index * row_height
+        draw.line([point(COLUMN_X[0], y), point(540, y)], fill=0, width=2)
+    for x in COLUMN_X + [540]:
+        draw.line([point(x, top), point(x, bottom)], fill=0, width=2)
+
+    image = image.rotate(rng.uniform(-1.0, 1.0), fillcolor=255, resample=Image.BILINEAR)
+    noise = Image.effect_noise(image.size, 12)
+    return Image.blend(image, noise, 0.08)
+
+
+def _cover_image(rng):
+    """ "Fachada" do empreendimento: gradiente colorido sem texto. """
+    width, height = 1200, 900
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x, y = rng.randint(0, width), rng.randint(0, height)
+        color = tuple(rng.randint(0, 255) for _ in range(3))
+        draw.rectangle([x, y, x + rng.randint(40, 200), y + rng.randint(40, 300)], fill=color)
+    return image
+
+
+def _jpeg(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=80)
+    return buffer.getvalue()
+
+
+class _PdfWriter:
+    """ Escritor mínimo de PDF (texto com Helvetica/WinAnsi e imagens JPEG). """
+
+    def __init__(self):
+        self.objects = []
+        self.pages = []
+        self.font_id = self._add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        self.pages_id = self._reserve()
+
+    def _reserve(self):
+        self.objects.append(None)
+        return len(self.objects)
+
+    def _add(self, data):
+        self.objects.append(data)
+        return len(self.objects)
+
+    def _stream(self, content, extra=b""):
+        return self._add(b"<< /Length %d %s >>\nstream\n" % (len(content), extra) + content + b"\nendstream")
+
+    def add_page(self, content=b"", images=()):
+        """ `images`: lista de `(imagem_pil, x, y, largura, altura)` em pontos. """
+        xobjects = []
+        ops = []
+        for index, (image, x, y, width, height) in enumerate(images):
+            color_space = b"/DeviceGray" if image.mode == "L" else b"/DeviceRGB"
+            image_id = self._stream(
+                _jpeg(image),
+                b"/Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace %s /BitsPerComponent 8 "
+                b"/Filter /DCTDecode" % (image.width, image.height, color_space),
+            )
+            name = b"Im%d" % index
+            xobjects.append(b"/%s %d 0 R" % (name, image_id))
+            ops.append(b"q %d 0 0 %d %d %d cm /%s Do Q" % (width, height, x, y, name))
+        content_id = self._stream(b"\n".join(ops + [content]) + b"\n")  # pdfminer ignora o último operador sem espaço final
+        resources = b"<< /Font << /F1 %d 0 R >> /XObject << %s >> >>" % (self.font_id, b" ".join(xobjects))
+        page_id = self._add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Resources %s /Contents %d 0 R >>"
+            % (self.pages_id, PAGE_WIDTH, PAGE_HEIGHT, resources, content_id)
+        )
+        self.pages.append(page_id)
+
+    def save(self, path):
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self.pages)
+        self.objects[self.pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.pages))
+        catalog_id = self._add(b"<< /Type /Catalog /Pages %d 0 R >>" % self.pages_id)
+
+        output = io.BytesIO()
+        output.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, data in enumerate(self.objects, start=1):
+            offsets.append(output.tell())
+            output.write(b"%d 0 obj\n" % number + data + b"\nendobj\n")
+        xref = output.tell()
+        output.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(self.objects) + 1))
+        for offset in offsets:
+            output.write(b"%010d 00000 n \n" % offset)
+        output.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                     % (len(self.objects) + 1, catalog_id, xref))
+
+        with open(path, "wb") as file:
+            file.write(output.getvalue())
+
+
+def write_pdf(path, kind, pages, seed=0):
+    """ Gera um PDF sintético do tipo `texto`, `escaneado` ou `misto` com `pages` páginas. """
+    rng = random.Random(seed)
+    units = generate_units(pages * ROWS_PER_PAGE, seed=seed)
+    title = f"Tabela de Preços - Residencial {seed:03d}"
+    writer = _PdfWriter()
+
+    for page_index in range(pages):
+        rows = units[page_index * ROWS_PER_PAGE:(page_index + 1) * ROWS_PER_PAGE]
+        if kind == "misto" and page_index == 0:
+            writer.add_page(
+                b"BT /F1 20 Tf 60 120 Td (" + _escape_pdf_text(title) + b") Tj ET",
+                images=[(_cover_image(rng), 40, 180, 515, 620)],
+            )
+        elif kind == "escaneado" or (kind == "misto" and page_index % 2 == 0):
+            writer.add_page(images=[(_scanned_page_image(title, rows, rng), 0, 0, PAGE_WIDTH, PAGE_HEIGHT)])
+        else:
+            writer.add_page(_text_page_stream(title, rows))
+
+    writer.save(path)
+    return path
+
+
+def generate_corpus(output_dir, text_docs=2, scanned_docs=2, mixed_docs=2, pages=5):
+    """ Gera o corpus de benchmark em `output_dir` e retorna os caminhos dos PDFs. """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    seed = 0
+    for kind, count in (("texto", text_docs), ("escaneado", scanned_docs), ("misto", mixed_docs)):
+        for _ in range(count):
+            seed += 1
+            paths.append(write_pdf(os.path.join(output_dir, f"{kind}_{seed:03d}.pdf"), kind, pages, seed=seed))
+    return paths
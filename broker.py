@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+from contextlib import closing
+
+# Broker das tarefas por arquivo do modo distribuído (ver `distributed`). Sem `PDF_BROKER_URL`,
+# os lotes são processados no próprio servidor da API, como antes.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BROKER_URL = os.getenv("PDF_BROKER_URL", "")
+
+# Uma tarefa em execução volta para a fila se o worker não renovar a visibilidade nesse prazo
+VISIBILITY_TIMEOUT = float(os.getenv("PDF_TASK_VISIBILITY_TIMEOUT", 600))
+MAX_ATTEMPTS = int(os.getenv("PDF_TASK_MAX_ATTEMPTS", 3))
+RETRY_DELAY = 5.0  # segundos antes de uma tarefa com erro voltar para a fila
+
+# Tarefas finalizadas são mantidas por esse tempo: reenviar o mesmo arquivo sem alteração reaproveita o resultado.
+# A limpeza é feita pelos workers, a cada `PURGE_INTERVAL` segundos (ver `Broker.purge`)
+RETENTION_HOURS = float(os.getenv("PDF_TASK_RETENTION_HOURS", 24))
+PURGE_INTERVAL = 3600.0
+
+
+class Broker:
+    """
+    Interface do broker de tarefas. Cada tarefa tem um id determinístico (reenviar a mesma tarefa
+    não a duplica), é entregue a um worker por vez e volta para a fila se o worker não a concluir
+    nem renovar a visibilidade dentro do prazo (entrega "pelo menos uma vez"; o processamento de um
+    arquivo é idempotente). Falhas são repetidas até `max_attempts` tentativas.
+
+    Tarefas: `{"id", "payload", "status", "attempts", "visible_at", "result", "error"}`, com status
+    `pendente`, `processando`, `concluido` ou `erro`; `visible_at` avança a cada reserva e renovação.
+    """
+
+    def enqueue(self, tasks):
+        """ Enfileira `[(id, payload), ...]`; ids existentes são mantidos (tarefas com `erro` voltam à fila). """
+        raise NotImplementedError
+
+    def claim(self, worker_id, visibility_timeout=VISIBILITY_TIMEOUT):
+        """ Reserva a próxima tarefa disponível para `worker_id`, ou retorna `None`. """
+        raise NotImplementedError
+
+    def extend(self, task_ids, worker_id, visibility_timeout=VISIBILITY_TIMEOUT):
+        """ Renova a visibilidade das tarefas que `worker_id` ainda está processando. """
+        raise NotImplementedError
+
+    def complete(self, task_id, result):
+        """ Registra o resultado (ignorado se a tarefa já foi concluída por outro worker). """
+        raise NotImplementedError
+
+    def fail(self, task_id, worker_id, error):
+        """
+        Devolve a tarefa para a fila ou, após `max_attempts` tentativas, marca como `erro`. Ignorado se
+        a reserva de `worker_id` expirou e a tarefa já está com outro worker.
+        """
+        raise NotImplementedError
+
+    def purge(self, retention_hours=RETENTION_HOURS):
+        """ Remove as tarefas finalizadas há mais de `retention_hours` horas. """
+        raise NotImplementedError
+
+    def get_tasks(self, task_ids):
+        """ Estado atual das tarefas, `{id: tarefa}`. """
+        raise NotImplementedError
+
+
+class SqliteBroker(Broker):
+    """
+    Broker em um arquivo SQLite (modo WAL): atende vários processos de worker na mesma máquina
+    ou em máquinas que compartilham o arquivo por um sistema de arquivos com travas confiáveis.
+    A reserva é atômica (`BEGIN IMMEDIATE`).
+    """
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS tasks (
+        id TEXT PRIMARY KEY,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        visible_at REAL NOT NULL,
+        worker TEXT,
+        result TEXT,
+        error TEXT,
+        created_at REAL NOT NULL,
+        finished_at REAL
+    );
+    CREATE INDEX IF NOT EXISTS tasks_queue ON tasks (status, visible_at);
+    """
+
+    def __init__(self, path, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self._SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _transaction(self, conn):
+        conn.execute("BEGIN IMMEDIATE")
+        return conn
+
+    def enqueue(self, tasks):
+        now = time.time()
+        with closing(self._connect()) as conn:
+            self._transaction(conn)
+            try:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO tasks (id, payload, status, visible_at, created_at) "
+                    "VALUES (?, ?, 'pendente', ?, ?)",
+                    [(task_id, json.dumps(payload, ensure_ascii=False), now, now) for task_id, payload in tasks],
+                )
+                conn.executemany(
+                    "UPDATE tasks SET status = 'pendente', attempts = 0, visible_at = ?, error = NULL, finished_at = NULL "
+                    "WHERE id = ? AND status = 'erro'",
+                    [(now, task_id) for task_id, _ in tasks],
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def claim(self, worker_id, visibility_timeout=VISIBILITY_TIMEOUT):
+        now = time.time()
+        with closing(self._connect()) as conn:
+            self._transaction(conn)
+            try:
+                # Tarefas abandonadas (worker encerrado) que já esgotaram as tentativas
+                conn.execute(
+                    "UPDATE tasks SET status = 'erro', error = 'Prazo de visibilidade expirado', finished_at = ? "
+                    "WHERE status = 'processando' AND visible_at <= ? AND attempts >= ?",
+                    (now, now, self.max_attempts),
+                )
+                row = conn.execute(
+                    "SELECT id, payload, attempts FROM tasks "
+                    "WHERE status IN ('pendente', 'processando') AND visible_at <= ? "
+                    "ORDER BY created_at, rowid LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE tasks SET status = 'processando', attempts = attempts + 1, visible_at = ?, worker = ? "
+                        "WHERE id = ?",
+                        (now + visibility_timeout, worker_id, row["id"]),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        if row is None:
+            return None
+        return {"id": row["id"], "payload": json.loads(row["payload"]), "attempts": row["attempts"] + 1}
+
+    def extend(self, task_ids, worker_id, visibility_timeout=VISIBILITY_TIMEOUT):
+        if not task_ids:
+            return
+        with closing(self._connect()) as conn:
+            conn.executemany(
+                "UPDATE tasks SET visible_at = ? WHERE id = ? AND worker = ? AND status = 'processando'",
+                [(time.time() + visibility_timeout, task_id, worker_id) for task_id in task_ids],
+            )
+
+    def complete(self, task_id, result):
+        with closing(self._connect()) as conn:
+            updated = conn.execute(
+                "UPDATE tasks SET status = 'concluido', result = ?, error = NULL, finished_at = ? "
+                "WHERE id = ? AND status != 'concluido'",
+                (json.dumps(result, ensure_ascii=False), time.time(), task_id),
+            ).rowcount
+        if not updated:
+            logging.info(f"Tarefa {task_id} já havia sido concluída; resultado duplicado descartado")
+        return bool(updated)
+
+    def fail(self, task_id, worker_id, error):
+        now = time.time()
+        with closing(self._connect()) as conn:
+            updated = conn.execute(
+                "UPDATE tasks SET "
+                "status = CASE WHEN attempts >= ? THEN 'erro' ELSE 'pendente' END, "
+                "finished_at = CASE WHEN attempts >= ? THEN ? ELSE NULL END, "
+                "visible_at = ?, error = ? "
+                "WHERE id = ? AND worker = ? AND status = 'processando'",
+                (self.max_attempts, self.max_attempts, now, now + RETRY_DELAY, error, task_id, worker_id),
+            ).rowcount
+        if not updated:
+            logging.info(f"Tarefa {task_id} não está mais reservada para {worker_id}; falha descartada")
+        return bool(updated)
+
+    def purge(self, retention_hours=RETENTION_HOURS):
+        with closing(self._connect()) as conn:
+            removed = conn.execute(
+                "DELETE FROM tasks WHERE status IN ('concluido', 'erro') AND finished_at < ?",
+                (time.time() - retention_hours * 3600,),
+            ).rowcount
+        if removed:
+            logging.info(f"Broker: {removed} tarefa(s) finalizada(s) removida(s)")
+        return removed
+
+    def get_tasks(self, task_ids):
+        tasks = {}
+        with closing(self._connect()) as conn:
+            # Em blocos, abaixo do limite de parâmetros do SQLite
+            for start in range(0, len(task_ids), 500):
+                chunk = task_ids[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT * FROM tasks WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for row in rows:
+                    tasks[row["id"]] = {
+                        "id": row["id"],
+                        "payload": json.loads(row["payload"]),
+                        "status": row["status"],
+                        "attempts": row["attempts"],
+                        "visible_at": row["visible_at"],
+                        "result": json.loads(row["result"]) if row["result"] else None,
+                        "error": row["error"],
+                    }
+        return tasks
+
+
+# Implementações por esquema da URL; outros brokers (ex.: Redis) podem ser registrados aqui
+BROKERS = {
+    "sqlite": lambda location: SqliteBroker(location or os.path.join(BASE_DIR, "media", "broker.db")),
+}
+
+
+def get_broker(url=None):
+    """
+    Broker a partir da URL (`PDF_BROKER_URL`), ex.: `sqlite:///dados/broker.db` ou `sqlite://`
+    (arquivo padrão em `media/broker.db`). Retorna `None` se nenhum broker estiver configurado.
+    """
+    url = url if url is not None else BROKER_URL
+    if not url:
+        return None
+    scheme, _, location = url.partition("://")
+    if scheme not in BROKERS:
+        raise ValueError(f"Broker não suportado: {url}")
+    return BROKERS[scheme](location)
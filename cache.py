@@ -0,0 +1,150 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+
+# Cache persistente de resultados, endereçado pelo conteúdo do PDF
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(BASE_DIR, "media", "cache"))
+CACHE_MAX_BYTES = int(float(os.getenv("PDF_CACHE_MAX_MB", 512)) * 1024 * 1024)  # 0 desativa o cache
+
+# Tamanho do cache conhecido por este processo, atualizado a cada gravação (`None` até a primeira
+# varredura). Outros processos também gravam no cache, então o valor é ressincronizado por uma
+# varredura completa a cada `RESCAN_EVERY` gravações ou quando passa do limite.
+RESCAN_EVERY = 200
+
+_MISS = object()
+_size_lock = threading.Lock()
+_known_size = None
+_puts_since_scan = 0
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    """ SHA-256 do conteúdo do arquivo, lido em blocos. """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _entry_path(content_hash, stage, version):
+    key = hashlib.sha256(f"{content_hash}:{stage}:{version}".encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, key[:2], f"{key}.json")
+
+
+def get(content_hash, stage, version, default=None):
+    """ Lê um resultado do cache; um acerto renova o arquivo na ordem de LRU. """
+    if not CACHE_MAX_BYTES:
+        return default
+
+    path = _entry_path(content_hash, stage, version)
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            value = json.load(file)["valor"]
+        os.utime(path)
+    except (FileNotFoundError, ValueError, KeyError):
+        return default
+
+    logging.info(f"Cache: reaproveitando '{stage}' ({content_hash[:12]})")
+    return value
+
+
+def _is_empty(value):
+    return value is None or (isinstance(value, (list, dict, str)) and not value)
+
+
+def put(content_hash, stage, version, value):
+    """
+    Grava um resultado no cache (escrita atômica) e aplica a política de tamanho. Resultados vazios
+    (`None`, lista ou dicionário vazio) não são gravados: costumam vir de uma falha transitória
+    (OpenAI, tesseract) e devem ser recalculados na próxima execução.
+    """
+    if not CACHE_MAX_BYTES or _is_empty(value):
+        return
+
+    path = _entry_path(content_hash, stage, version)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        previous_size = os.stat(path).st_size
+    except FileNotFoundError:
+        previous_size = 0
+
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump({"estagio": stage, "versao": version, "valor": value}, file, ensure_ascii=False)
+    size = os.stat(temp_path).st_size
+    os.replace(temp_path, path)
+
+    _account(size - previous_size)
+
+
+def _account(delta):
+    """ Atualiza o tamanho conhecido do cache e só varre o diretório quando necessário. """
+    global _known_size, _puts_since_scan
+    with _size_lock:
+        _puts_since_scan += 1
+        if _known_size is not None and _puts_since_scan < RESCAN_EVERY:
+            _known_size += delta
+            if _known_size <= CACHE_MAX_BYTES:
+                return
+    evict()
+
+
+def cached(content_hash, stage, version, compute):
+    """
+    Retorna o resultado do estágio a partir do cache ou o calcula com `compute()` e o armazena.
+    Se `compute()` falhar ou retornar um resultado vazio, nada é gravado (ver `put`).
+    """
+    value = get(content_hash, stage, version, default=_MISS)
+    if value is not _MISS:
+        return value
+
+    value = compute()
+    put(content_hash, stage, version, value)
+    return value
+
+
+def evict(max_bytes=None):
+    """
+    Remove as entradas usadas há mais tempo até o cache caber em `max_bytes` (LRU por mtime).
+    Varre o diretório inteiro; `put` só a chama quando o tamanho conhecido passa do limite ou a
+    cada `RESCAN_EVERY` gravações.
+    """
+    global _known_size, _puts_since_scan
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+
+    entries = []
+    total_size = 0
+    for root, _, files in os.walk(CACHE_DIR):
+        for name in files:
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+
+    if total_size > max_bytes:
+        total_size = _remove_oldest(entries, total_size, max_bytes)
+
+    with _size_lock:
+        _known_size, _puts_since_scan = total_size, 0
+
+
+def _remove_oldest(entries, total_size, max_bytes):
+    for _, size, path in sorted(entries):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_size -= size
+        if total_size <= max_bytes:
+            break
+
+    logging.info(f"Cache: entradas antigas removidas, tamanho atual {total_size / 1024 / 1024:.1f} MB")
+    return total_size
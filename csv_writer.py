@@ -0,0 +1,154 @@
+import os
+import csv
+import json
+import logging
+import metrics
+
+# Colunas do CSV consolidado, na ordem esperada pelos consumidores
+CSV_COLUMNS = ["nome_empreendimento", "unidade", "disponibilidade", "valor"]
+CSV_SEPARATOR = ";"
+
+
+def normalize_row(row):
+    """ Linha do CSV a partir de uma unidade extraída (`valor` sem separador de milhar e com ponto decimal). """
+    values = [row.get(column) for column in CSV_COLUMNS]
+    values = ["" if value is None else str(value) for value in values]
+    values[-1] = values[-1].replace(".", "").replace(",", ".")
+    return values
+
+
+class StreamingCsvWriter:
+    """
+    Escreve o CSV consolidado documento a documento, sem acumular as linhas do lote em memória.
+
+    As linhas vão para `<csv>.partial` e, após cada documento, um manifesto `<csv>.progress.json`
+    registra os arquivos concluídos e o tamanho do parcial naquele ponto. Se o processamento
+    for interrompido, a próxima execução com o mesmo CSV e o mesmo diretório descarta o que foi
+    escrito depois do último documento registrado e pula os arquivos já concluídos.
+    `finalize()` move o parcial para o caminho final de forma atômica.
+    """
+
+    def __init__(self, output_csv_path, input_dir):
+        self.output_csv_path = output_csv_path
+        self.partial_path = f"{output_csv_path}.partial"
+        self.progress_path = f"{output_csv_path}.progress.json"
+        self.input_dir = os.path.abspath(input_dir)
+        self.completed = {}
+        self.rows = 0
+        self._size = 0
+        self._resume()
+        self._file = open(self.partial_path, "a", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._file, delimiter=CSV_SEPARATOR, lineterminator="\n")
+        if self._size == 0:
+            self._writer.writerow(CSV_COLUMNS)
+            self._commit()
+
+    def _resume(self):
+        try:
+            with open(self.progress_path, "r", encoding="utf-8") as file:
+                progress = json.load(file)
+            partial_size = os.path.getsize(self.partial_path)
+        except (FileNotFoundError, ValueError):
+            return
+
+        if progress.get("input_dir") != self.input_dir or partial_size < progress.get("bytes", 0):
+            logging.warning(f"Progresso anterior de {self.output_csv_path} não corresponde a este lote; reiniciando")
+            return
+
+        # Descarta linhas de um documento que não chegou a ser registrado
+        with open(self.partial_path, "r+b") as file:
+            file.truncate(progress["bytes"])
+        self.completed = progress["arquivos"]
+        self.rows = progress["linhas"]
+        self._size = progress["bytes"]
+        logging.info(f"Retomando {self.output_csv_path}: {len(self.completed)} arquivo(s) já concluído(s)")
+
+    def _commit(self):
+        """ Garante as linhas em disco e registra o progresso (escrita atômica do manifesto). """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._size = self._file.tell()
+
+        temp_path = f"{self.progress_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({
+                "input_dir": self.input_dir,
+                "arquivos": self.completed,
+                "linhas": self.rows,
+                "bytes": self._size,
+            }, file, ensure_ascii=False)
+        os.replace(temp_path, self.progress_path)
+
+    def is_completed(self, file):
+        return file in self.completed
+
+    def write_document(self, file, rows):
+        """ Acrescenta as linhas de um documento e o marca como concluído. """
+        rows = rows or []
+        with metrics.span("csv", linhas=len(rows)):
+            self._writer.writerows(normalize_row(row) for row in rows)
+            self.rows += len(rows)
+            self.completed[file] = len(rows)
+            self._commit()
+
+    def finalize(self):
+        """
+        Publica o CSV no caminho final (substituição atômica) e remove o manifesto.
+        Retorna o caminho, ou `None` se nenhuma linha foi escrita.
+        """
+        self._file.close()
+        if self.rows:
+            os.replace(self.partial_path, self.output_csv_path)
+        else:
+            os.remove(self.partial_path)
+        os.remove(self.progress_path)
+        return self.output_csv_path if self.rows else None
+
+    def close(self):
+        """ Fecha o arquivo sem publicar (o progresso fica disponível para retomada). """
+        if not self._file.closed:
+            self._file.close()
+
+
+def replace_developments(output_csv_path, developments):
+    """
+    Substitui no CSV consolidado as linhas dos empreendimentos em `developments`
+    (`{nome_empreendimento: linhas}`; uma lista vazia remove o empreendimento).
+
+    As novas linhas ocupam a posição das antigas; empreendimentos que ainda não estavam no CSV
+    vão para o final. O arquivo é reescrito em um temporário e substituído de forma atômica,
+    sem reprocessar os demais documentos. Retorna o total de linhas do CSV.
+    """
+    temp_path = f"{output_csv_path}.tmp"
+    pending = dict(developments)
+    total = 0
+
+    with metrics.span("csv") as span, open(temp_path, "w", encoding="utf-8", newline="") as output:
+        writer = csv.writer(output, delimiter=CSV_SEPARATOR, lineterminator="\n")
+        writer.writerow(CSV_COLUMNS)
+
+        def write_rows(rows):
+            writer.writerows(normalize_row(row) for row in rows)
+            return len(rows)
+
+        if os.path.exists(output_csv_path):
+            with open(output_csv_path, "r", encoding="utf-8", newline="") as current:
+                reader = csv.reader(current, delimiter=CSV_SEPARATOR)
+                next(reader, None)
+                for row in reader:
+                    name = row[0] if row else ""
+                    if name not in developments:
+                        writer.writerow(row)
+                        total += 1
+                    elif name in pending:
+                        total += write_rows(pending.pop(name))
+
+        for rows in pending.values():
+            total += write_rows(rows)
+
+        output.flush()
+        os.fsync(output.fileno())
+        span["linhas"] = sum(len(rows) for rows in developments.values())
+
+    os.replace(temp_path, output_csv_path)
+    return total
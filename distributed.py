@@ -0,0 +1,244 @@
+import os
+import sys
+import time
+import signal
+import socket
+import hashlib
+import logging
+import argparse
+import threading
+import metrics
+from broker import VISIBILITY_TIMEOUT, PURGE_INTERVAL, get_broker
+from csv_writer import StreamingCsvWriter
+from engine import run_pipeline
+from parquet_writer import ParquetDatasetWriter
+from process import (LLM_CACHE_VERSION, list_pdfs, development_name, extract_pdf, interpret_pdf,
+                     classify_pending)
+
+# Intervalo entre as consultas ao broker (worker sem tarefas e agregação dos resultados), em segundos
+POLL_INTERVAL = float(os.getenv("PDF_BROKER_POLL_INTERVAL", 1.0))
+
+# O job termina com erro se nenhuma das suas tarefas pendentes for reservada, renovada ou finalizada
+# nesse prazo (nenhum worker em execução), em segundos; deve ser maior que o intervalo de renovação
+STALL_TIMEOUT = float(os.getenv("PDF_BROKER_STALL_TIMEOUT", 900))
+
+
+def task_id(input_dir, file):
+    """
+    Id determinístico da tarefa de um arquivo: caminho, tamanho, `mtime` e versões da extração, da IA e do
+    mapeamento de tabelas (`process.LLM_CACHE_VERSION`).
+    Reenviar o mesmo arquivo sem alteração (nova tentativa do job, retomada) não cria outra tarefa e
+    reaproveita o resultado já gravado no broker.
+    """
+    path = os.path.join(input_dir, file)
+    stat = os.stat(path)
+    key = f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\0{LLM_CACHE_VERSION}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def process_pdfs_distributed(input_dir, output_csv_path, broker, on_progress=None, parquet_dir=None,
+                             poll_interval=POLL_INTERVAL, stall_timeout=STALL_TIMEOUT):
+    """
+    Produtor e agregador do modo distribuído: equivalente a `process.process_pdfs`, mas cada PDF vira
+    uma tarefa no `broker` e é processado por workers independentes (`python -m distributed`), em
+    qualquer máquina que enxergue o diretório de entrada no mesmo caminho.
+
+    Os resultados são gravados no CSV consolidado na ordem dos arquivos, à medida que os workers os
+    concluem; `on_progress`, `parquet_dir` e a retomada de execuções interrompidas seguem `process_pdfs`.
+    Tarefas que esgotam as tentativas (ver `broker.MAX_ATTEMPTS`) são informadas com o status `erro`.
+    Se nenhuma tarefa pendente andar por `stall_timeout` segundos (nenhum worker ativo), levanta
+    `TimeoutError`; o que já foi concluído fica no CSV parcial e no broker para a retomada.
+    """
+    input_dir = os.path.abspath(input_dir)
+    logging.info(f"Enviando os PDFs do diretório {input_dir} para o broker")
+
+    writer = StreamingCsvWriter(output_csv_path, input_dir)
+    parquet = ParquetDatasetWriter(parquet_dir) if parquet_dir else None
+    files = list_pdfs(input_dir)
+
+    if on_progress:
+        for file in files:
+            if writer.is_completed(file):
+                on_progress(file, "concluido", {"tempo_extracao": None, "tempo_ia": None, "erro": None,
+                                                "spans": [], "linhas": writer.completed[file]})
+    files = [file for file in files if not writer.is_completed(file)]
+
+    tasks = [(task_id(input_dir, file), {"input_dir": input_dir, "file": file}) for file in files]
+    # Resultados de execuções anteriores são reaproveitados, mas suas métricas já foram contabilizadas
+    reused = {task for task, state in broker.get_tasks([task for task, _ in tasks]).items()
+              if state["status"] == "concluido"}
+    broker.enqueue(tasks)
+    logging.info(f"{len(tasks)} tarefa(s) no broker ({len(reused)} já concluída(s)); aguardando os workers")
+
+    try:
+        position = 0
+        progress, progress_at = None, time.monotonic()
+        while position < len(tasks):
+            states = broker.get_tasks([task for task, _ in tasks[position:]])
+
+            # Qualquer reserva, renovação ou finalização indica que há workers processando o job
+            current = {task: (state["status"], state["attempts"], state["visible_at"])
+                       for task, state in states.items()}
+            if current != progress:
+                progress, progress_at = current, time.monotonic()
+            elif time.monotonic() - progress_at > stall_timeout:
+                raise TimeoutError(f"Nenhum worker processou as tarefas do job em {stall_timeout:.0f}s "
+                                   f"({len(tasks) - position} arquivo(s) restante(s))")
+
+            # Só avança enquanto o próximo arquivo na ordem do diretório estiver finalizado
+            while position < len(tasks):
+                file = files[position]
+                task = states.get(tasks[position][0])
+                if task is None or task["status"] not in ("concluido", "erro"):
+                    break
+
+                if task["status"] == "concluido":
+                    result = task["result"]
+                    status, rows = result["status"], result["linhas"]
+                    if parquet:
+                        parquet.write_document(development_name(file), file, rows)
+                    writer.write_document(file, rows)
+                    info = {key: result[key] for key in ("tempo_extracao", "tempo_ia", "erro", "spans")}
+                    if tasks[position][0] in reused:
+                        info["spans"] = []
+                    # Os spans medidos nos workers entram nas métricas deste processo (`/metrics`)
+                    metrics.merge(info["spans"])
+                else:
+                    # Não é registrado no CSV: será tentado novamente numa retomada
+                    status, rows = "erro", []
+                    info = {"tempo_extracao": None, "tempo_ia": None, "erro": task["error"], "spans": []}
+                    logging.error(f"Tarefa de {file} falhou após {task['attempts']} tentativa(s): {task['error']}")
+
+                if on_progress:
+                    on_progress(file, status, dict(info, linhas=len(rows)))
+                position += 1
+
+            if position < len(tasks):
+                time.sleep(poll_interval)
+    finally:
+        writer.close()
+
+    output_csv = writer.finalize()
+    if output_csv:
+        logging.info(f"CSV consolidado salvo em: {output_csv} ({writer.rows} linhas)")
+        return output_csv
+
+    logging.warning(f"Nenhum dado extraído dos PDFs no diretório {input_dir}")
+    return None
+
+
+def extract_task(task):
+    """ Estágio CPU do worker (executado no pool de processos): extrai o PDF da tarefa. """
+    payload = task["payload"]
+    return extract_pdf(os.path.join(payload["input_dir"], payload["file"]))
+
+
+def _claim_tasks(broker, worker_id, in_flight, stop_event, poll_interval):
+    """ Gera as tarefas reservadas no broker, aguardando enquanto a fila estiver vazia. """
+    while not stop_event.is_set():
+        task = broker.claim(worker_id)
+        if task is None:
+            stop_event.wait(poll_interval)
+            continue
+        logging.info(f"Tarefa {task['id'][:12]} reservada: {task['payload']['file']} (tentativa {task['attempts']})")
+        in_flight.add(task["id"])
+        yield task
+
+
+def _keep_visible(broker, worker_id, in_flight, stop_event):
+    """
+    Renova a visibilidade das tarefas em andamento (documentos longos não voltam para a fila) e
+    remove periodicamente as tarefas finalizadas antigas do broker (fora da reserva e do envio).
+    """
+    purged_at = None
+    while True:
+        try:
+            if purged_at is None or time.monotonic() - purged_at >= PURGE_INTERVAL:
+                broker.purge()
+                purged_at = time.monotonic()
+        except Exception:
+            logging.exception("Erro ao remover as tarefas antigas do broker")
+        if stop_event.wait(VISIBILITY_TIMEOUT / 3):
+            return
+        try:
+            broker.extend(list(in_flight), worker_id)
+        except Exception:
+            logging.exception("Erro ao renovar a visibilidade das tarefas")
+
+
+def run_worker(broker, cpu_workers=None, llm_workers=None, queue_size=None, stop_event=None,
+               poll_interval=POLL_INTERVAL):
+    """
+    Worker do modo distribuído: reserva tarefas no broker e as processa com `engine.run_pipeline`
+    (extração em processos, IA em threads), até `stop_event` ser definido. Vários workers podem rodar
+    na mesma máquina ou em máquinas diferentes; cada um escala seus pools de forma independente
+    (ex.: mais `cpu_workers` nas máquinas dedicadas ao OCR).
+
+    O resultado de cada arquivo (linhas, status, tempos e spans) é gravado no broker. Erros devolvem
+    a tarefa para a fila até o limite de tentativas; tarefas de um worker encerrado voltam para a
+    fila quando o prazo de visibilidade expira. Documentos que a heurística não classifica são
+    classificados pela IA individualmente (não há lote entre tarefas).
+    """
+    stop_event = stop_event or threading.Event()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    in_flight = set()
+
+    heartbeat_stop = threading.Event()
+    threading.Thread(target=_keep_visible, args=(broker, worker_id, in_flight, heartbeat_stop), daemon=True).start()
+    logging.info(f"Worker {worker_id} aguardando tarefas")
+
+    try:
+        for task, extracted_data, stats in run_pipeline(
+                _claim_tasks(broker, worker_id, in_flight, stop_event, poll_interval),
+                extract_task, interpret_pdf, cpu_workers, llm_workers, queue_size):
+            file = task["payload"]["file"]
+            if isinstance(extracted_data, dict):
+                try:
+                    with metrics.collect() as spans:
+                        extracted_data = interpret_pdf(classify_pending(extracted_data))
+                    stats["spans"] = stats["spans"] + spans
+                except Exception as e:
+                    logging.exception(f"Erro ao processar {file}")
+                    extracted_data, stats["erro"] = None, str(e)
+
+            try:
+                if stats["erro"]:
+                    broker.fail(task["id"], worker_id, stats["erro"])
+                    continue
+
+                safe_name = development_name(file)
+                for row in extracted_data or []:
+                    row["nome_empreendimento"] = safe_name
+                broker.complete(task["id"], dict(stats, status="concluido" if extracted_data else "sem_dados",
+                                                 linhas=extracted_data or []))
+            finally:
+                in_flight.discard(task["id"])
+    finally:
+        heartbeat_stop.set()
+    logging.info(f"Worker {worker_id} encerrado")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Worker do modo distribuído: processa as tarefas do broker.")
+    parser.add_argument("--broker", help="URL do broker (padrão: PDF_BROKER_URL)")
+    parser.add_argument("--cpu-workers", type=int, help="Processos de extração (padrão: PDF_CPU_WORKERS)")
+    parser.add_argument("--llm-workers", type=int, help="Chamadas simultâneas à IA (padrão: PDF_LLM_WORKERS)")
+    parser.add_argument("--queue-size", type=int, help="Folga entre os estágios (padrão: PDF_QUEUE_SIZE)")
+    args = parser.parse_args(argv)
+
+    broker = get_broker(args.broker)
+    if broker is None:
+        parser.error("Nenhum broker configurado (use --broker ou PDF_BROKER_URL)")
+
+    # SIGTERM (ex.: escala para baixo) encerra após concluir as tarefas já reservadas
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    try:
+        run_worker(broker, args.cpu_workers, args.llm_workers, args.queue_size, stop_event=stop_event)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+import os
+import pdfplumber
+from contextlib import contextmanager
+
+
+class PdfDocument:
+    """
+    Sessão de um PDF compartilhada pelo classificador e pelos workers: o arquivo é aberto uma única
+    vez no pdfplumber e cada página é interpretada (layout do fluxo de caracteres) no máximo uma vez.
+
+    Os resultados por página são calculados sob demanda e memorizados: palavras (`words`), texto
+    (`text`), tabela (`table`) e imagens renderizadas em cada DPI pedido (`bitmap`/`render`).
+    Caracteres e imagens ficam no próprio objeto da página (`page(n).chars`, `page(n).images`),
+    que o pdfplumber também memoriza. `release(n)` descarta tudo o que foi guardado da página,
+    e os workers o chamam assim que terminam de usá-la.
+
+    Pode ser enviada a processos do pool (ex.: OCR): apenas o caminho é serializado e o outro
+    processo abre a sua própria sessão sob demanda.
+    """
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        self._pdf = None
+        self._pages = {}
+        self._bitmaps = {}
+
+    def __fspath__(self):
+        return self.path
+
+    def __str__(self):
+        return self.path  # Mensagens de log mostram o caminho do arquivo
+
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def pdf(self):
+        if self._pdf is None:
+            self._pdf = pdfplumber.open(self.path)
+        return self._pdf
+
+    @property
+    def page_count(self):
+        return len(self.pdf.pages)
+
+    def page(self, number):
+        """ Página do pdfplumber (base 1). """
+        return self.pdf.pages[number - 1]
+
+    def _memo(self, number, key, compute):
+        page = self._pages.setdefault(number, {})
+        if key not in page:
+            page[key] = compute()
+        return page[key]
+
+    def words(self, number):
+        return self._memo(number, "words", lambda: self.page(number).extract_words())
+
+    def text(self, number):
+        return self._memo(number, "text", lambda: (self.page(number).extract_text() or "").strip())
+
+    def table(self, number):
+        """ Maior tabela da página com as células limpas, ou `None`. """
+        def extract():
+            table = self.page(number).extract_table()
+            return [[cell.strip() if cell else "" for cell in row] for row in table] if table else None
+        return self._memo(number, "table", extract)
+
+    def render(self, pages, dpi=200, grayscale=True, window=None):
+        """
+        Gera `(numero_pagina, imagem)` para `pages`, renderizando (em blocos de até `window` páginas,
+        ver `workers.ocr_pool.iter_page_images`) apenas as que ainda não estão memorizadas nesse DPI.
+        """
+        from workers.ocr_pool import iter_page_images
+
+        pages = list(pages)
+        missing = [number for number in pages if (number, dpi, grayscale) not in self._bitmaps]
+        rendered = iter_page_images(self.path, pages=missing, dpi=dpi, grayscale=grayscale, window=window)
+
+        for number in pages:
+            key = (number, dpi, grayscale)
+            if key not in self._bitmaps:
+                for rendered_number, image in rendered:
+                    self._bitmaps[(rendered_number, dpi, grayscale)] = image
+                    if rendered_number == number:
+                        break
+            if key in self._bitmaps:
+                yield number, self._bitmaps[key]
+
+    def bitmap(self, number, dpi=200, grayscale=True):
+        """ Imagem de uma página no DPI pedido, ou `None` se não puder ser renderizada. """
+        for _, image in self.render([number], dpi=dpi, grayscale=grayscale, window=1):
+            return image
+        return None
+
+    def release(self, number):
+        """ Descarta os resultados memorizados, as imagens e o layout interpretado de uma página. """
+        self._pages.pop(number, None)
+        for key in [key for key in self._bitmaps if key[0] == number]:
+            del self._bitmaps[key]
+        if self._pdf is not None and 0 < number <= len(self._pdf.pages):
+            page = self._pdf.pages[number - 1]
+            page.flush_cache()
+            page.get_textmap.cache_clear()
+
+    def retain(self, numbers):
+        """ Libera todas as páginas fora de `numbers` (`None` mantém todas). """
+        if numbers is None:
+            return
+        keep = set(numbers)
+        loaded = set(self._pages) | {key[0] for key in self._bitmaps}
+        if self._pdf is not None:
+            loaded |= set(range(1, len(self._pdf.pages) + 1))
+        for number in loaded - keep:
+            self.release(number)
+
+    def close(self):
+        self._pages.clear()
+        self._bitmaps.clear()
+        if self._pdf is not None:
+            self._pdf.close()
+            self._pdf = None
+
+
+@contextmanager
+def document_session(source):
+    """
+    Sessão para `source` (caminho ou `PdfDocument`). Uma sessão recebida é reaproveitada e
+    continua aberta; uma sessão criada aqui é fechada ao sair do bloco.
+    """
+    if isinstance(source, PdfDocument):
+        yield source
+        return
+    with PdfDocument(source) as document:
+        yield document
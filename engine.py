@@ -0,0 +1,152 @@
+import os
+import time
+import queue
+import logging
+import threading
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+import metrics
+from workers.ocr import set_ocr_slots, shared_ocr_slots
+
+# Configuração padrão dos pools (pode ser sobrescrita por variáveis de ambiente)
+DEFAULT_CPU_WORKERS = int(os.getenv("PDF_CPU_WORKERS", os.cpu_count() or 1))
+DEFAULT_LLM_WORKERS = int(os.getenv("PDF_LLM_WORKERS", 4))
+DEFAULT_QUEUE_SIZE = int(os.getenv("PDF_QUEUE_SIZE", 4))
+
+_STOP = object()
+
+
+def _init_extraction_worker(ocr_slots):
+    """ Os processos de extração (e os pools de OCR que abrirem) dividem as vagas de OCR da máquina. """
+    set_ocr_slots(ocr_slots)
+
+
+def _timed_call(fn, item):
+    """ Executa `fn(item)` no processo de extração e retorna `(resultado, segundos, spans)`. """
+    start = time.perf_counter()
+    result, spans = metrics.call_collecting(fn, item)
+    return result, time.perf_counter() - start, spans
+
+
+def run_pipeline(items, extract_fn, interpret_fn, cpu_workers=None, llm_workers=None, queue_size=None):
+    """
+    Executa o processamento em dois estágios concorrentes e gera `(item, resultado, estatisticas)`
+    **na ordem de `items`**. `estatisticas` traz `tempo_extracao`, `tempo_ia`, `erro` (ou `None`) e os
+    `spans` de métricas do arquivo (ver `metrics.span`), inclusive os medidos nos processos de extração.
+
+    - `extract_fn(item)`: estágio CPU (classificação, rasterização, OCR, pdfplumber), executado em um
+      pool de processos. Deve ser uma função de módulo (picklable) e retornar dados serializáveis.
+    - `interpret_fn(extraido)`: estágio de rede (chamadas à OpenAI), executado em threads.
+
+    O número de arquivos entre o início da extração e o fim da chamada à IA é limitado a
+    `cpu_workers + llm_workers + queue_size`, o que mantém a fila entre os estágios (e a memória) limitada.
+    Falhas em um arquivo são registradas no log e resultam em `None`, sem interromper o lote. Se o
+    gerador for fechado antes do fim, as extrações ainda na fila são canceladas e os documentos já
+    extraídos não passam pela IA.
+
+    `items` é consumido sob demanda: pode ser um iterável que bloqueia até o próximo item estar
+    disponível (ex.: arquivos ainda sendo recebidos por upload), e cada item começa a ser extraído
+    assim que chega.
+    """
+    submitted = {}  # Itens em andamento por posição (removidos ao serem entregues: `items` pode ser infinito)
+    cpu_workers = cpu_workers or DEFAULT_CPU_WORKERS
+    llm_workers = llm_workers or DEFAULT_LLM_WORKERS
+    queue_size = DEFAULT_QUEUE_SIZE if queue_size is None else queue_size
+
+    capacity = cpu_workers + llm_workers + queue_size
+    slots = threading.BoundedSemaphore(capacity)
+    extracted = queue.Queue(maxsize=capacity + llm_workers)  # folga para os sinais de parada
+    finished = queue.Queue()
+    stop_event = threading.Event()
+
+    def produce(pool):
+        count = 0
+        iterator = iter(items)
+        try:
+            while True:
+                # A vaga é reservada antes de pedir o próximo item: com uma fonte que reserva trabalho
+                # ao ser consumida (ex.: tarefas do broker), nada fica retido esperando uma vaga
+                while not slots.acquire(timeout=0.5):
+                    if stop_event.is_set():
+                        return
+                if stop_event.is_set():
+                    return
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    slots.release()
+                    return
+                submitted[count] = item
+                future = pool.submit(partial(_timed_call, extract_fn), item)
+                future.add_done_callback(lambda done, i=count: extracted.put((i, done)))
+                count += 1
+        except Exception:
+            logging.exception("Erro ao obter o próximo arquivo do lote")
+        finally:
+            # Informa o total de itens para o laço de resultados saber quando terminar
+            finished.put((None, count))
+
+    def consume():
+        while True:
+            entry = extracted.get()
+            if entry is _STOP:
+                return
+            index, future = entry
+            if stop_event.is_set():
+                # Lote interrompido (ex.: upload cancelado): o que ainda não chegou à IA é descartado
+                slots.release()
+                continue
+            result = None
+            stats = {"tempo_extracao": None, "tempo_ia": None, "erro": None, "spans": []}
+            try:
+                with metrics.collect() as spans:
+                    stats["spans"] = spans
+                    extracted_data, stats["tempo_extracao"], child_spans = future.result()
+                    metrics.merge(child_spans)
+                    start = time.perf_counter()
+                    result = interpret_fn(extracted_data)
+                    stats["tempo_ia"] = time.perf_counter() - start
+            except Exception as e:
+                logging.exception(f"Erro ao processar {submitted[index]}")
+                stats["erro"] = str(e)
+            finally:
+                slots.release()
+            finished.put((index, (result, stats)))
+
+    count = f"{len(items)} arquivo(s)" if hasattr(items, "__len__") else "arquivos recebidos sob demanda"
+    logging.info(
+        f"Iniciando lote com {count}: {cpu_workers} processo(s) de extração, "
+        f"{llm_workers} thread(s) de IA, fila de {queue_size}"
+    )
+
+    # Um único limite de OCR para todos os processos de extração: um documento escaneado sozinho no
+    # lote usa todas as vagas, e vários documentos juntos nunca passam de `PDF_OCR_WORKERS` páginas
+    with ProcessPoolExecutor(max_workers=cpu_workers, initializer=_init_extraction_worker,
+                             initargs=(shared_ocr_slots(),)) as pool:
+        producer = threading.Thread(target=produce, args=(pool,), daemon=True)
+        consumers = [threading.Thread(target=consume, daemon=True) for _ in range(llm_workers)]
+        producer.start()
+        for consumer in consumers:
+            consumer.start()
+
+        # Reordena os resultados para manter a saída determinística
+        pending = {}
+        next_index = 0
+        total = None
+        try:
+            while total is None or next_index < total:
+                index, result = finished.get()
+                if index is None:
+                    total = result
+                    continue
+                pending[index] = result
+                while next_index in pending:
+                    result, stats = pending.pop(next_index)
+                    yield submitted.pop(next_index), result, stats
+                    next_index += 1
+        finally:
+            stop_event.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+            for _ in consumers:
+                extracted.put(_STOP)
+            producer.join()
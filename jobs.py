@@ -0,0 +1,291 @@
+import os
+import json
+import time
+import socket
+import uuid
+import sqlite3
+import logging
+import threading
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+from process import process_pdfs, list_pdfs
+from watcher import sync_directory
+from broker import get_broker
+from distributed import process_pdfs_distributed
+
+# Banco local com o estado dos jobs (sobrevive a reinícios do servidor)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+JOBS_DB_PATH = os.getenv("PDF_JOBS_DB", os.path.join(BASE_DIR, "media", "jobs.db"))
+
+# Jobs executados simultaneamente (cada job já paraleliza seus arquivos internamente)
+JOB_WORKERS = int(os.getenv("PDF_JOB_WORKERS", 1))
+
+# Com `PDF_JOB_TRACES=1`, grava os spans de cada arquivo em `media/traces/<job_id>.jsonl` (uma linha por arquivo)
+TRACES_ENABLED = os.getenv("PDF_JOB_TRACES", "0").lower() in ("1", "true", "sim")
+TRACES_DIR = os.getenv("PDF_TRACES_DIR", os.path.join(BASE_DIR, "media", "traces"))
+
+# Cada processo renova a cada `PDF_JOB_HEARTBEAT_INTERVAL` segundos o `heartbeat_at` dos jobs que executa;
+# um job em andamento sem renovação há mais de `PDF_JOB_LEASE_SECONDS` tem o dono considerado morto
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("PDF_JOB_HEARTBEAT_INTERVAL", 30))
+JOB_LEASE_SECONDS = float(os.getenv("PDF_JOB_LEASE_SECONDS", 120))
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="pdf-job")
+
+# Processo que executa os jobs criados aqui (vários workers do servidor podem compartilhar o banco)
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+_heartbeat_lock = threading.Lock()
+_heartbeat_thread = None
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    input_dir TEXT NOT NULL,
+    output_csv TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    error TEXT,
+    owner TEXT,
+    heartbeat_at REAL
+);
+CREATE TABLE IF NOT EXISTS job_files (
+    job_id TEXT NOT NULL,
+    file TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    rows INTEGER,
+    extraction_seconds REAL,
+    llm_seconds REAL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    finished_at REAL,
+    error TEXT,
+    PRIMARY KEY (job_id, file)
+);
+"""
+
+
+def _connect():
+    conn = sqlite3.connect(JOBS_DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _owner_alive(owner, heartbeat_at):
+    """
+    Se o processo dono do job ainda existe. A renovação (`heartbeat_at`) vale para qualquer máquina:
+    sem renovação dentro de `JOB_LEASE_SECONDS`, o dono é considerado morto. Com a renovação em dia,
+    processos desta máquina também são verificados pelo pid (um dono encerrado é detectado sem esperar
+    o prazo). O processo atual acabou de iniciar, então um job registrado com o mesmo pid é de um
+    processo anterior (pid reaproveitado).
+    """
+    if heartbeat_at is None or time.time() - heartbeat_at > JOB_LEASE_SECONDS:
+        return False
+    host, _, pid = (owner or "").rpartition(":")
+    if not pid.isdigit():
+        return False
+    if host != socket.gethostname():
+        return True
+    if int(pid) == os.getpid():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Processo existe, mas pertence a outro usuário
+    return True
+
+
+def _interrupt_orphans(conn, job_id=None):
+    """ Marca como `interrompido` os jobs em andamento (todos ou só `job_id`) cujo dono não está mais vivo. """
+    query = "SELECT id, owner, heartbeat_at FROM jobs WHERE status IN ('pendente', 'processando')"
+    running = conn.execute(query + " AND id = ?", (job_id,)) if job_id else conn.execute(query)
+    orphans = [(job["id"],) for job in running.fetchall() if not _owner_alive(job["owner"], job["heartbeat_at"])]
+    conn.executemany(
+        "UPDATE jobs SET status = 'interrompido', finished_at = ? WHERE id = ?",
+        [(time.time(), orphan_id) for orphan_id, in orphans],
+    )
+    conn.executemany(
+        "UPDATE job_files SET status = 'interrompido' WHERE job_id = ? AND status = 'pendente'", orphans
+    )
+
+
+def _renew_jobs():
+    """ Renova `heartbeat_at` dos jobs em andamento deste processo. """
+    with closing(_connect()) as conn, conn:
+        conn.execute(
+            "UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status IN ('pendente', 'processando')",
+            (time.time(), OWNER),
+        )
+
+
+def _heartbeat():
+    while True:
+        time.sleep(JOB_HEARTBEAT_INTERVAL)
+        try:
+            _renew_jobs()
+        except sqlite3.Error:
+            logging.exception("Falha ao renovar os jobs em andamento")
+
+
+def _start_heartbeat():
+    global _heartbeat_thread
+    with _heartbeat_lock:
+        if _heartbeat_thread is None:
+            _heartbeat_thread = threading.Thread(target=_heartbeat, name="pdf-job-heartbeat", daemon=True)
+            _heartbeat_thread.start()
+
+
+def init_db():
+    """
+    Cria as tabelas (se necessário) e marca como `interrompido` os jobs que estavam em
+    andamento quando o processo que os executava foi encerrado (ver `_owner_alive`). Jobs de
+    outros workers do servidor ainda em execução não são afetados.
+    """
+    os.makedirs(os.path.dirname(JOBS_DB_PATH), exist_ok=True)
+    with closing(_connect()) as conn, conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        # Bancos criados antes das colunas de tokens por arquivo
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(job_files)")}
+        for column in ("prompt_tokens", "completion_tokens"):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE job_files ADD COLUMN {column} INTEGER")
+        # Bancos criados antes do dono e da renovação dos jobs (jobs sem renovação são tratados como interrompidos)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("owner", "TEXT"), ("heartbeat_at", "REAL")):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+
+        _interrupt_orphans(conn)
+
+
+def submit_job(input_dir, output_csv_path, incremental=False, parquet_dir=None):
+    """
+    Registra um job para o diretório, agenda sua execução fora do event loop e retorna o id.
+    Com `incremental`, só os arquivos novos ou alterados desde o último job são processados (ver `watcher`).
+    Com `PDF_BROKER_URL` configurado, os demais jobs são processados pelos workers do modo distribuído.
+    Com `parquet_dir`, as linhas também são gravadas em Parquet (ver `parquet_writer`).
+    """
+    job_id = uuid.uuid4().hex
+    files = list_pdfs(input_dir)
+
+    with closing(_connect()) as conn, conn:
+        conn.execute(
+            "INSERT INTO jobs (id, status, input_dir, output_csv, created_at, owner, heartbeat_at)"
+            " VALUES (?, 'pendente', ?, ?, ?, ?, ?)",
+            (job_id, input_dir, output_csv_path, time.time(), OWNER, time.time()),
+        )
+        conn.executemany(
+            "INSERT INTO job_files (job_id, file, position, status) VALUES (?, ?, ?, 'pendente')",
+            [(job_id, file, position) for position, file in enumerate(files)],
+        )
+
+    _start_heartbeat()
+    _executor.submit(_run_job, job_id, input_dir, output_csv_path, incremental, parquet_dir)
+    logging.info(f"Job {job_id} criado com {len(files)} arquivo(s)")
+    return job_id
+
+
+def trace_path(job_id):
+    return os.path.join(TRACES_DIR, f"{job_id}.jsonl")
+
+
+def _append_trace(job_id, entry):
+    """
+    Acrescenta a linha de um arquivo ao trace do job (NDJSON): o custo por arquivo é constante e o
+    trace pode ser lido enquanto o job roda (cada linha completa é um JSON válido).
+    """
+    os.makedirs(TRACES_DIR, exist_ok=True)
+    with open(trace_path(job_id), "a", encoding="utf-8") as file:
+        file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def _run_job(job_id, input_dir, output_csv_path, incremental=False, parquet_dir=None):
+    _update_job(job_id, status="processando", started_at=time.time())
+
+    def on_progress(file, status, info):
+        if TRACES_ENABLED:
+            _append_trace(job_id, {"file": file, "status": status, "spans": info.get("spans", [])})
+        tokens = metrics.totals(info.get("spans", []))
+        with closing(_connect()) as conn, conn:
+            conn.execute(
+                """
+                UPDATE job_files
+                   SET status = ?, rows = ?, extraction_seconds = ?, llm_seconds = ?, prompt_tokens = ?,
+                       completion_tokens = ?, finished_at = ?, error = ?
+                 WHERE job_id = ? AND file = ?
+                """,
+                (status, info["linhas"], info["tempo_extracao"], info["tempo_ia"], tokens["prompt_tokens"],
+                 tokens["completion_tokens"], time.time(), info["erro"], job_id, file),
+            )
+
+    try:
+        if incremental:
+            result = sync_directory(input_dir, output_csv_path, on_progress=on_progress, parquet_dir=parquet_dir)
+            output_csv = output_csv_path if result["linhas"] else None
+        elif (broker := get_broker()) is not None:
+            # Modo distribuído: os arquivos viram tarefas no broker e são processados pelos workers
+            output_csv = process_pdfs_distributed(input_dir, output_csv_path, broker, on_progress=on_progress,
+                                                  parquet_dir=parquet_dir)
+        else:
+            output_csv = process_pdfs(input_dir, output_csv_path, on_progress=on_progress, parquet_dir=parquet_dir)
+    except Exception as e:
+        logging.exception(f"Erro no job {job_id}")
+        _update_job(job_id, status="erro", finished_at=time.time(), error=str(e))
+        return
+
+    status = "concluido" if output_csv else "sem_dados"
+    _update_job(job_id, status=status, finished_at=time.time())
+    logging.info(f"Job {job_id} finalizado: {status}")
+
+
+def _update_job(job_id, **fields):
+    assignments = ", ".join(f"{column} = ?" for column in fields)
+    with closing(_connect()) as conn, conn:
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+
+def get_job(job_id):
+    """
+    Estado do job com o status e os tempos de cada arquivo, ou `None` se não existir. Um job em andamento
+    cujo dono parou de renovar (ex.: servidor de outra máquina encerrado) passa a `interrompido`.
+    """
+    with closing(_connect()) as conn:
+        with conn:
+            _interrupt_orphans(conn, job_id)
+        job = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if job is None:
+            return None
+        files = conn.execute(
+            "SELECT * FROM job_files WHERE job_id = ? ORDER BY position", (job_id,)
+        ).fetchall()
+
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "input_dir": job["input_dir"],
+        "output_csv": job["output_csv"] if job["status"] == "concluido" else None,
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "error": job["error"],
+        "trace": trace_path(job_id) if os.path.exists(trace_path(job_id)) else None,
+        "files": [
+            {
+                "file": file["file"],
+                "status": file["status"],
+                "rows": file["rows"],
+                "extraction_seconds": file["extraction_seconds"],
+                "llm_seconds": file["llm_seconds"],
+                "prompt_tokens": file["prompt_tokens"],
+                "completion_tokens": file["completion_tokens"],
+                "error": file["error"],
+            }
+            for file in files
+        ],
+    }
@@ -0,0 +1,94 @@
+import json
+import logging
+
+
+class JsonArrayParser:
+    """
+    Leitura incremental de um array JSON recebido em pedaços (stream da IA).
+
+    `feed(texto)` devolve os elementos do array (objetos ou listas) que se fecharam com o novo
+    pedaço, já convertidos por `json.loads`; texto antes do array (ex.: ```` ```json ````) é ignorado.
+    Se o array estiver dentro de um objeto (`{"unidades": [...]}`), o primeiro array encontrado é
+    usado. `complete` indica se o array foi fechado; caso contrário, a resposta foi cortada e
+    `consumed` é o trecho até o último elemento completo (ponto de partida de uma continuação).
+    `found` indica se o início do array já foi encontrado.
+
+    Com `in_array=True`, o texto já começa dentro do array (resposta de continuação): vírgulas
+    iniciais são ignoradas e um `[` antes do primeiro elemento é aceito como reabertura do array.
+    """
+
+    def __init__(self, in_array=False):
+        self.complete = False
+        self.found = in_array
+        self.consumed = ""
+        self._buffer = []
+        self._in_array = in_array
+        self._depth = 0  # Profundidade dentro do array (1 = entre elementos)
+        self._in_string = False
+        self._escaped = False
+        self._element = None  # Caracteres do elemento em andamento
+        self._started = False  # Algum elemento já foi iniciado (reabertura com `[` só antes disso)
+        self._reopened = False  # `[` inicial ainda ambíguo: reabertura do array ou primeiro elemento
+
+    def feed(self, text):
+        elements = []
+        for char in text:
+            self._buffer.append(char)
+            if self.complete:
+                continue
+
+            if self._element is not None:
+                self._element.append(char)
+                if self._in_string:
+                    if self._escaped:
+                        self._escaped = False
+                    elif char == "\\":
+                        self._escaped = True
+                    elif char == '"':
+                        self._in_string = False
+                elif char == '"':
+                    self._in_string = True
+                elif char in "{[":
+                    self._depth += 1
+                elif char in "}]":
+                    self._depth -= 1
+                    if self._depth == 1:
+                        elements.extend(self._close_element())
+                continue
+
+            if not self._in_array:
+                if char == "[":
+                    self._in_array, self.found, self._depth = True, True, 1
+                continue
+
+            # Entre elementos do array
+            if self._reopened and not char.isspace():
+                self._reopened = False
+                if char not in "{[]":
+                    # O `[` abria o primeiro elemento (lista de valores), não o array
+                    self._depth = 2
+                    self._element = ["[", char]
+                    self._in_string = char == '"'
+                    self._started = True
+                    continue
+
+            if char in "{[" and not (char == "[" and not self._started and self._depth == 0):
+                self._depth = max(self._depth, 1) + 1
+                self._element = [char]
+                self._started = True
+            elif char == "[":
+                self._depth = 1  # Continuação que reabriu o array (confirmado pelo próximo caractere)
+                self._reopened = True
+            elif char == "]":
+                self.complete = True
+        return elements
+
+    def _close_element(self):
+        text = "".join(self._element)
+        self._element = None
+        self.consumed = "".join(self._buffer)
+        try:
+            return [json.loads(text)]
+        except ValueError:
+            logging.warning(f"Elemento JSON inválido descartado: {text[:80]}")
+            return []
@@ -0,0 +1,280 @@
+import os
+import json
+import time
+import random
+import logging
+import threading
+import contextvars
+from functools import lru_cache, partial
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+import metrics
+from json_stream import JsonArrayParser
+
+# Carregar variáveis do .env
+load_dotenv()
+
+# Modelos usados pelo pipeline
+LLM_MODEL = os.getenv("PDF_LLM_MODEL", "gpt-4-turbo")
+CLASSIFIER_MODEL = os.getenv("PDF_CLASSIFIER_MODEL", "gpt-3.5-turbo")
+
+# Limites compartilhados por todas as chamadas deste processo
+MAX_CONCURRENT_REQUESTS = int(os.getenv("OPENAI_MAX_CONCURRENCY", 8))
+TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", 300000))
+REQUEST_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", 120))
+MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", 6))
+BACKOFF_BASE = 1.0  # segundos
+BACKOFF_MAX = 60.0  # segundos
+
+# Tokens de resposta reservados no orçamento por chamada (estimativa)
+EXPECTED_COMPLETION_TOKENS = 1500
+
+# Continuações pedidas quando a resposta da IA é cortada (limite de tokens de saída ou queda do stream)
+MAX_CONTINUATIONS = int(os.getenv("PDF_LLM_MAX_CONTINUATIONS", 2))
+CONTINUATION_PROMPT = (
+    "A resposta anterior foi interrompida. Continue o mesmo array JSON a partir do próximo elemento, "
+    "sem repetir os anteriores, e feche o array com `]`. Responda apenas com o JSON."
+)
+# Com saída por função, a continuação é uma nova chamada da função com os elementos restantes
+CONTINUATION_TOOL_PROMPT = (
+    "A chamada anterior foi interrompida. Estes elementos já foram recebidos: {recebidos}\n"
+    "Chame a função novamente apenas com os elementos restantes, sem repetir os já recebidos."
+)
+
+_semaphore = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+_encoding = None
+
+
+class IncompleteResponse(Exception):
+    """
+    A resposta da IA terminou incompleta: uma continuação falhou ou o array ainda estava aberto após a
+    última continuação. `elements` traz o que foi recebido, que não deve ser tratado como resultado final.
+    """
+
+    def __init__(self, message, elements):
+        super().__init__(message)
+        self.elements = elements
+
+
+def count_tokens(text):
+    """
+    Número de tokens do texto no tokenizador dos modelos GPT-4/GPT-3.5.
+    Sem acesso ao arquivo do tokenizador (ambiente offline), usa a estimativa de ~4 caracteres por token.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            logging.warning(f"Tokenizador indisponível ({type(e).__name__}); usando estimativa por caracteres")
+            _encoding = False
+    if _encoding is False:
+        return max(1, len(text) // 4)
+    return len(_encoding.encode(text))
+
+
+class TokenBudget:
+    """ Balde de tokens por minuto compartilhado entre as threads (reabastece continuamente). """
+
+    def __init__(self, tokens_per_minute):
+        self.capacity = tokens_per_minute
+        self.available = float(tokens_per_minute)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens):
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self.updated_at) * self.capacity / 60)
+                self.updated_at = now
+                if self.available >= tokens:
+                    self.available -= tokens
+                    return
+                wait = (tokens - self.available) * 60 / self.capacity
+            time.sleep(wait)
+
+
+_budget = TokenBudget(TOKENS_PER_MINUTE)
+
+
+# Os SDKs da OpenAI e do LangChain são importados só na primeira chamada à IA: processos
+# que apenas classificam ou extraem (pools do `engine` e do OCR) não pagam esse custo
+@lru_cache(maxsize=None)
+def retryable_errors():
+    """ Erros transitórios que justificam nova tentativa. """
+    import openai
+    return (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_chat_model(model=LLM_MODEL):
+    """ Modelo LangChain compartilhado (reaproveita as conexões HTTP entre chamadas e threads). """
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        model=model,
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        temperature=0,
+        timeout=REQUEST_TIMEOUT,
+        max_retries=0,  # As novas tentativas são feitas por `call_with_retries`
+        stream_usage=True,  # Tokens de prompt/resposta também nas chamadas com streaming
+    )
+
+
+@lru_cache(maxsize=None)
+def get_openai_client():
+    """ Cliente OpenAI compartilhado para chamadas diretas (ex.: classificação de PDFs). """
+    import openai
+    return openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=REQUEST_TIMEOUT, max_retries=0)
+
+
+def _retry_after(error):
+    """ Tempo de espera sugerido pela API (cabeçalho `retry-after`), se houver. """
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def call_with_retries(fn, estimated_tokens=EXPECTED_COMPLETION_TOKENS):
+    """
+    Executa `fn()` respeitando o limite global de concorrência e o orçamento de tokens por minuto.
+    Erros transitórios (429, 5xx, timeout, conexão) são repetidos com backoff exponencial e jitter.
+    """
+    _budget.acquire(estimated_tokens)
+
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            with _semaphore:
+                return fn()
+        except retryable_errors() as e:
+            if attempt == MAX_RETRIES:
+                raise
+            delay = _retry_after(e) or random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+            logging.warning(f"Erro transitório da OpenAI ({type(e).__name__}), nova tentativa em {delay:.1f}s")
+            time.sleep(delay)
+
+
+def stream_chain(prompt, inputs, on_element=None, model=LLM_MODEL, max_continuations=None, tool=None):
+    """
+    Envia `prompt` (template do LangChain) preenchido com `inputs` à IA com streaming e lê o array JSON
+    da resposta de forma incremental (`json_stream.JsonArrayParser`): cada elemento é entregue a
+    `on_element` assim que se fecha, sem esperar o fim da geração. Retorna a lista de elementos.
+
+    Se a resposta for cortada (limite de tokens de saída) ou a conexão cair no meio do stream, os
+    elementos já recebidos são mantidos e uma continuação é pedida a partir do último elemento completo
+    (até `max_continuations` vezes). Se uma continuação falhar ou a resposta continuar cortada após a
+    última, levanta `IncompleteResponse` (com os elementos recebidos), para que o resultado parcial não
+    seja gravado no cache nem tratado como concluído. Respostas sem array (um único objeto JSON) são
+    aceitas como antes.
+
+    Com `tool` (definição de função da OpenAI), a IA é obrigada a chamar essa função com argumentos
+    validados pelo esquema (`strict`), e o array lido é o dos argumentos. JSON malformado nunca
+    invalida a chamada: elementos inválidos são descartados e os demais, mantidos. A continuação, nesse
+    caso, é uma nova chamada da função, com os elementos já recebidos informados no pedido.
+
+    Registra um span `llm` com os tokens de prompt (e quantos vieram do cache de prompt da OpenAI) e
+    de resposta, o tempo até o primeiro elemento (`primeira_linha`) e o número de continuações.
+    """
+    from langchain_core.messages import AIMessage, HumanMessage
+    from langchain_core.utils.json import parse_json_markdown
+
+    max_continuations = MAX_CONTINUATIONS if max_continuations is None else max_continuations
+    messages = prompt.format_prompt(**inputs).to_messages()
+    prompt_tokens = sum(count_tokens(str(message.content)) for message in messages)
+    if tool:
+        prompt_tokens += count_tokens(json.dumps(tool, ensure_ascii=False))  # A definição da função também é cobrada
+    elements = []
+    state = {"recebido": "", "texto": "", "completo": False, "array": False}
+
+    chat_model = get_chat_model(model)
+    if tool:
+        chat_model = chat_model.bind_tools([tool], tool_choice=tool["function"]["name"], strict=True)
+
+    with metrics.span("llm", prompt_tokens=0, prompt_tokens_cache=0, completion_tokens=0, continuacoes=0) as span:
+        started = time.perf_counter()
+
+        def attempt():
+            # Uma nova tentativa após queda no meio do stream também continua do último elemento completo
+            conversation = messages
+            if state["recebido"] and tool:
+                # A função é obrigatória: a continuação pede uma nova chamada, informando o que já chegou
+                already = json.dumps(elements, ensure_ascii=False)
+                conversation = messages + [HumanMessage(content=CONTINUATION_TOOL_PROMPT.format(recebidos=already))]
+            elif state["recebido"]:
+                conversation = messages + [AIMessage(content=state["recebido"]), HumanMessage(content=CONTINUATION_PROMPT)]
+            # Com `tool`, a continuação é uma nova chamada da função (um novo objeto com o array)
+            parser = JsonArrayParser(in_array=bool(state["recebido"]) and not tool)
+            try:
+                for chunk in chat_model.stream(conversation):
+                    text = chunk.content
+                    if tool:
+                        text = "".join(call["args"] or "" for call in chunk.tool_call_chunks)
+                    state["texto"] += text
+                    for element in parser.feed(text):
+                        if not elements:
+                            span["primeira_linha"] = round(time.perf_counter() - started, 3)
+                        elements.append(element)
+                        if on_element:
+                            on_element(element)
+                    if chunk.usage_metadata:
+                        span["prompt_tokens"] += chunk.usage_metadata["input_tokens"]
+                        details = chunk.usage_metadata.get("input_token_details") or {}
+                        span["prompt_tokens_cache"] += details.get("cache_read") or 0
+                        span["completion_tokens"] += chunk.usage_metadata["output_tokens"]
+            finally:
+                state["recebido"] += parser.consumed
+                state["array"] = state["array"] or parser.found
+            state["completo"] = parser.complete
+
+        for continuation in range(max_continuations + 1):
+            received = len(elements)
+            try:
+                call_with_retries(attempt, prompt_tokens + EXPECTED_COMPLETION_TOKENS)
+            except Exception as e:
+                if not elements:
+                    raise
+                span["incompleto"] = True
+                raise IncompleteResponse(f"Falha na resposta da IA após {len(elements)} elemento(s): {e}",
+                                         elements) from e
+            if state["completo"] or not state["array"]:
+                break
+            if continuation == max_continuations or len(elements) == received:
+                # Sem continuações restantes, ou a continuação não trouxe nenhum elemento novo
+                span["incompleto"] = True
+                raise IncompleteResponse(f"Resposta da IA incompleta após {continuation} continuação(ões) "
+                                         f"({len(elements)} elemento(s) recebido(s))", elements)
+            span["continuacoes"] += 1
+            logging.warning(f"Resposta da IA cortada após {len(elements)} elemento(s); pedindo continuação")
+
+        if not state["array"] and state["texto"].strip():
+            # Resposta com um único objeto (sem array), tratada como antes do streaming
+            try:
+                elements = [parse_json_markdown(state["texto"])]
+            except ValueError:
+                logging.warning(f"Resposta da IA sem JSON válido descartada: {state['texto'][:80]}")
+        span["linhas"] = len(elements)
+    return elements
+
+
+def batch_stream(prompt, inputs_list, max_concurrency, on_element=None, tool=None):
+    """ Executa `stream_chain` para várias entradas em paralelo, mantendo a ordem. """
+    if len(inputs_list) == 1:
+        return [stream_chain(prompt, inputs_list[0], on_element, tool=tool)]
+
+    # Cada thread recebe uma cópia do contexto para que os spans cheguem ao coletor do documento
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        futures = [
+            executor.submit(contextvars.copy_context().run, partial(stream_chain, tool=tool), prompt, inputs, on_element)
+            for inputs in inputs_list
+        ]
+        return [future.result() for future in futures]
@@ -1,6 +1,9 @@
 import logging
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from api.urls import api_router
+from jobs import init_db
+from metrics import render_prometheus
 
 # 🔹 Configuração do logging para depuração detalhada
 logging.basicConfig(
@@ -19,11 +22,21 @@ app = FastAPI(
 # 🔹 Inclui as rotas da API
 app.include_router(api_router)
 
+# 🔹 Prepara o banco de jobs e marca como interrompidos os que não terminaram antes do reinício
+@app.on_event("startup")
+async def startup():
+    init_db()
+
 # 🔹 Rota inicial para testar se a API está rodando
 @app.get("/")
 async def root():
     return {"message": "API de processamento de PDFs rodando. Acesse /docs para testar o Swagger."}
 
+# 🔹 Métricas por estágio do pipeline no formato do Prometheus
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
 # 🔹 Executa o servidor com Uvicorn ao rodar `main.py`
 if __name__ == "__main__":
     import uvicorn
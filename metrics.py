@@ -0,0 +1,142 @@
+import os
+import time
+import resource
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Limites (em segundos) dos buckets dos histogramas de duração
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Contadores acumulados a partir dos atributos numéricos dos spans
+COUNTED_ATTRIBUTES = ("paginas", "imagens", "caracteres", "tabelas", "linhas", "prompt_tokens", "completion_tokens",
+                      "prompt_tokens_cache", "continuacoes")
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_collector = contextvars.ContextVar("metrics_collector", default=None)
+
+
+def _children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+@contextmanager
+def span(stage, **attributes):
+    """
+    Mede um estágio do pipeline (tempo de parede e de CPU, incluindo subprocessos como
+    `pdftoppm` e `tesseract`). O dicionário retornado aceita contagens adicionais
+    (`paginas`, `caracteres`, `prompt_tokens`...), preenchidas durante o estágio.
+    """
+    started_at = time.time()
+    wall, cpu, children = time.perf_counter(), time.thread_time(), _children_cpu()
+    try:
+        yield attributes
+    finally:
+        _record({
+            "estagio": stage,
+            "inicio": started_at,
+            "duracao": time.perf_counter() - wall,
+            "cpu": (time.thread_time() - cpu) + (_children_cpu() - children),
+            "pid": os.getpid(),
+            **attributes,
+        })
+
+
+def _record(entry):
+    _observe(entry)
+    collected = _collector.get()
+    if collected is not None:
+        collected.append(entry)
+
+
+def _observe(entry):
+    stage = entry["estagio"]
+    with _lock:
+        histogram = _histograms.setdefault(stage, {"buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0,
+                                                   "cpu": 0.0})
+        for index, bound in enumerate(DURATION_BUCKETS):
+            if entry["duracao"] <= bound:
+                histogram["buckets"][index] += 1
+        histogram["sum"] += entry["duracao"]
+        histogram["cpu"] += entry["cpu"]
+        histogram["count"] += 1
+
+        for attribute in COUNTED_ATTRIBUTES:
+            value = entry.get(attribute)
+            if isinstance(value, (int, float)):
+                _counters[(stage, attribute)] = _counters.get((stage, attribute), 0) + value
+
+
+@contextmanager
+def collect():
+    """ Coleta os spans registrados neste contexto (incluindo threads iniciadas com `copy_context`). """
+    spans = []
+    token = _collector.set(spans)
+    try:
+        yield spans
+    finally:
+        _collector.reset(token)
+
+
+def call_collecting(fn, *args, **kwargs):
+    """ Executa `fn` (em geral em outro processo) e retorna `(resultado, spans)` para o processo pai. """
+    with collect() as spans:
+        result = fn(*args, **kwargs)
+    return result, spans
+
+
+def merge(spans):
+    """ Registra neste processo spans medidos em outro processo (pool de extração ou de OCR). """
+    for entry in spans:
+        _record(entry)
+
+
+def totals(spans, attributes=("prompt_tokens", "completion_tokens")):
+    """ Soma os atributos contados de uma lista de spans (ex.: tokens da IA gastos em um documento). """
+    return {attribute: sum(entry.get(attribute) or 0 for entry in spans) for attribute in attributes}
+
+
+def snapshot():
+    """ Totais por estágio: número de spans, tempo de parede, CPU e contagens acumuladas. """
+    with _lock:
+        stages = {
+            stage: {"spans": histogram["count"], "duracao": histogram["sum"], "cpu": histogram["cpu"]}
+            for stage, histogram in _histograms.items()
+        }
+        for (stage, attribute), value in _counters.items():
+            stages[stage][attribute] = value
+    return stages
+
+
+def render_prometheus():
+    """ Métricas no formato de exposição de texto do Prometheus. """
+    lines = [
+        "# HELP pdf_stage_duration_seconds Duração dos estágios do pipeline de PDFs.",
+        "# TYPE pdf_stage_duration_seconds histogram",
+    ]
+    with _lock:
+        for stage, histogram in sorted(_histograms.items()):
+            for bound, count in zip(DURATION_BUCKETS, histogram["buckets"]):
+                lines.append(f'pdf_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'pdf_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram["count"]}')
+            lines.append(f'pdf_stage_duration_seconds_sum{{stage="{stage}"}} {histogram["sum"]}')
+            lines.append(f'pdf_stage_duration_seconds_count{{stage="{stage}"}} {histogram["count"]}')
+
+        lines += [
+            "# HELP pdf_stage_cpu_seconds_total Tempo de CPU dos estágios (inclui subprocessos).",
+            "# TYPE pdf_stage_cpu_seconds_total counter",
+        ]
+        for stage, histogram in sorted(_histograms.items()):
+            lines.append(f'pdf_stage_cpu_seconds_total{{stage="{stage}"}} {histogram["cpu"]}')
+
+        lines += [
+            "# HELP pdf_stage_items_total Páginas, imagens, caracteres, linhas e tokens processados por estágio.",
+            "# TYPE pdf_stage_items_total counter",
+        ]
+        for (stage, attribute), value in sorted(_counters.items()):
+            lines.append(f'pdf_stage_items_total{{stage="{stage}",item="{attribute}"}} {value}')
+
+    return "\n".join(lines) + "\n"
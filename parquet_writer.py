@@ -0,0 +1,172 @@
+import os
+import shutil
+import logging
+import datetime
+from urllib.parse import quote
+import metrics
+from csv_writer import CSV_COLUMNS
+
+# Pasta do conjunto Parquet, ao lado de `resultado_imoveis.csv` no diretório de saída
+PARQUET_DIR_NAME = "resultado_imoveis_parquet"
+
+# Colunas de partição do conjunto Parquet (`nome_empreendimento=.../data=.../*.parquet`)
+PARTITION_COLUMNS = ["nome_empreendimento", "data"]
+
+# Valor com duas casas decimais; até 13 dígitos na parte inteira
+VALUE_PRECISION, VALUE_SCALE = 15, 2
+
+
+def parquet_schema():
+    """ Esquema do conjunto Parquet (`pyarrow` só é importado quando a saída Parquet é usada). """
+    import pyarrow as pa
+
+    return pa.schema([
+        ("nome_empreendimento", pa.string()),
+        ("unidade", pa.string()),
+        ("disponibilidade", pa.dictionary(pa.int8(), pa.string())),
+        ("valor", pa.decimal128(VALUE_PRECISION, VALUE_SCALE)),
+        ("disponivel", pa.bool_()),
+        ("arquivo", pa.string()),
+        ("pagina", pa.int32()),
+        ("data", pa.date32()),
+    ])
+
+
+def rows_to_table(file, rows, date=None):
+    """
+    Tabela Arrow tipada a partir das unidades de um documento, normalizada em uma única passada
+    vetorizada (sem laço por linha):
+
+    - `valor`: decimal; textos como "Indisponível" viram nulo e `disponivel` indica se há valor de venda;
+    - `disponibilidade`: categórica (dicionário);
+    - `arquivo` e `pagina`: origem de cada linha (`pagina` é nula quando a linha veio da IA).
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    schema = parquet_schema()
+    columns = {column: pa.array([row.get(column) for row in rows], pa.string()) for column in CSV_COLUMNS}
+
+    # Mesma convenção do CSV ("492.030,00" → 492030.00), aceitando "R$" e espaços
+    digits = pc.replace_substring(pc.replace_substring_regex(columns["valor"], r"[^0-9,]", ""), ",", ".")
+    numeric = pc.match_substring_regex(digits, r"^\d+(\.\d{1,2})?$")
+    value = pc.cast(pc.if_else(numeric, digits, pa.scalar(None, pa.string())), schema.field("valor").type)
+
+    return pa.table({
+        "nome_empreendimento": columns["nome_empreendimento"],
+        "unidade": columns["unidade"],
+        "disponibilidade": pc.dictionary_encode(columns["disponibilidade"]).cast(schema.field("disponibilidade").type),
+        "valor": value,
+        "disponivel": pc.is_valid(value),
+        "arquivo": pa.array([file] * len(rows), pa.string()),
+        "pagina": pa.array([row.get("pagina") for row in rows], pa.int32()),
+        "data": pa.array([date or datetime.date.today()] * len(rows), pa.date32()),
+    }, schema=schema)
+
+
+class ParquetDatasetWriter:
+    """
+    Saída opcional em Parquet, ao lado do CSV consolidado: um conjunto particionado por
+    empreendimento e data de processamento (estilo Hive), para que as consultas leiam apenas as
+    partições de que precisam.
+
+    Cada documento é gravado assim que termina, na partição do seu empreendimento; reprocessar um
+    documento no mesmo dia substitui as linhas dele na partição (`delete_matching`, mantendo as de
+    outros arquivos com o mesmo nome de empreendimento), de modo que retomadas e reprocessamentos
+    não duplicam linhas. Partições de dias anteriores são mantidas como histórico.
+    """
+
+    def __init__(self, output_dir, date=None):
+        self.output_dir = output_dir
+        self.date = date or datetime.date.today()
+        self.rows = 0
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _development_dir(self, development):
+        # Mesmo escape dos valores de partição usado pelo `pyarrow` (estilo Hive, codificação URI)
+        return os.path.join(self.output_dir, f"nome_empreendimento={quote(development, safe='')}")
+
+    @staticmethod
+    def _read_partition(partition_dir):
+        """ Linhas gravadas numa partição (sem as colunas de partição), ou `None` se não houver. """
+        import pyarrow.parquet as pq
+
+        if not os.path.isdir(partition_dir):
+            return None
+        parts = [os.path.join(partition_dir, name) for name in os.listdir(partition_dir) if name.endswith(".parquet")]
+        return pq.read_table(parts, partitioning=None) if parts else None
+
+    def write_document(self, development, file, rows):
+        """
+        Grava as linhas de `file` na partição de hoje do empreendimento `development`. Sem linhas
+        (documento reprocessado que deixou de ter dados), as linhas anteriores do arquivo são apagadas.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+
+        partition_dir = os.path.join(self._development_dir(development), f"data={self.date.isoformat()}")
+        with metrics.span("parquet", linhas=len(rows)):
+            # Outros arquivos que geram o mesmo nome de empreendimento compartilham a partição
+            existing = self._read_partition(partition_dir)
+            others = existing.filter(pc.not_equal(existing["arquivo"], file)) if existing is not None else None
+            if rows and others is not None and others.num_rows:
+                colliding = sorted(set(others["arquivo"].to_pylist()))
+                logging.warning(f"Empreendimento '{development}' também gerado por {', '.join(colliding)}; "
+                                f"as linhas de {file} são gravadas junto das desses arquivos no Parquet")
+
+            if not rows and not (others is not None and others.num_rows):
+                shutil.rmtree(partition_dir, ignore_errors=True)
+                self._remove_if_empty(self._development_dir(development))
+                return
+
+            schema = parquet_schema()
+            tables = [rows_to_table(file, rows, self.date)] if rows else []
+            if others is not None and others.num_rows:
+                others = others.append_column("nome_empreendimento", pa.array([development] * others.num_rows))
+                others = others.append_column("data", pa.array([self.date] * others.num_rows, pa.date32()))
+                tables.append(others.select(schema.names).cast(schema))
+
+            partitioning = ds.partitioning(pa.schema([schema.field(column) for column in PARTITION_COLUMNS]),
+                                           flavor="hive")
+            ds.write_dataset(
+                pa.concat_tables(tables),
+                self.output_dir,
+                format="parquet",
+                partitioning=partitioning,
+                existing_data_behavior="delete_matching",
+                basename_template="parte-{i}.parquet",
+            )
+            self.rows += len(rows)
+
+    def delete_document(self, development, file):
+        """
+        Remove as linhas de `file` (arquivo removido da pasta de entrada) de todas as partições do
+        empreendimento `development`, inclusive as de dias anteriores: o empreendimento deixa de
+        aparecer no conjunto, como no CSV consolidado.
+        """
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        directory = self._development_dir(development)
+        if not os.path.isdir(directory):
+            return
+        for name in os.listdir(directory):
+            partition_dir = os.path.join(directory, name)
+            table = self._read_partition(partition_dir)
+            kept = table.filter(pc.not_equal(table["arquivo"], file)) if table is not None else None
+            if kept is None or not kept.num_rows:
+                shutil.rmtree(partition_dir, ignore_errors=True)
+            elif kept.num_rows < table.num_rows:
+                temp_path = os.path.join(partition_dir, "parte-0.parquet.tmp")
+                pq.write_table(kept, temp_path)
+                for part in os.listdir(partition_dir):
+                    if part.endswith(".parquet"):
+                        os.remove(os.path.join(partition_dir, part))
+                os.replace(temp_path, os.path.join(partition_dir, "parte-0.parquet"))
+        self._remove_if_empty(directory)
+
+    @staticmethod
+    def _remove_if_empty(directory):
+        if os.path.isdir(directory) and not os.listdir(directory):
+            os.rmdir(directory)
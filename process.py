@@ -1,77 +1,285 @@
 import os
 import json
+import time
 import logging
-import shutil
 import unicodedata
-import pdfplumber
-import pdf2image
-import openai
-import pandas as pd
+from functools import partial
 from dotenv import load_dotenv
-from workers.worker_pdfplumber import extract_tables_from_pdf
+from engine import run_pipeline
+from csv_writer import StreamingCsvWriter
+from parquet_writer import ParquetDatasetWriter
+from document import PdfDocument, document_session
+import metrics
+from llm_client import LLM_MODEL, CLASSIFIER_MODEL, get_openai_client, call_with_retries
+import cache
+from workers.worker_pdfplumber import extract_tables_from_pdf, process_with_langchain
+from workers.worker_table_mapper import map_tables_to_rows, mapper_fingerprint
 from workers.worker_image_preprocess import process_ocr_with_langchain, extract_text_ocr
-from workers.worker_pdf_mix import process_pdf_combined
+from workers.worker_pdf_mix import extract_pdf_combined, extract_pdf_by_page, process_combined_with_langchain
 
 # Carregar variáveis do .env
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
 # Configuração do logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-# Caminho temporário para processamento
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-TEMP_DIR = os.path.join(BASE_DIR, "media", "temp")
-os.makedirs(TEMP_DIR, exist_ok=True)
+# Versões que compõem as chaves do cache: altere ao mudar a lógica do estágio correspondente
+CLASSIFIER_VERSION = "1"
+CLASSIFIER_AI_VERSION = f"{CLASSIFIER_MODEL}/prompt-2"
+EXTRACTION_VERSION = "5"
+LLM_VERSION = f"{LLM_MODEL}/prompt-3"
+# As linhas (do mapeamento por regras ou da IA) dependem também do conteúdo extraído e da
+# configuração do mapeamento, que decide quais documentos vão para a IA
+LLM_CACHE_VERSION = f"{LLM_VERSION}/{EXTRACTION_VERSION}/mapa-{mapper_fingerprint()}"
+
+# Limiares usados pelo classificador de páginas
+MIN_TEXT_LENGTH = 50  # Mínimo de caracteres no documento para considerá-lo textual
+MIN_PAGE_CHARS = 20  # Mínimo de caracteres para uma página ter camada de texto útil
+MIN_TEXT_COVERAGE = 0.002  # Fração mínima da página ocupada por caracteres
+MIN_IMAGE_COVERAGE = 0.15  # Fração mínima da página ocupada por imagens (ignora logos)
+
+# Classificação pela IA dos documentos que a heurística não resolve
+PDF_TYPES = ("TABELA", "IMAGEM", "MIX")
+CLASSIFY_BATCH_SIZE = int(os.getenv("PDF_CLASSIFY_BATCH_SIZE", 25))  # Documentos por requisição
+# Espera máxima (segundos) de um documento pendente antes de classificar o lote parcial
+CLASSIFY_MAX_WAIT = float(os.getenv("PDF_CLASSIFY_MAX_WAIT", 30))
+FINGERPRINT_PAGES = 10  # Páginas resumidas na impressão de cada documento
+FINGERPRINT_CHARS = 300  # Caracteres das primeiras linhas de texto
+
+
+def _sample_page_indexes(total_pages, max_pages):
+    """ Escolhe índices de páginas distribuídos uniformemente (sempre inclui a primeira e a última). """
+    if not max_pages or total_pages <= max_pages:
+        return list(range(total_pages))
+    if max_pages == 1:
+        return [0]
+    step = (total_pages - 1) / (max_pages - 1)
+    return sorted({round(i * step) for i in range(max_pages)})
+
+
+def _clipped_area(obj, page_width, page_height):
+    """ Área de um objeto do pdfplumber recortada aos limites da página. """
+    width = min(obj["x1"], page_width) - max(obj["x0"], 0)
+    height = min(obj["bottom"], page_height) - max(obj["top"], 0)
+    if width <= 0 or height <= 0:
+        return 0.0
+    return width * height
+
+
+def classify_page(page):
+    """
+    Classifica uma página a partir do modelo de objetos do pdfplumber, sem rasterizar.
 
+    Retorna um registro com contagens de caracteres/imagens, cobertura de texto e de
+    imagem e o tipo da página (`TEXTO`, `IMAGEM`, `MIX` ou `VAZIA`).
+    """
+    page_width, page_height = float(page.width), float(page.height)
+    page_area = page_width * page_height or 1.0
 
-def check_pdf_content(pdf_path):
-    has_text = False
-    has_images = False
-    min_text_length = 50
+    chars = page.chars
+    images = page.images
 
-    try:
-        extracted_text = ""
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text()
-                if text:
-                    extracted_text += text
+    text_area = sum(_clipped_area(char, page_width, page_height) for char in chars)
+    image_area = sum(_clipped_area(image, page_width, page_height) for image in images)
+
+    text_coverage = min(text_area / page_area, 1.0)
+    image_coverage = min(image_area / page_area, 1.0)
+
+    has_text = len(chars) >= MIN_PAGE_CHARS and text_coverage >= MIN_TEXT_COVERAGE
+    has_images = image_coverage >= MIN_IMAGE_COVERAGE
+
+    if has_text and has_images:
+        page_type = "MIX"
+    elif has_text:
+        page_type = "TEXTO"
+    elif has_images:
+        page_type = "IMAGEM"
+    else:
+        page_type = "VAZIA"
+
+    return {
+        "pagina": page.page_number,
+        "caracteres": len(chars),
+        "imagens": len(images),
+        "cobertura_texto": round(text_coverage, 4),
+        "cobertura_imagem": round(image_coverage, 4),
+        "tipo": page_type,
+    }
+
+
+def classify_pdf(pdf_path, max_pages=None, early_exit=False):
+    """
+    Classifica o PDF em uma única passada pelo pdfplumber. `pdf_path` pode ser um caminho ou uma
+    sessão (`document.PdfDocument`); com uma sessão, as páginas interpretadas aqui são reaproveitadas
+    pelos workers de extração.
 
-        images = pdf2image.convert_from_path(pdf_path)
-        if images:
-            has_images = True
+    - `max_pages`: analisa apenas uma amostra uniforme de páginas (útil em PDFs grandes).
+    - `early_exit`: interrompe a análise assim que o documento é identificado como `MIX`.
 
-        if len(extracted_text.strip()) >= min_text_length:
-            has_text = True
+    Retorna `{"tipo", "total_paginas", "amostrada", "paginas"}`, onde `paginas` contém o
+    registro de cada página analisada (ver `classify_page`) para ser reaproveitado pelos
+    workers. `amostrada` indica que nem todas as páginas foram analisadas.
+    Em caso de erro retorna `None`.
+    """
+    pages = []
+    total_chars = 0
+    has_images = False
+
+    try:
+        with metrics.span("classificacao") as span, document_session(pdf_path) as document:
+            total_pages = document.page_count
+            for index in _sample_page_indexes(total_pages, max_pages):
+                record = classify_page(document.page(index + 1))
+                pages.append(record)
+
+                if record["tipo"] in ("TEXTO", "MIX"):
+                    total_chars += record["caracteres"]
+                if record["tipo"] in ("IMAGEM", "MIX"):
+                    has_images = True
+
+                if early_exit and has_images and total_chars >= MIN_TEXT_LENGTH:
+                    break
+
+            span.update(
+                paginas=len(pages),
+                imagens=sum(page["imagens"] for page in pages),
+                caracteres=sum(page["caracteres"] for page in pages),
+            )
 
     except Exception as e:
         logging.error(f"Erro ao processar PDF {pdf_path}: {e}")
         return None
 
+    has_text = total_chars >= MIN_TEXT_LENGTH
+
     if has_text and has_images:
-        return "MIX"
+        doc_type = "MIX"
     elif has_text:
-        return "TABELA"
+        doc_type = "TABELA"
     elif has_images:
-        return "IMAGEM"
+        doc_type = "IMAGEM"
     else:
+        doc_type = None
+
+    return {
+        "tipo": doc_type,
+        "total_paginas": total_pages,
+        "amostrada": len(pages) < total_pages,
+        "paginas": pages,
+    }
+
+
+def pages_of_type(classification, *page_types):
+    """
+    Números das páginas (base 1) classificadas com um dos tipos informados.
+    Retorna `None` (todas as páginas) quando a classificação é parcial ou inconclusiva.
+    """
+    if not classification or not classification["tipo"] or classification["amostrada"]:
         return None
+    return [page["pagina"] for page in classification["paginas"] if page["tipo"] in page_types]
 
 
-def identify_pdf_type(pdf_path):
+def check_pdf_content(pdf_path, max_pages=None):
+    """ Retorna apenas o tipo do documento (`TABELA`, `IMAGEM`, `MIX` ou `None`). """
+    classification = classify_pdf(pdf_path, max_pages=max_pages, early_exit=True)
+    return classification["tipo"] if classification else None
+
+
+def identify_pdf_type(pdf_path, classification=None, content_hash=None):
+    """
+    Tipo do PDF pela classificação local ou, se ela não for conclusiva, pela classificação
+    da IA já armazenada no cache para este conteúdo. Retorna `None` quando o documento ainda
+    precisa ser classificado pela IA (ver `classify_documents_with_ai`).
+    """
     logging.info(f"Identificando tipo de PDF: {pdf_path}")
-    detected_type = check_pdf_content(pdf_path)
+    if classification is None:
+        classification = classify_pdf(pdf_path)
+    detected_type = classification["tipo"] if classification else None
 
     if detected_type:
         logging.info(f"Tipo de PDF identificado automaticamente: {detected_type}")
         return detected_type
 
-    logging.info("Usando IA para classificar o tipo do PDF...")
+    detected_type = cache.get(content_hash, "classificacao_ia", CLASSIFIER_AI_VERSION) if content_hash else None
+    if detected_type:
+        logging.info(f"Tipo de PDF identificado anteriormente pela IA: {detected_type}")
+    return detected_type
+
+
+def pdf_fingerprint(pdf_path, classification):
+    """
+    Resumo compacto do conteúdo para a classificação pela IA: caracteres, imagens e cobertura de
+    imagem das primeiras páginas e as primeiras linhas de texto do documento.
+    """
+    pages = (classification or {}).get("paginas", [])[:FINGERPRINT_PAGES]
+    fingerprint = {
+        "paginas": (classification or {}).get("total_paginas"),
+        "caracteres": [page["caracteres"] for page in pages],
+        "imagens": [page["imagens"] for page in pages],
+        "cobertura_imagem": [page["cobertura_imagem"] for page in pages],
+        "texto": "",
+    }
+
+    text_pages = [page["pagina"] for page in pages if page["caracteres"]][:2]
+    if text_pages:
+        try:
+            with document_session(pdf_path) as document:
+                lines = [line.strip() for number in text_pages for line in document.text(number).splitlines()]
+            fingerprint["texto"] = " | ".join(line for line in lines if line)[:FINGERPRINT_CHARS]
+        except Exception as e:
+            logging.warning(f"Não foi possível ler o texto de {pdf_path} para a classificação: {e}")
+
+    return fingerprint
+
+
+def classify_documents_with_ai(documents):
+    """
+    Classifica pela IA, em lote, os documentos que a heurística não conseguiu classificar.
+
+    `documents` mapeia uma chave qualquer (ex.: nome do arquivo) para `(hash, impressao)`, onde a
+    impressão vem de `pdf_fingerprint`. Cada requisição leva até `CLASSIFY_BATCH_SIZE` documentos,
+    e o tipo de cada conteúdo fica no cache. Retorna `{chave: tipo}`; o tipo é `None` quando a IA
+    não devolve uma categoria válida.
+    """
+    doc_types = {}
+    missing = {}
+    for key, (content_hash, fingerprint) in documents.items():
+        doc_types[key] = cache.get(content_hash, "classificacao_ia", CLASSIFIER_AI_VERSION)
+        if doc_types[key] is None:
+            missing.setdefault(content_hash, (key, fingerprint))
+
+    batch = list(missing.items())
+    for start in range(0, len(batch), CLASSIFY_BATCH_SIZE):
+        chunk = batch[start:start + CLASSIFY_BATCH_SIZE]
+        answers = _classify_batch([fingerprint for _, (_, fingerprint) in chunk])
+
+        for index, (content_hash, _) in enumerate(chunk, start=1):
+            doc_type = str(answers.get(str(index), "")).strip().upper()
+            if doc_type in PDF_TYPES:
+                cache.put(content_hash, "classificacao_ia", CLASSIFIER_AI_VERSION, doc_type)
+            else:
+                doc_type = None
+
+            # Arquivos diferentes com o mesmo conteúdo recebem a mesma resposta
+            for key, (other_hash, _) in documents.items():
+                if other_hash == content_hash:
+                    doc_types[key] = doc_type
+
+    for key, doc_type in doc_types.items():
+        logging.info(f"PDF {key} identificado pela IA como: {doc_type}")
+    return doc_types
+
+
+def _classify_batch(fingerprints):
+    """ Uma requisição ao classificador para vários documentos; retorna `{"1": "TABELA", ...}`. """
+    documents = "\n".join(
+        f"{index}: {json.dumps(fingerprint, ensure_ascii=False, separators=(',', ':'))}"
+        for index, fingerprint in enumerate(fingerprints, start=1)
+    )
 
     prompt = f"""
-    O arquivo PDF contém **informações imobiliárias** e pode conter diferentes formatos.
-    Sua tarefa é **analisar cuidadosamente** o conteúdo e classificar corretamente o **tipo** do documento entre **três categorias**.
+    Os arquivos PDF abaixo contêm **informações imobiliárias** e podem conter diferentes formatos.
+    Sua tarefa é **analisar cuidadosamente** o resumo do conteúdo de cada um e classificar corretamente o **tipo** de cada documento entre **três categorias**.
 
     **Critérios obrigatórios:**
     - **TABELA** → O PDF contém **tabelas estruturadas reais**, com colunas bem definidas e dados extraíveis por sistemas de processamento.
@@ -84,88 +292,295 @@ def identify_pdf_type(pdf_path):
     - **MIX** → O PDF contém **tabelas extraíveis e imagens ao mesmo tempo**.
       - **Somente selecione 'MIX' se houver tabelas extraíveis reais e imagens significativas ao mesmo tempo.**
 
+    **Resumo de cada documento** (um por linha, `número: JSON`): `paginas` é o total de páginas; `caracteres`,
+    `imagens` e `cobertura_imagem` (fração da página ocupada por imagens) são listas com um valor por página
+    analisada; `texto` traz as primeiras linhas da camada de texto.
+
+    {documents}
+
     ❗ **IMPORTANTE:**
-    - Responda exclusivamente com uma das seguintes palavras: `TABELA`, `IMAGEM`, `MIX`
+    - Responda exclusivamente com um objeto JSON que associa o número de cada documento a uma das seguintes palavras: `TABELA`, `IMAGEM`, `MIX`
+      (exemplo: {{"1": "TABELA", "2": "IMAGEM"}}).
     - **Não inclua explicações ou qualquer outro texto na resposta.**
-
-    Nome do arquivo PDF analisado: {os.path.basename(pdf_path)}
     """
 
-    response = openai.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0
-    )
+    logging.info(f"Usando IA para classificar o tipo de {len(fingerprints)} PDF(s) em uma requisição...")
+    with metrics.span("classificacao_ia", documentos=len(fingerprints)) as span:
+        response = call_with_retries(lambda: get_openai_client().chat.completions.create(
+            model=CLASSIFIER_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            response_format={"type": "json_object"},
+            temperature=0
+        ))
+        span.update(prompt_tokens=response.usage.prompt_tokens, completion_tokens=response.usage.completion_tokens)
+
+    try:
+        answers = json.loads(response.choices[0].message.content)
+    except (TypeError, ValueError):
+        logging.error(f"Resposta inválida do classificador: {response.choices[0].message.content!r}")
+        return {}
+    return answers if isinstance(answers, dict) else {}
 
-    doc_type = response.choices[0].message.content.strip()
-    logging.info(f"PDF identificado pela IA como: {doc_type}")
-    return doc_type
 
+def list_pdfs(input_dir):
+    """ Arquivos PDF do diretório, na ordem usada para o CSV consolidado. """
+    return [file for file in os.listdir(input_dir) if file.endswith(".pdf")]
 
-def process_pdfs(input_dir: str, output_csv_path: str):
+
+def process_pdfs(input_dir: str, output_csv_path: str, cpu_workers=None, llm_workers=None, queue_size=None,
+                 on_progress=None, parquet_dir=None):
+    """
+    Processa todos os PDFs do diretório em paralelo (ver `engine.run_pipeline`) e gera o CSV consolidado.
+    A ordem das linhas segue a ordem dos arquivos no diretório, como no processamento sequencial.
+
+    `on_progress(arquivo, status, info)` é chamado ao fim de cada arquivo (`concluido`, `sem_dados`
+    ou `erro`), com tempos de extração/IA, número de linhas e os spans de métricas em `info`.
+    Arquivos já concluídos numa execução anterior interrompida (mesmo CSV e diretório) são pulados.
+    Com `parquet_dir`, as linhas também são gravadas em um conjunto Parquet tipado e particionado
+    (ver `parquet_writer.ParquetDatasetWriter`).
+    """
     logging.info(f"Processando PDFs do diretório: {input_dir}")
     logging.info(f"CSV consolidado será salvo em: {output_csv_path}")
 
-    all_extracted_data = []
+    # As linhas são gravadas à medida que cada documento termina; uma execução interrompida
+    # é retomada a partir do último arquivo concluído (ver `csv_writer.StreamingCsvWriter`)
+    writer = StreamingCsvWriter(output_csv_path, input_dir)
+    parquet = ParquetDatasetWriter(parquet_dir) if parquet_dir else None
+    files = list_pdfs(input_dir)
 
-    for file in os.listdir(input_dir):
-        if file.endswith(".pdf"):
-            temp_pdf_path = os.path.join(TEMP_DIR, file)
-            original_pdf_path = os.path.join(input_dir, file)
-            shutil.copy2(original_pdf_path, temp_pdf_path)
+    if on_progress:
+        for file in files:
+            if writer.is_completed(file):
+                on_progress(file, "concluido", {"tempo_extracao": None, "tempo_ia": None, "erro": None,
+                                                "spans": [], "linhas": writer.completed[file]})
+    files = [file for file in files if not writer.is_completed(file)]
 
-            logging.info(f"Arquivo movido para temp: {file}")
+    try:
+        for file, status, rows, stats in process_files(input_dir, files, cpu_workers, llm_workers, queue_size):
+            # Arquivos com erro não são registrados e serão tentados novamente numa retomada
+            if status != "erro":
+                if parquet:
+                    parquet.write_document(development_name(file), file, rows)
+                writer.write_document(file, rows)
 
-            extracted_data = process_pdf(temp_pdf_path)
+            if on_progress:
+                on_progress(file, status, dict(stats, linhas=len(rows)))
+    finally:
+        writer.close()
 
-            # Obtenção nome do arquivo.pdf para nomear empreendimento
-            file_name = os.path.splitext(file)[0]
-            safe_name = unicodedata.normalize('NFKD', file_name).encode('ASCII', 'ignore').decode('utf-8').replace(" ", "_")
+    output_csv = writer.finalize()
+    if output_csv:
+        logging.info(f"CSV consolidado salvo em: {output_csv} ({writer.rows} linhas)")
+        return output_csv
 
-            if extracted_data:
-                for row in extracted_data:
-                    row["nome_empreendimento"] = safe_name
-                all_extracted_data.extend(extracted_data)
+    logging.warning(f"Nenhum dado extraído dos PDFs no diretório {input_dir}")
+    return None
 
-            os.remove(temp_pdf_path)
-            logging.info(f"Arquivo removido: {file}")
 
-    if all_extracted_data:
-        df = pd.DataFrame(all_extracted_data, columns=["nome_empreendimento", "unidade", "disponibilidade", "valor"])
-        df["valor"] = df["valor"].astype(str).str.replace(".", "", regex=False)
-        df["valor"] = df["valor"].str.replace(",", ".", regex=False)
-        df.to_csv(output_csv_path, sep=";", index=False, encoding="utf-8")
-        logging.info(f"CSV consolidado salvo em: {output_csv_path}")
-    else:
-        logging.warning(f"Nenhum dado extraído dos PDFs no diretório {input_dir}")
+def development_name(file):
+    """ Nome do empreendimento a partir do nome do arquivo (sem acentos e com `_` no lugar de espaços). """
+    file_name = os.path.splitext(file)[0]
+    return unicodedata.normalize('NFKD', file_name).encode('ASCII', 'ignore').decode('utf-8').replace(" ", "_")
 
 
-def process_pdf(pdf_path):
+def process_files(input_dir, files, cpu_workers=None, llm_workers=None, queue_size=None):
+    """
+    Processa os PDFs `files` (nomes dentro de `input_dir`) em paralelo (ver `engine.run_pipeline`) e gera,
+    na ordem de `files`, `(arquivo, status, linhas, estatisticas)` com o status `concluido`, `sem_dados`
+    ou `erro`. `files` pode ser um iterável que bloqueia até o próximo arquivo chegar (ver `uploads`).
+
+    Documentos que a heurística não classifica ficam pendentes até reunir `CLASSIFY_BATCH_SIZE` deles,
+    até o mais antigo esperar `CLASSIFY_MAX_WAIT` segundos (verificado a cada resultado) ou até o fim da
+    entrada; então são classificados pela IA em lote (`classify_documents_with_ai`) e processados numa
+    segunda passada. Para manter a ordem, os resultados a partir do primeiro documento pendente aguardam
+    essa passada e são entregues logo em seguida.
+
+    As estatísticas trazem também o `hash` do conteúdo calculado na extração (`None` se o documento
+    não tiver conteúdo), para quem precisa dele não ler o arquivo de novo (ver `watcher`).
+    """
+    pipeline = partial(run_pipeline, cpu_workers=cpu_workers, llm_workers=llm_workers, queue_size=queue_size)
+
+    # Hash de cada documento, registrado no estágio de IA (processo principal), onde a extração chega
+    hashes = {}
+
+    def interpret(extraction):
+        if extraction:
+            hashes[extraction["arquivo"]] = extraction["hash"]
+        return interpret_pdf(extraction)
+
+    def with_hash(file, stats):
+        return dict(stats, hash=hashes.pop(os.path.join(input_dir, file), None))
+
+    def classify_held(held, pending):
+        doc_types = classify_documents_with_ai({
+            file: (extraction["hash"], extraction["impressao"]) for file, (extraction, _) in pending.items()
+        })
+        classified = [file for file, doc_type in doc_types.items() if doc_type]
+        second_pass = {
+            file: (extracted_data, with_hash(file, stats))
+            for file, extracted_data, stats in pipeline(
+                classified, partial(extract_pdf_file, input_dir, doc_types=doc_types), interpret
+            )
+        }
+
+        for file, extracted_data, stats in held:
+            if file in pending:
+                if file not in second_pass:
+                    logging.error(f"Tipo de PDF desconhecido: {file}")
+                    extracted_data = None
+                else:
+                    extracted_data, retry_stats = second_pass[file]
+                    stats = _merge_stats(stats, retry_stats)
+            yield _file_result(file, extracted_data, stats)
+
+    held = []
+    pending = {}
+    waiting_since = None
+    for file, extracted_data, stats in pipeline(files, partial(extract_pdf_file, input_dir), interpret):
+        stats = with_hash(file, stats)
+        if isinstance(extracted_data, dict):
+            if not pending:
+                waiting_since = time.monotonic()
+            pending[file] = (extracted_data, stats)
+        if not pending:
+            yield _file_result(file, extracted_data, stats)
+            continue
+
+        held.append((file, extracted_data, stats))
+        if len(pending) >= CLASSIFY_BATCH_SIZE or time.monotonic() - waiting_since >= CLASSIFY_MAX_WAIT:
+            batch, held, pending = (held, pending), [], {}
+            yield from classify_held(*batch)
+
+    if pending:
+        yield from classify_held(held, pending)
+
+
+def _file_result(file, extracted_data, stats):
+    # Obtenção nome do arquivo.pdf para nomear empreendimento
+    safe_name = development_name(file)
+    for row in extracted_data or []:
+        row["nome_empreendimento"] = safe_name
+
+    status = "erro" if stats["erro"] else ("concluido" if extracted_data else "sem_dados")
+    return file, status, extracted_data or [], stats
+
+
+def _merge_stats(first, second):
+    """ Estatísticas de um arquivo processado em duas passadas (antes e depois da classificação pela IA). """
+    return {
+        "tempo_extracao": round((first["tempo_extracao"] or 0) + (second["tempo_extracao"] or 0), 2),
+        "tempo_ia": round((first["tempo_ia"] or 0) + (second["tempo_ia"] or 0), 2),
+        "erro": first["erro"] or second["erro"],
+        "spans": first["spans"] + second["spans"],
+        "hash": first.get("hash") or second.get("hash"),
+    }
+
+
+def extract_pdf_file(input_dir, file, doc_types=None):
+    """
+    Estágio CPU do lote: extrai o conteúdo do PDF lendo-o diretamente do diretório de entrada
+    (os extratores só leem o arquivo, então não há cópia para uma pasta compartilhada).
+    `doc_types` traz os tipos já definidos pela IA na segunda passada de `process_files`.
+    """
+    return extract_pdf(os.path.join(input_dir, file), doc_type=(doc_types or {}).get(file))
+
+
+def extract_pdf(pdf_path, content_hash=None, doc_type=None):
+    """
+    Classifica o PDF e extrai seu conteúdo (pdfplumber/OCR), sem chamar a IA de extração.
+    Cada estágio é reaproveitado do cache quando o conteúdo do arquivo não mudou.
+    Retorna `{"arquivo", "hash", "tipo", "dados"}` ou `None`.
+
+    Se nem a heurística nem o cache da IA definem o tipo (e `doc_type` não foi informado), retorna
+    `{"arquivo", "hash", "tipo": None, "impressao"}` para a classificação em lote pela IA.
+    """
     logging.info(f"Processando PDF: {pdf_path}")
+    content_hash = content_hash or cache.file_hash(pdf_path)
+
+    # Uma sessão por documento: classificador e workers compartilham as páginas já interpretadas
+    with PdfDocument(pdf_path) as document:
+        classification = cache.cached(content_hash, "classificacao", CLASSIFIER_VERSION, partial(classify_pdf, document))
+        doc_type = doc_type or identify_pdf_type(pdf_path, classification, content_hash)
+
+        if doc_type == "TABELA":
+            # Reaproveita a classificação: só lê no pdfplumber as páginas com texto
+            stage = "pdfplumber"
+            extract = partial(extract_tables_from_pdf, document, pages=pages_of_type(classification, "TEXTO", "MIX"))
+        elif doc_type == "IMAGEM":
+            stage = "ocr"
+            extract = partial(extract_text_ocr, document)
+        elif doc_type == "MIX":
+            stage = "mix"
+            if pages_of_type(classification, "TEXTO", "MIX", "IMAGEM") is not None:
+                # Classificação completa por página: OCR só nas páginas que são apenas imagem
+                extract = partial(extract_pdf_by_page, document, classification)
+            else:
+                extract = partial(extract_pdf_combined, document)
+        else:
+            logging.info(f"Tipo de PDF não identificado pela heurística; aguardando classificação pela IA: {pdf_path}")
+            return {"arquivo": pdf_path, "hash": content_hash, "tipo": None,
+                    "impressao": pdf_fingerprint(document, classification)}
+
+        # Páginas que a extração não vai reler (imagem ou vazias) são liberadas antes dela
+        document.retain([] if doc_type == "IMAGEM" else pages_of_type(classification, "TEXTO", "MIX"))
+        extracted_data = cache.cached(content_hash, stage, EXTRACTION_VERSION, extract)
 
-    file_name = os.path.splitext(os.path.basename(pdf_path))[0]
-    doc_type = identify_pdf_type(pdf_path)
+    if not extracted_data:
+        logging.warning(f"Nenhum dado extraído do PDF {pdf_path}.")
+        return None
 
-    extracted_data = None
+    return {"arquivo": pdf_path, "hash": content_hash, "tipo": doc_type, "dados": extracted_data}
 
-    if doc_type == "TABELA":
-        extracted_data = extract_tables_from_pdf(pdf_path)
-    elif doc_type == "IMAGEM":
-        extracted_data = extract_text_ocr(pdf_path)
-        if extracted_data and "ocr_text" in extracted_data:
-            extracted_data = process_ocr_with_langchain(extracted_data)
-    elif doc_type == "MIX":
-        extracted_data = process_pdf_combined(pdf_path)
-    else:
-        logging.error(f"Tipo de PDF desconhecido: {pdf_path}")
+
+def interpret_pdf(extraction):
+    """ Estágio de IA: organiza o conteúdo extraído por `extract_pdf` em linhas de unidades. """
+    if not extraction:
         return None
+    if not extraction["tipo"]:
+        return extraction  # Aguarda a classificação em lote (ver `process_files`)
+
+    pdf_path, doc_type, data = extraction["arquivo"], extraction["tipo"], extraction["dados"]
+
+    extracted_data = cache.get(extraction["hash"], "llm", LLM_CACHE_VERSION)
+    if extracted_data:
+        return extracted_data
+
+    extracted_data = None
+    if doc_type in ("TABELA", "IMAGEM") and data.get("tables"):
+        # Tabelas bem formadas (do pdfplumber ou do OCR por células) são mapeadas por regras;
+        # a IA só é usada quando a confiança é baixa
+        with metrics.span("mapeamento") as span:
+            extracted_data = map_tables_to_rows(data["tables"], pages=data.get("table_pages"))
+            span["linhas"] = len(extracted_data or [])
+
+    if extracted_data is None:
+        if doc_type == "TABELA":
+            extracted_data = process_with_langchain(data)
+        elif doc_type == "IMAGEM":
+            extracted_data = process_ocr_with_langchain(data) if "ocr_text" in data else None
+        else:
+            extracted_data = process_combined_with_langchain(data)
 
     if not extracted_data:
         logging.warning(f"Nenhum dado extraído do PDF {pdf_path}.")
         return None
 
-    json_output_path = os.path.join(TEMP_DIR, f"{file_name}.json")
-    with open(json_output_path, "w", encoding="utf-8") as json_file:
-        json.dump(extracted_data, json_file, indent=4, ensure_ascii=False)
-
+    cache.put(extraction["hash"], "llm", LLM_CACHE_VERSION, extracted_data)
     return extracted_data
+
+
+def classify_pending(extraction):
+    """ Classifica pela IA um documento pendente (`tipo` `None`) e refaz a extração com o tipo definido. """
+    pdf_path = extraction["arquivo"]
+    doc_type = classify_documents_with_ai({pdf_path: (extraction["hash"], extraction["impressao"])})[pdf_path]
+    if not doc_type:
+        logging.error(f"Tipo de PDF desconhecido: {pdf_path}")
+        return None
+    return extract_pdf(pdf_path, extraction["hash"], doc_type)
+
+
+def process_pdf(pdf_path):
+    extraction = extract_pdf(pdf_path)
+    if extraction and not extraction["tipo"]:
+        extraction = classify_pending(extraction)
+    return interpret_pdf(extraction)
@@ -0,0 +1,108 @@
+import time
+import pytest
+import broker
+from broker import SqliteBroker, get_broker
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(broker, "RETRY_DELAY", 0)
+    return SqliteBroker(str(tmp_path / "broker.db"), max_attempts=2)
+
+
+def test_enqueue_is_idempotent(queue):
+    queue.enqueue([("a", {"arquivo": "a.pdf"}), ("b", {"arquivo": "b.pdf"})])
+    queue.enqueue([("a", {"arquivo": "a.pdf"})])
+
+    assert [queue.claim("w1")["id"], queue.claim("w1")["id"]] == ["a", "b"]
+    assert queue.claim("w1") is None
+
+
+def test_claimed_task_is_hidden_until_the_lease_expires(queue):
+    queue.enqueue([("a", {})])
+
+    task = queue.claim("w1", visibility_timeout=0.2)
+    assert task == {"id": "a", "payload": {}, "attempts": 1}
+    assert queue.claim("w2") is None
+
+    time.sleep(0.3)
+    assert queue.claim("w2")["attempts"] == 2
+
+
+def test_extend_only_renews_the_owner_lease(queue):
+    queue.enqueue([("a", {})])
+    queue.claim("w1", visibility_timeout=0.2)
+
+    queue.extend(["a"], "w2", visibility_timeout=60)
+    time.sleep(0.3)
+    queue.claim("w2", visibility_timeout=0.2)
+
+    queue.extend(["a"], "w2", visibility_timeout=60)
+    time.sleep(0.3)
+    assert queue.claim("w3") is None
+
+
+def test_expired_task_without_attempts_left_becomes_error(queue):
+    queue.enqueue([("a", {})])
+    queue.claim("w1", visibility_timeout=0)
+    queue.claim("w2", visibility_timeout=0)
+
+    time.sleep(0.01)
+    assert queue.claim("w3") is None
+    task = queue.get_tasks(["a"])["a"]
+    assert task["status"] == "erro"
+    assert task["error"] == "Prazo de visibilidade expirado"
+
+
+def test_fail_requeues_then_marks_error(queue):
+    queue.enqueue([("a", {})])
+
+    queue.claim("w1")
+    assert queue.fail("a", "w1", "falha 1")
+    assert queue.get_tasks(["a"])["a"]["status"] == "pendente"
+
+    queue.claim("w1")
+    assert queue.fail("a", "w1", "falha 2")
+    task = queue.get_tasks(["a"])["a"]
+    assert (task["status"], task["attempts"], task["error"]) == ("erro", 2, "falha 2")
+
+    # Reenviar uma tarefa com erro a devolve para a fila
+    queue.enqueue([("a", {})])
+    assert queue.claim("w1")["attempts"] == 1
+
+
+def test_fail_from_a_worker_that_lost_the_lease_is_ignored(queue):
+    queue.enqueue([("a", {})])
+    queue.claim("w1", visibility_timeout=0)
+    time.sleep(0.01)
+    queue.claim("w2")
+
+    assert not queue.fail("a", "w1", "atrasado")
+    task = queue.get_tasks(["a"])["a"]
+    assert (task["status"], task["error"]) == ("processando", None)
+
+
+def test_complete_once(queue):
+    queue.enqueue([("a", {})])
+    queue.claim("w1")
+
+    assert queue.complete("a", {"linhas": []})
+    assert not queue.complete("a", {"linhas": [1]})
+    assert queue.get_tasks(["a"])["a"]["result"] == {"linhas": []}
+
+
+def test_purge_removes_only_old_finished_tasks(queue):
+    queue.enqueue([("a", {}), ("b", {})])
+    queue.claim("w1")
+    queue.complete("a", {})
+
+    assert queue.purge(retention_hours=1) == 0
+    assert queue.purge(retention_hours=0) == 1
+    assert list(queue.get_tasks(["a", "b"])) == ["b"]
+
+
+def test_get_broker(tmp_path):
+    assert get_broker("") is None
+    assert get_broker(f"sqlite://{tmp_path}/b.db").path == f"{tmp_path}/b.db"
+    with pytest.raises(ValueError):
+        get_broker("redis://localhost")
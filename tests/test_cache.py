@@ -0,0 +1,107 @@
+import os
+import pytest
+import cache
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(cache, "CACHE_MAX_BYTES", 1024 * 1024)
+    monkeypatch.setattr(cache, "_known_size", None)
+    monkeypatch.setattr(cache, "_puts_since_scan", 0)
+    return tmp_path
+
+
+def entry_files(directory):
+    return sorted(os.path.join(root, name) for root, _, files in os.walk(directory) for name in files)
+
+
+def test_cached_computes_once(cache_dir):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return [{"unidade": "101"}]
+
+    assert cache.cached("abc", "llm", "v1", compute) == [{"unidade": "101"}]
+    assert cache.cached("abc", "llm", "v1", compute) == [{"unidade": "101"}]
+    assert len(calls) == 1
+
+
+def test_version_and_stage_are_part_of_the_key(cache_dir):
+    cache.put("abc", "llm", "v1", ["a"])
+
+    assert cache.get("abc", "llm", "v2") is None
+    assert cache.get("abc", "ocr", "v1") is None
+    assert cache.get("abc", "llm", "v1") == ["a"]
+
+
+@pytest.mark.parametrize("empty", [None, [], {}, ""])
+def test_empty_results_are_not_stored(cache_dir, empty):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return empty
+
+    assert cache.cached("abc", "llm", "v1", compute) == empty
+    assert cache.cached("abc", "llm", "v1", compute) == empty
+    assert len(calls) == 2
+    assert entry_files(cache_dir) == []
+
+
+def test_failed_compute_is_not_stored(cache_dir):
+    def compute():
+        raise RuntimeError("falha")
+
+    with pytest.raises(RuntimeError):
+        cache.cached("abc", "llm", "v1", compute)
+    assert entry_files(cache_dir) == []
+
+
+def test_disabled_cache(cache_dir, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_MAX_BYTES", 0)
+
+    cache.put("abc", "llm", "v1", ["a"])
+    assert cache.get("abc", "llm", "v1") is None
+    assert entry_files(cache_dir) == []
+
+
+def test_evict_removes_least_recently_used(cache_dir):
+    value = ["x" * 1000]
+    for index in range(5):
+        cache.put(f"doc{index}", "llm", "v1", value)
+        os.utime(cache._entry_path(f"doc{index}", "llm", "v1"), (index, index))
+    os.utime(cache._entry_path("doc0", "llm", "v1"), (10, 10))  # Lido por último
+
+    entry_size = os.path.getsize(cache._entry_path("doc0", "llm", "v1"))
+    cache.evict(max_bytes=entry_size * 3)
+
+    kept = [index for index in range(5) if cache.get(f"doc{index}", "llm", "v1") is not None]
+    assert kept == [0, 3, 4]
+    assert cache._known_size == entry_size * 3
+
+
+def test_put_tracks_size_without_rescanning(cache_dir, monkeypatch):
+    scans = []
+    evict = cache.evict
+    monkeypatch.setattr(cache, "evict", lambda *args: scans.append(1) or evict(*args))
+
+    for index in range(10):
+        cache.put(f"doc{index}", "llm", "v1", ["x" * 100])
+
+    assert len(scans) == 1  # Só a primeira gravação varre o diretório
+    assert cache._known_size == sum(os.path.getsize(path) for path in entry_files(cache_dir))
+
+
+def test_put_evicts_when_over_the_limit(cache_dir, monkeypatch):
+    cache.put("doc0", "llm", "v1", ["x" * 1000])
+    entry_size = os.path.getsize(cache._entry_path("doc0", "llm", "v1"))
+    monkeypatch.setattr(cache, "CACHE_MAX_BYTES", entry_size * 2)
+
+    for index in range(1, 5):
+        cache.put(f"doc{index}", "llm", "v1", ["x" * 1000])
+        os.utime(cache._entry_path(f"doc{index}", "llm", "v1"), (index, index))
+
+    assert len(entry_files(cache_dir)) <= 2
+    assert cache.get("doc4", "llm", "v1") is not None
@@ -0,0 +1,53 @@
+import csv
+from csv_writer import CSV_COLUMNS, normalize_row, replace_developments
+
+
+def unit(development, number, value="1.000,00"):
+    return {"nome_empreendimento": development, "unidade": number, "disponibilidade": "Disponível", "valor": value}
+
+
+def read_csv(path):
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        return list(csv.reader(file, delimiter=";"))
+
+
+def test_normalize_row():
+    assert normalize_row(unit("A", "101", "492.030,00")) == ["A", "101", "Disponível", "492030.00"]
+    assert normalize_row({"unidade": 7, "valor": None}) == ["", "7", "", ""]
+
+
+def test_creates_the_csv(tmp_path):
+    path = tmp_path / "resultado.csv"
+
+    assert replace_developments(path, {"A": [unit("A", "101")]}) == 1
+    assert read_csv(path) == [CSV_COLUMNS, ["A", "101", "Disponível", "1000.00"]]
+
+
+def test_replaces_rows_in_place_and_appends_new_developments(tmp_path):
+    path = tmp_path / "resultado.csv"
+    replace_developments(path, {"A": [unit("A", "101")], "B": [unit("B", "201"), unit("B", "202")],
+                                "C": [unit("C", "301")]})
+
+    total = replace_developments(path, {"B": [unit("B", "203")], "D": [unit("D", "401")]})
+
+    assert total == 4
+    assert [row[:2] for row in read_csv(path)[1:]] == [["A", "101"], ["B", "203"], ["C", "301"], ["D", "401"]]
+
+
+def test_empty_list_removes_the_development(tmp_path):
+    path = tmp_path / "resultado.csv"
+    replace_developments(path, {"A": [unit("A", "101")], "B": [unit("B", "201")]})
+
+    assert replace_developments(path, {"A": [], "X": []}) == 1
+    assert [row[:2] for row in read_csv(path)[1:]] == [["B", "201"]]
+
+
+def test_untouched_rows_are_copied_verbatim(tmp_path):
+    path = tmp_path / "resultado.csv"
+    path.write_text("nome_empreendimento;unidade;disponibilidade;valor\nA;101;Reservado;Indisponível\n",
+                    encoding="utf-8")
+
+    replace_developments(path, {"B": [unit("B", "201")]})
+
+    assert read_csv(path)[1] == ["A", "101", "Reservado", "Indisponível"]
+    assert not (tmp_path / "resultado.csv.tmp").exists()
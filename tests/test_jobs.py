@@ -0,0 +1,67 @@
+import os
+import time
+import socket
+import sqlite3
+import pytest
+import jobs
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_DB_PATH", str(tmp_path / "jobs.db"))
+    jobs.init_db()
+    return jobs.JOBS_DB_PATH
+
+
+def insert_job(path, job_id, owner, heartbeat_at):
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, status, input_dir, output_csv, created_at, owner, heartbeat_at)"
+            " VALUES (?, 'processando', 'entrada', 'saida.csv', ?, ?, ?)",
+            (job_id, time.time(), owner, heartbeat_at),
+        )
+        conn.execute("INSERT INTO job_files (job_id, file, position, status) VALUES (?, 'a.pdf', 0, 'pendente')",
+                     (job_id,))
+
+
+def test_owner_alive():
+    now = time.time()
+    parent = f"{socket.gethostname()}:{os.getppid()}"
+
+    assert jobs._owner_alive("outra-maquina:123", now)
+    assert not jobs._owner_alive("outra-maquina:123", now - jobs.JOB_LEASE_SECONDS - 1)
+    assert not jobs._owner_alive("outra-maquina:123", None)
+    assert jobs._owner_alive(parent, now)
+    assert not jobs._owner_alive(parent, now - jobs.JOB_LEASE_SECONDS - 1)
+    assert not jobs._owner_alive(jobs.OWNER, now)  # Mesmo pid: processo anterior
+    assert not jobs._owner_alive(None, now)
+
+
+def test_init_db_interrupts_only_expired_jobs(db):
+    insert_job(db, "vivo", "outra-maquina:123", time.time())
+    insert_job(db, "expirado", "outra-maquina:456", time.time() - jobs.JOB_LEASE_SECONDS - 1)
+
+    jobs.init_db()
+
+    assert jobs.get_job("vivo")["status"] == "processando"
+    expired = jobs.get_job("expirado")
+    assert expired["status"] == "interrompido" and expired["files"][0]["status"] == "interrompido"
+
+
+def test_get_job_interrupts_a_job_whose_lease_expired(db, monkeypatch):
+    insert_job(db, "job", "outra-maquina:123", time.time())
+    assert jobs.get_job("job")["status"] == "processando"
+
+    monkeypatch.setattr(jobs, "JOB_LEASE_SECONDS", 0)
+    assert jobs.get_job("job")["status"] == "interrompido"
+
+
+def test_renewal_only_touches_the_jobs_of_this_process(db):
+    insert_job(db, "meu", jobs.OWNER, 0)
+    insert_job(db, "outro", "outra-maquina:123", 0)
+
+    jobs._renew_jobs()
+
+    with sqlite3.connect(db) as conn:
+        heartbeats = dict(conn.execute("SELECT id, heartbeat_at FROM jobs"))
+    assert heartbeats["meu"] > time.time() - 5 and heartbeats["outro"] == 0
@@ -0,0 +1,67 @@
+from json_stream import JsonArrayParser
+
+
+def feed_all(parser, text, size=3):
+    elements = []
+    for start in range(0, len(text), size):
+        elements.extend(parser.feed(text[start:start + size]))
+    return elements
+
+
+def test_elements_are_returned_as_they_close():
+    parser = JsonArrayParser()
+    text = '```json\n[["101", "Disponível", "1.000,00"], ["102", "Reservado", "Indisponível"]]\n```'
+
+    assert feed_all(parser, text) == [["101", "Disponível", "1.000,00"], ["102", "Reservado", "Indisponível"]]
+    assert parser.found and parser.complete
+
+
+def test_array_inside_object_and_strings_with_brackets():
+    parser = JsonArrayParser()
+    text = '{"unidades": [{"unidade": "A]1", "valor": "\\"[x]\\""}, {"unidade": "A2"}]}'
+
+    assert feed_all(parser, text, size=1) == [{"unidade": "A]1", "valor": '"[x]"'}, {"unidade": "A2"}]
+    assert parser.complete
+
+
+def test_truncated_response_keeps_complete_elements():
+    parser = JsonArrayParser()
+    text = '[["101", "Disponível", "1,00"], ["102", "Disp'
+
+    assert feed_all(parser, text) == [["101", "Disponível", "1,00"]]
+    assert not parser.complete
+    assert parser.consumed == '[["101", "Disponível", "1,00"]'
+
+
+def test_continuation_starts_inside_the_array():
+    first = JsonArrayParser()
+    first.feed('[["101", "Disponível", "1,00"], ["10')
+
+    # A continuação pode repetir a vírgula ou reabrir o array antes do primeiro elemento
+    for continuation in (', ["102", "Reservado", "2,00"]]', '[["102", "Reservado", "2,00"]]'):
+        parser = JsonArrayParser(in_array=True)
+        assert feed_all(parser, continuation) == [["102", "Reservado", "2,00"]]
+        assert parser.complete
+
+
+def test_invalid_element_is_dropped():
+    parser = JsonArrayParser()
+
+    assert parser.feed('[{"a": 1,}, {"b": 2}]') == [{"b": 2}]
+    assert parser.complete
+
+
+def test_text_after_the_array_is_ignored():
+    parser = JsonArrayParser()
+
+    assert parser.feed('[[1]] [[2]]') == [[1]]
+    assert parser.complete
+
+
+def test_continuation_opening_with_an_element():
+    parser = JsonArrayParser(in_array=True)
+
+    assert feed_all(parser, '["102", "Reservado", "2,00"], ["103", "Permuta", "3,00"]]', size=1) == [
+        ["102", "Reservado", "2,00"], ["103", "Permuta", "3,00"],
+    ]
+    assert parser.complete
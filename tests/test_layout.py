@@ -0,0 +1,53 @@
+import time
+import threading
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+import numpy as np
+from workers import layout, ocr_pool
+
+_lock = threading.Lock()
+_running = 0
+_peak = 0
+
+
+def slow_region(gray, box, lang):
+    global _running, _peak
+    with _lock:
+        _running += 1
+        _peak = max(_peak, _running)
+    time.sleep(0.1)
+    with _lock:
+        _running -= 1
+    return "texto"
+
+
+def page_image():
+    image = np.full((1200, 1000), 255, np.uint8)
+    for line in range(6):
+        cv2.putText(image, "Unidade 101 Disponivel 1.000,00", (50, 100 + line * 180), cv2.FONT_HERSHEY_SIMPLEX, 1.0, 0, 2)
+    return image
+
+
+def read_and_measure(region_workers):
+    """ Lê a página e retorna o pico de regiões lidas ao mesmo tempo neste processo. """
+    global _peak
+    _peak = 0
+    result = layout.read_page_layout(page_image(), region_workers=region_workers)
+    assert result["texto"].count("texto") >= 3
+    return _peak
+
+
+@pytest.fixture(autouse=True)
+def fake_tesseract(monkeypatch):
+    monkeypatch.setattr(layout, "_read_text", slow_region)
+
+
+def test_regions_in_parallel_in_the_calling_process():
+    assert read_and_measure(3) == 3
+    assert read_and_measure(1) == 1
+
+
+def test_regions_in_parallel_inside_the_ocr_pool():
+    # Os processos do pool de OCR não reduzem as threads por região
+    assert ocr_pool.map_pages(read_and_measure, [3, 3], max_workers=2) == [3, 3]
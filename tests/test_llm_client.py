@@ -0,0 +1,54 @@
+import pytest
+import llm_client
+from llm_client import IncompleteResponse, stream_chain
+from benchmarks.mock_llm import MockLLMServer
+from workers.chunking import table_to_text
+from workers.prompts import EXTRACTION_TOOL, extraction_prompt, extraction_inputs
+
+TABLE = [["Unidade", "Situação", "Valor"]] + [[f"{100 + i}", "Disponível", f"{400 + i}.000,00"] for i in range(40)]
+
+
+@pytest.fixture
+def mock_llm(monkeypatch):
+    servers = []
+
+    def start(**options):
+        server = MockLLMServer(latency=0, **options).start()
+        servers.append(server)
+        monkeypatch.setenv("OPENAI_API_KEY", "mock")
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        monkeypatch.setenv("OPENAI_API_BASE", server.base_url)
+        llm_client.get_chat_model.cache_clear()
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+    llm_client.get_chat_model.cache_clear()
+
+
+def _extract(**options):
+    inputs = extraction_inputs({"tables": table_to_text(TABLE), "context": "Residencial"})
+    return stream_chain(extraction_prompt(), inputs, tool=EXTRACTION_TOOL, **options)
+
+
+def test_complete_response_is_returned(mock_llm):
+    mock_llm()
+    assert len(_extract()) == 40
+
+
+def test_truncated_response_is_continued(mock_llm):
+    server = mock_llm(max_completion_tokens=150)
+
+    rows = _extract(max_continuations=10)
+
+    assert len(rows) == 40
+    assert server.stats["requisicoes"] > 1
+
+
+def test_response_still_truncated_after_the_last_continuation_raises(mock_llm):
+    mock_llm(max_completion_tokens=150)
+
+    with pytest.raises(IncompleteResponse) as error:
+        _extract(max_continuations=1)
+    assert 0 < len(error.value.elements) < 40
@@ -0,0 +1,61 @@
+import time
+import multiprocessing
+import pytest
+from workers import ocr, ocr_pool
+
+
+def timed_sleep(item):
+    start = time.monotonic()
+    time.sleep(0.3)
+    return start, time.monotonic()
+
+
+def max_overlap(intervals):
+    events = sorted([(start, 1) for start, _ in intervals] + [(end, -1) for _, end in intervals])
+    current = peak = 0
+    for _, delta in events:
+        current += delta
+        peak = max(peak, current)
+    return peak
+
+
+@pytest.fixture
+def ocr_slots(monkeypatch):
+    def use(count):
+        monkeypatch.setattr(ocr, "_slots", multiprocessing.BoundedSemaphore(count))
+    return use
+
+
+def test_single_document_uses_every_ocr_worker(monkeypatch):
+    monkeypatch.setattr(ocr_pool, "DEFAULT_OCR_WORKERS", 8)
+    monkeypatch.setattr(ocr_pool, "DEFAULT_PAGE_WINDOW", 2)
+
+    # A janela de páginas não limita o número de processos
+    assert ocr_pool.ocr_workers(100) == 8
+    assert ocr_pool.ocr_workers(3) == 3
+    assert ocr_pool.ocr_workers(100, max_workers=4) == 4
+    assert ocr_pool.ocr_workers(100, max_workers=32) == 8
+
+
+def test_pages_share_the_machine_slots(ocr_slots):
+    ocr_slots(2)
+
+    intervals = ocr_pool.map_pages(timed_sleep, list(range(6)), max_workers=4, window=6)
+
+    assert len(intervals) == 6
+    assert max_overlap(intervals) == 2
+
+
+def test_window_bounds_pages_in_flight(ocr_slots):
+    ocr_slots(4)
+
+    intervals = ocr_pool.map_pages(timed_sleep, list(range(6)), max_workers=4, window=2)
+
+    assert max_overlap(intervals) == 2
+
+
+def test_serial_path_takes_a_slot(ocr_slots):
+    ocr_slots(1)
+    slots = ocr.shared_ocr_slots()
+
+    assert ocr_pool.map_pages(lambda item: slots.get_value(), [1, 2], max_workers=1) == [0, 0]
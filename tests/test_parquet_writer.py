@@ -0,0 +1,85 @@
+import datetime
+from decimal import Decimal
+import pytest
+
+pytest.importorskip("pyarrow")
+import pyarrow.dataset as ds
+from parquet_writer import ParquetDatasetWriter, parquet_schema, rows_to_table
+
+DATE = datetime.date(2024, 5, 1)
+
+
+def unit(number, value, availability="Disponível", development="Ed_A", page=None):
+    return {"nome_empreendimento": development, "unidade": number, "disponibilidade": availability,
+            "valor": value, "pagina": page}
+
+
+def read_dataset(directory):
+    return ds.dataset(directory, partitioning="hive").to_table().sort_by("unidade").to_pylist()
+
+
+def test_value_parsing():
+    rows = [
+        unit("1", "492.030,00"),
+        unit("2", "R$ 1.250.000,5"),
+        unit("3", "Indisponível", "Reservado"),
+        unit("4", ""),
+        unit("5", None),
+        unit("6", "12,345"),
+        unit("7", "100"),
+    ]
+
+    table = rows_to_table("a.pdf", rows, DATE)
+
+    assert table.schema == parquet_schema()
+    assert table["valor"].to_pylist() == [Decimal("492030.00"), Decimal("1250000.50"), None, None, None, None,
+                                          Decimal("100.00")]
+    assert table["disponivel"].to_pylist() == [True, True, False, False, False, False, True]
+
+
+def test_columns():
+    table = rows_to_table("a.pdf", [unit("1", "1,00", page=3), unit("2", "2,00", "Reservado")], DATE)
+
+    assert table["disponibilidade"].to_pylist() == ["Disponível", "Reservado"]
+    assert table["disponibilidade"].type == parquet_schema().field("disponibilidade").type
+    assert table["arquivo"].to_pylist() == ["a.pdf", "a.pdf"]
+    assert table["pagina"].to_pylist() == [3, None]
+    assert table["data"].to_pylist() == [DATE, DATE]
+
+
+def test_empty_document():
+    assert rows_to_table("a.pdf", [], DATE).num_rows == 0
+
+
+def test_rewrite_replaces_the_document_rows(tmp_path):
+    writer = ParquetDatasetWriter(str(tmp_path), date=DATE)
+    writer.write_document("Ed_A", "Ed_A.pdf", [unit("1", "1,00"), unit("2", "2,00")])
+    writer.write_document("Ed_A", "Ed_A.pdf", [unit("3", "3,00")])
+
+    assert [row["unidade"] for row in read_dataset(tmp_path)] == ["3"]
+
+
+def test_colliding_files_keep_their_rows(tmp_path):
+    writer = ParquetDatasetWriter(str(tmp_path), date=DATE)
+    writer.write_document("Ed_A", "Ed A.pdf", [unit("1", "1,00")])
+    writer.write_document("Ed_A", "Ed_A.pdf", [unit("2", "2,00")])
+
+    assert [(row["unidade"], row["arquivo"]) for row in read_dataset(tmp_path)] == [("1", "Ed A.pdf"),
+                                                                                      ("2", "Ed_A.pdf")]
+
+    # Sem linhas, só as do próprio arquivo são apagadas
+    writer.write_document("Ed_A", "Ed A.pdf", [])
+    assert [row["arquivo"] for row in read_dataset(tmp_path)] == ["Ed_A.pdf"]
+    writer.write_document("Ed_A", "Ed_A.pdf", [])
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_delete_document_removes_every_date(tmp_path):
+    ParquetDatasetWriter(str(tmp_path), date=DATE).write_document("Ed_A", "Ed_A.pdf", [unit("1", "1,00")])
+    writer = ParquetDatasetWriter(str(tmp_path), date=DATE + datetime.timedelta(days=1))
+    writer.write_document("Ed_A", "Ed_A.pdf", [unit("1", "1,00")])
+    writer.write_document("Ed_B", "Ed_B.pdf", [unit("9", "9,00", development="Ed_B")])
+
+    writer.delete_document("Ed_A", "Ed_A.pdf")
+
+    assert [row["nome_empreendimento"] for row in read_dataset(tmp_path)] == ["Ed_B"]
@@ -0,0 +1,55 @@
+import pytest
+import process
+
+
+@pytest.fixture
+def fake_pipeline(monkeypatch):
+    """ Substitui a extração e a IA: `a*.pdf` precisam da classificação pela IA, os demais não. """
+    classified = []
+
+    def run_pipeline(items, extract_fn, interpret_fn, **options):
+        for item in items:
+            yield item, interpret_fn(extract_fn(item)), {"tempo_extracao": 0, "tempo_ia": 0, "erro": None,
+                                                         "spans": []}
+
+    def extract_pdf_file(input_dir, file, doc_types=None):
+        doc_type = (doc_types or {}).get(file) or (None if file.startswith("a") else "TABELA")
+        return {"arquivo": f"{input_dir}/{file}", "hash": file, "tipo": doc_type, "impressao": {}}
+
+    def classify(documents):
+        classified.append(sorted(documents))
+        return {file: "TABELA" for file in documents}
+
+    monkeypatch.setattr(process, "run_pipeline", run_pipeline)
+    monkeypatch.setattr(process, "extract_pdf_file", extract_pdf_file)
+    monkeypatch.setattr(process, "interpret_pdf",
+                        lambda extraction: extraction if not extraction["tipo"] else [{"unidade": "101"}])
+    monkeypatch.setattr(process, "classify_documents_with_ai", classify)
+    return classified
+
+
+def test_pending_documents_are_classified_when_the_batch_is_full(fake_pipeline, monkeypatch):
+    monkeypatch.setattr(process, "CLASSIFY_BATCH_SIZE", 2)
+    received = []
+
+    def files():
+        for file in ["a1.pdf", "b1.pdf", "a2.pdf", "b2.pdf", "a3.pdf"]:
+            received.append(file)
+            yield file
+
+    results = process.process_files("in", files())
+
+    assert [next(results)[:2] for _ in range(3)] == [("a1.pdf", "concluido"), ("b1.pdf", "concluido"),
+                                                      ("a2.pdf", "concluido")]
+    assert received == ["a1.pdf", "b1.pdf", "a2.pdf"]
+    assert [result[:2] for result in results] == [("b2.pdf", "concluido"), ("a3.pdf", "concluido")]
+    assert fake_pipeline == [["a1.pdf", "a2.pdf"], ["a3.pdf"]]
+
+
+def test_pending_documents_are_classified_after_the_max_wait(fake_pipeline, monkeypatch):
+    monkeypatch.setattr(process, "CLASSIFY_MAX_WAIT", 0)
+
+    results = process.process_files("in", iter(["a1.pdf", "b1.pdf"]))
+
+    assert [result[:2] for result in results] == [("a1.pdf", "concluido"), ("b1.pdf", "concluido")]
+    assert fake_pipeline == [["a1.pdf"]]
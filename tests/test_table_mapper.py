@@ -0,0 +1,123 @@
+import json
+from decimal import Decimal
+import pytest
+from workers import worker_table_mapper as mapper
+from workers.worker_table_mapper import format_brl, map_tables_to_rows, mapper_fingerprint, parse_brl
+
+
+@pytest.fixture(autouse=True)
+def reset_synonyms(monkeypatch):
+    monkeypatch.delenv("PDF_TABLE_SYNONYMS", raising=False)
+    monkeypatch.setattr(mapper, "_SYNONYMS", None)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("R$ 1.234,56", Decimal("1234.56")),
+    ("R$ 492.030,00", Decimal("492030.00")),
+    ("492030", Decimal("492030")),
+    ("492.030", Decimal("492030")),
+    ("1.234.567", Decimal("1234567")),
+    ("Indisponível", None),
+    ("", None),
+    (None, None),
+    ("-", None),
+])
+def test_parse_brl(text, expected):
+    assert parse_brl(text) == expected
+
+
+def test_format_brl():
+    assert format_brl(Decimal("1234.56")) == "1.234,56"
+    assert format_brl(Decimal("492030")) == "492.030,00"
+    assert format_brl(Decimal("0.5")) == "0,50"
+
+
+@pytest.mark.parametrize("header", [
+    ["Unidade", "Situação", "Valor"],
+    ["Apto.", "Status", "Preço Total"],
+    ["Nº", "Disp.", "Valor à vista"],
+    ["UNID", "ESTADO", "PREÇO (R$)"],
+])
+def test_header_synonyms(header):
+    rows = map_tables_to_rows([[header, ["101", "Disponível", "R$ 1.234,56"]]])
+
+    assert rows == [{"nome_empreendimento": "", "unidade": "101", "disponibilidade": "Disponível",
+                     "valor": "1.234,56"}]
+
+
+def test_unavailable_values_and_empty_cells():
+    table = [
+        ["Unidade", "Situação", "Valor"],
+        ["101", "Reservado", "Indisponível"],
+        ["102", "Vendido", ""],
+        ["103", "", "-"],
+        ["", "", ""],
+    ]
+
+    rows = map_tables_to_rows([table])
+
+    assert [(row["unidade"], row["disponibilidade"], row["valor"]) for row in rows] == [
+        ("101", "Reservado", "Indisponível"),
+        ("102", "Indeterminado", "Indisponível"),
+        ("103", "Indeterminado", "Indisponível"),
+    ]
+
+
+def test_continuation_table_reuses_the_previous_header():
+    first = [["Unidade", "Situação", "Valor"], ["101", "Disponível", "100.000,00"]]
+    second = [["102", "Disponível", "200.000,00"]]
+
+    rows = map_tables_to_rows([first, second], pages=[1, 2])
+
+    assert [(row["unidade"], row["pagina"]) for row in rows] == [("101", 1), ("102", 2)]
+
+
+def test_low_confidence_falls_back_to_the_llm():
+    table = [
+        ["Unidade", "Situação", "Valor"],
+        ["101", "Disponível", "100.000,00"],
+        ["102", "Disponível", "consulte"],
+    ]
+
+    assert map_tables_to_rows([table], min_confidence=0.9) is None
+    assert len(map_tables_to_rows([table], min_confidence=0.5)) == 2
+
+
+def test_tables_without_a_header_fall_back_to_the_llm():
+    assert map_tables_to_rows([[["101", "Disponível", "100.000,00"]]]) is None
+    assert map_tables_to_rows([]) is None
+
+
+def test_default_min_confidence(monkeypatch):
+    table = [["Unidade", "Valor"], ["101", "100.000,00"], ["102", "consulte"]]
+
+    monkeypatch.setattr(mapper, "MIN_CONFIDENCE", 0.4)
+    assert len(map_tables_to_rows([table])) == 2
+
+    monkeypatch.setattr(mapper, "MIN_CONFIDENCE", 0.6)
+    assert map_tables_to_rows([table]) is None
+
+
+def test_extra_synonyms_from_json(tmp_path, monkeypatch):
+    path = tmp_path / "sinonimos.json"
+    path.write_text(json.dumps({"unidade": ["Código"], "valor": ["Investimento"]}), encoding="utf-8")
+    monkeypatch.setenv("PDF_TABLE_SYNONYMS", str(path))
+
+    rows = map_tables_to_rows([[["Código", "Investimento"], ["A-101", "R$ 350.000,00"]]])
+
+    assert rows[0]["unidade"] == "A-101" and rows[0]["valor"] == "350.000,00"
+
+
+def test_fingerprint_changes_with_the_configuration(tmp_path, monkeypatch):
+    default, min_confidence = mapper_fingerprint(), mapper.MIN_CONFIDENCE
+    assert mapper_fingerprint() == default
+
+    monkeypatch.setattr(mapper, "MIN_CONFIDENCE", min_confidence / 2)
+    assert mapper_fingerprint() != default
+
+    monkeypatch.setattr(mapper, "MIN_CONFIDENCE", min_confidence)
+    path = tmp_path / "sinonimos.json"
+    path.write_text(json.dumps({"valor": ["Investimento"]}), encoding="utf-8")
+    monkeypatch.setenv("PDF_TABLE_SYNONYMS", str(path))
+    monkeypatch.setattr(mapper, "_SYNONYMS", None)
+    assert mapper_fingerprint() != default
@@ -0,0 +1,133 @@
+import os
+import csv
+import json
+import pytest
+import process
+import watcher
+
+
+@pytest.fixture
+def folder(tmp_path, monkeypatch):
+    """ Pasta de entrada cujos "PDFs" trazem as unidades separadas por vírgula (ou `erro`). """
+    input_dir = tmp_path / "entrada"
+    input_dir.mkdir()
+    processed = []
+
+    def process_files(input_dir, files, *args, **kwargs):
+        for file in files:
+            processed.append(file)
+            with open(os.path.join(input_dir, file), encoding="utf-8") as pdf:
+                text = pdf.read()
+            stats = {"tempo_extracao": 0, "tempo_ia": 0, "erro": "falha" if text == "erro" else None, "spans": []}
+            units = [] if stats["erro"] else [
+                {"unidade": number, "disponibilidade": "Disponível", "valor": "1.000,00"} for number in text.split(",")
+            ]
+            yield process._file_result(file, units, stats)
+
+    monkeypatch.setattr(process, "process_files", process_files)
+    monkeypatch.setattr(watcher, "process_files", process_files)
+    return input_dir, str(tmp_path / "resultado.csv"), processed
+
+
+def write(input_dir, file, text, mtime=None):
+    path = input_dir / file
+    path.write_text(text, encoding="utf-8")
+    if mtime:
+        os.utime(path, (mtime, mtime))
+
+
+def read_rows(path):
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        return [row[:2] for row in list(csv.reader(file, delimiter=";"))[1:]]
+
+
+def test_first_sync_processes_everything_and_writes_the_manifest(folder):
+    input_dir, output, processed = folder
+    write(input_dir, "A.pdf", "101,102")
+    write(input_dir, "B.pdf", "201")
+
+    result = watcher.sync_directory(input_dir, output)
+
+    assert sorted(result["alterados"]) == ["A.pdf", "B.pdf"] and result["linhas"] == 3
+    manifest = json.load(open(watcher.manifest_path(output), encoding="utf-8"))
+    assert {file: entry["linhas"] for file, entry in manifest["arquivos"].items()} == {"A.pdf": 2, "B.pdf": 1}
+
+
+def test_unchanged_files_are_not_processed(folder):
+    input_dir, output, processed = folder
+    write(input_dir, "A.pdf", "101")
+    watcher.sync_directory(input_dir, output)
+    processed.clear()
+    statuses = {}
+
+    result = watcher.sync_directory(input_dir, output,
+                                    on_progress=lambda file, status, info: statuses.update({file: status}))
+
+    assert result == {"alterados": [], "removidos": [], "linhas": 1}
+    assert processed == [] and statuses == {"A.pdf": "inalterado"}
+
+
+def test_touched_file_with_the_same_content_is_not_processed(folder):
+    input_dir, output, processed = folder
+    write(input_dir, "A.pdf", "101", mtime=1_000_000)
+    watcher.sync_directory(input_dir, output)
+    processed.clear()
+
+    write(input_dir, "A.pdf", "101", mtime=2_000_000)
+    changed, removed = watcher.scan_changes(str(input_dir), watcher._load_manifest(output, str(input_dir)))
+
+    assert (changed, removed) == ({}, [])
+
+
+def test_added_changed_and_removed_files(folder):
+    input_dir, output, processed = folder
+    write(input_dir, "A.pdf", "101", mtime=1_000_000)
+    write(input_dir, "B.pdf", "201")
+    write(input_dir, "C.pdf", "301")
+    watcher.sync_directory(input_dir, output)
+    processed.clear()
+
+    write(input_dir, "A.pdf", "101,102", mtime=2_000_000)
+    os.remove(input_dir / "B.pdf")
+    write(input_dir, "D.pdf", "401")
+    result = watcher.sync_directory(input_dir, output)
+
+    assert sorted(processed) == ["A.pdf", "D.pdf"]
+    assert sorted(result["alterados"]) == ["A.pdf", "D.pdf"] and result["removidos"] == ["B.pdf"]
+    assert sorted(read_rows(output)) == [["A", "101"], ["A", "102"], ["C", "301"], ["D", "401"]]
+
+
+def test_files_with_the_same_development_name_keep_each_others_rows(folder):
+    input_dir, output, processed = folder
+    write(input_dir, "Area.pdf", "101", mtime=1_000_000)
+    write(input_dir, "Área.pdf", "201")
+    watcher.sync_directory(input_dir, output)
+    assert sorted(read_rows(output)) == [["Area", "101"], ["Area", "201"]]
+
+    write(input_dir, "Area.pdf", "101,102", mtime=2_000_000)
+    result = watcher.sync_directory(input_dir, output)
+
+    assert result["alterados"] == ["Area.pdf"]
+    assert sorted(read_rows(output)) == [["Area", "101"], ["Area", "102"], ["Area", "201"]]
+
+    os.remove(input_dir / "Area.pdf")
+    result = watcher.sync_directory(input_dir, output)
+
+    assert result["removidos"] == ["Area.pdf"]
+    assert read_rows(output) == [["Area", "201"]]
+
+
+def test_error_in_a_colliding_file_keeps_the_previous_rows(folder):
+    input_dir, output, processed = folder
+    write(input_dir, "Area.pdf", "101", mtime=1_000_000)
+    write(input_dir, "Área.pdf", "201", mtime=1_000_000)
+    watcher.sync_directory(input_dir, output)
+
+    write(input_dir, "Area.pdf", "101,102", mtime=2_000_000)
+    write(input_dir, "Área.pdf", "erro", mtime=2_000_000)
+    result = watcher.sync_directory(input_dir, output)
+
+    assert result["alterados"] == []
+    assert sorted(read_rows(output)) == [["Area", "101"], ["Area", "201"]]
+    manifest = json.load(open(watcher.manifest_path(output), encoding="utf-8"))
+    assert manifest["arquivos"]["Area.pdf"]["linhas"] == 1
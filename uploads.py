@@ -0,0 +1,175 @@
+import os
+import json
+import queue
+import shutil
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+from csv_writer import CSV_COLUMNS, normalize_row
+from process import process_files
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Cada upload recebe um diretório próprio aqui, removido ao fim do processamento
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+UPLOADS_DIR = os.getenv("PDF_UPLOADS_DIR", os.path.join(BASE_DIR, "media", "uploads"))
+
+# Uploads processados simultaneamente (cada um usa um pool de extração do `engine`); os demais
+# continuam recebendo os arquivos em disco e começam a processar quando um upload termina
+UPLOAD_WORKERS = int(os.getenv("PDF_UPLOAD_WORKERS", 1))
+
+_executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="pdf-upload")
+
+_END = object()
+
+
+class MultipartSpooler:
+    """
+    Parser incremental de `multipart/form-data`: grava cada PDF do corpo da requisição em
+    `directory` à medida que os blocos chegam e chama `on_file(nome)` quando o arquivo termina.
+    Campos que não são PDFs são ignorados.
+    """
+
+    def __init__(self, content_type, directory, on_file):
+        _, options = parse_options_header(content_type)
+        boundary = options.get(b"boundary")
+        if not boundary:
+            raise ValueError("Cabeçalho Content-Type sem boundary")
+
+        self.directory = directory
+        self.on_file = on_file
+        self.files = []
+        self._headers = {}
+        self._field = b""
+        self._value = b""
+        self._file = None
+        self._name = None
+        self._parser = MultipartParser(boundary, callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data, start, end):
+        self._field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._field.lower()] = self._value
+        self._field, self._value = b"", b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        filename = os.path.basename(options.get(b"filename", b"").decode("utf-8", "replace").replace("\\", "/"))
+        if not filename.lower().endswith(".pdf"):
+            return
+
+        # Nomes repetidos no mesmo upload recebem sufixo para não sobrescrever o anterior
+        base, extension = os.path.splitext(filename)
+        name, suffix = filename, 1
+        while name in self.files:
+            suffix += 1
+            name = f"{base}_{suffix}{extension}"
+
+        self._name = name
+        self._file = open(os.path.join(self.directory, name), "wb")
+
+    def _on_part_data(self, data, start, end):
+        if self._file:
+            self._file.write(data[start:end])
+
+    def _on_part_end(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+            self.files.append(self._name)
+            self.on_file(self._name)
+
+    def write(self, chunk):
+        self._parser.write(chunk)
+
+    def finalize(self):
+        self._parser.finalize()
+        if self._file:
+            self._file.close()
+            raise ValueError(f"Upload incompleto: {self._name}")
+
+
+class UploadBatch:
+    """
+    Processa PDFs enviados por upload à medida que terminam de chegar, em um diretório próprio
+    (sem pasta compartilhada entre requisições). Os resultados por arquivo ficam disponíveis,
+    na ordem de envio, em `results()`.
+    """
+
+    def __init__(self, cpu_workers=None, llm_workers=None, queue_size=None):
+        os.makedirs(UPLOADS_DIR, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix="upload_", dir=UPLOADS_DIR)
+        self.cancelled = threading.Event()
+        self._files = queue.Queue()
+        self._results = queue.Queue()
+        self._future = _executor.submit(self._run, cpu_workers, llm_workers, queue_size)
+
+    def add(self, file):
+        """ Arquivo completo em `directory`: entra imediatamente no pipeline. """
+        self._files.put(file)
+
+    def close(self):
+        """ Fim do upload: nenhum arquivo novo será adicionado. """
+        self._files.put(_END)
+
+    def cancel(self):
+        """
+        Upload inválido, interrompido ou cliente desconectado: nenhum arquivo novo entra no pipeline e
+        o processamento para assim que os documentos em andamento terminam.
+        """
+        self.cancelled.set()
+        self.close()
+
+    def _run(self, cpu_workers, llm_workers, queue_size):
+        total_files = total_rows = 0
+        try:
+            if self.cancelled.is_set():
+                return  # Cancelado enquanto aguardava a vez no executor
+            files = (file for file in iter(self._files.get, _END) if not self.cancelled.is_set())
+            for file, status, rows, stats in process_files(self.directory, files, cpu_workers, llm_workers, queue_size):
+                if self.cancelled.is_set():
+                    break
+                os.remove(os.path.join(self.directory, file))
+                total_files += 1
+                total_rows += len(rows)
+                self._results.put({
+                    "arquivo": file,
+                    "status": status,
+                    "linhas": [dict(zip(CSV_COLUMNS, normalize_row(row))) for row in rows],
+                    "tempo_extracao": stats["tempo_extracao"],
+                    "tempo_ia": stats["tempo_ia"],
+                    **metrics.totals(stats["spans"]),
+                    "erro": stats["erro"],
+                })
+            self._results.put({"status": "fim", "arquivos": total_files, "linhas": total_rows})
+        except Exception as e:
+            logging.exception(f"Erro no processamento do upload {self.directory}")
+            self._results.put({"status": "erro", "erro": str(e)})
+        finally:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self._results.put(_END)
+
+    def results(self):
+        """ Linhas NDJSON: uma por arquivo processado e uma linha final de resumo (bloqueante). """
+        for entry in iter(self._results.get, _END):
+            yield json.dumps(entry, ensure_ascii=False) + "\n"
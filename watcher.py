@@ -0,0 +1,242 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+import cache
+from csv_writer import replace_developments
+from parquet_writer import PARQUET_DIR_NAME, ParquetDatasetWriter
+from process import process_pdfs, process_files, list_pdfs, development_name
+
+# Intervalo entre as varreduras da pasta no modo de observação (segundos)
+WATCH_INTERVAL = float(os.getenv("PDF_WATCH_INTERVAL", 60))
+
+# Arquivos modificados há menos que isso podem ainda estar sendo copiados e ficam para a próxima varredura
+WATCH_SETTLE_SECONDS = float(os.getenv("PDF_WATCH_SETTLE_SECONDS", 5))
+
+
+def manifest_path(output_csv_path):
+    return f"{output_csv_path}.manifest.json"
+
+
+def _load_manifest(output_csv_path, input_dir):
+    """ Manifesto da última sincronização, ou `None` se não existir ou não for deste diretório/CSV. """
+    try:
+        with open(manifest_path(output_csv_path), "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+    if manifest.get("input_dir") != input_dir:
+        logging.warning(f"Manifesto de {output_csv_path} pertence a outro diretório; reprocessando tudo")
+        return None
+    if not os.path.exists(output_csv_path) and any(entry["linhas"] for entry in manifest["arquivos"].values()):
+        logging.warning(f"CSV {output_csv_path} não encontrado; reprocessando tudo")
+        return None
+    return manifest
+
+
+def _save_manifest(output_csv_path, manifest):
+    """ Escrita atômica do manifesto. """
+    path = manifest_path(output_csv_path)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def _file_entry(input_dir, file, rows, content_hash=None):
+    stat = os.stat(os.path.join(input_dir, file))
+    return {
+        "mtime": stat.st_mtime_ns,
+        "tamanho": stat.st_size,
+        "hash": content_hash or cache.file_hash(os.path.join(input_dir, file)),
+        "linhas": rows,
+    }
+
+
+def _total_rows(manifest):
+    return sum(entry["linhas"] for entry in manifest["arquivos"].values())
+
+
+def scan_changes(input_dir, manifest, settle=0):
+    """
+    Compara a pasta com o manifesto. Retorna `(alterados, removidos)`, onde `alterados` mapeia
+    os arquivos novos ou modificados para o hash do conteúdo.
+
+    O hash só é calculado quando `mtime` ou tamanho mudaram; se o conteúdo for o mesmo (arquivo
+    copiado de novo, `touch`), apenas o manifesto é atualizado. Arquivos modificados há menos de
+    `settle` segundos são ignorados nesta varredura.
+    """
+    known = manifest["arquivos"]
+    files = list_pdfs(input_dir)
+    changed = {}
+    now = time.time()
+
+    for file in files:
+        try:
+            stat = os.stat(os.path.join(input_dir, file))
+        except FileNotFoundError:
+            continue
+        entry = known.get(file)
+        if entry and entry["mtime"] == stat.st_mtime_ns and entry["tamanho"] == stat.st_size:
+            continue
+        if now - stat.st_mtime_ns / 1e9 < settle:
+            logging.info(f"Arquivo {file} modificado recentemente; aguardando a próxima varredura")
+            continue
+
+        content_hash = cache.file_hash(os.path.join(input_dir, file))
+        if entry and entry["hash"] == content_hash:
+            entry.update(mtime=stat.st_mtime_ns, tamanho=stat.st_size)
+            continue
+        changed[file] = content_hash
+
+    removed = [file for file in known if file not in files]
+    return changed, removed
+
+
+def sync_directory(input_dir, output_csv_path, cpu_workers=None, llm_workers=None, queue_size=None,
+                   on_progress=None, settle=0, parquet_dir=None):
+    """
+    Atualiza o CSV consolidado processando apenas os PDFs novos ou modificados desde a última execução.
+
+    O estado de cada arquivo (`mtime`, tamanho, hash e número de linhas) fica em `<csv>.manifest.json`.
+    Na primeira execução (ou se o manifesto/CSV não corresponderem), o diretório inteiro é processado por
+    `process_pdfs`. Nas seguintes, os arquivos alterados passam por `process_files` e as linhas do
+    empreendimento correspondente são substituídas no CSV (`csv_writer.replace_developments`); arquivos
+    removidos da pasta têm suas linhas removidas. Se outros arquivos geram o mesmo nome de empreendimento,
+    eles são reprocessados junto (em geral pelo cache), e o empreendimento recebe as linhas de todos eles.
+    Arquivos com erro mantêm as linhas anteriores do empreendimento e são tentados novamente na próxima
+    sincronização.
+
+    `on_progress(arquivo, status, info)` e `parquet_dir` seguem `process_pdfs`; arquivos sem alteração
+    são informados com o status `inalterado`. No Parquet, só as partições dos empreendimentos alterados
+    são regravadas, e as linhas de arquivos removidos são apagadas. Retorna `{"alterados", "removidos", "linhas"}` (`linhas` é o total do CSV).
+    """
+    input_dir = os.path.abspath(input_dir)
+    manifest = _load_manifest(output_csv_path, input_dir)
+
+    if manifest is None:
+        manifest = {"input_dir": input_dir, "arquivos": {}}
+
+        def record(file, status, info):
+            # O hash vem da extração; só arquivos retomados de uma execução anterior são lidos de novo
+            if status != "erro":
+                manifest["arquivos"][file] = _file_entry(input_dir, file, info["linhas"], info.get("hash"))
+            if on_progress:
+                on_progress(file, status, info)
+
+        process_pdfs(input_dir, output_csv_path, cpu_workers, llm_workers, queue_size, on_progress=record,
+                     parquet_dir=parquet_dir)
+        _save_manifest(output_csv_path, manifest)
+        return {"alterados": list(manifest["arquivos"]), "removidos": [], "linhas": _total_rows(manifest)}
+
+    changed, removed = scan_changes(input_dir, manifest, settle=settle)
+
+    if on_progress:
+        for file, entry in manifest["arquivos"].items():
+            if file not in changed and file not in removed:
+                on_progress(file, "inalterado", {"tempo_extracao": None, "tempo_ia": None, "erro": None,
+                                                 "spans": [], "linhas": entry["linhas"]})
+
+    if not changed and not removed:
+        _save_manifest(output_csv_path, manifest)
+        return {"alterados": [], "removidos": [], "linhas": _total_rows(manifest)}
+
+    logging.info(f"Sincronizando {input_dir}: {len(changed)} arquivo(s) novo(s)/alterado(s), {len(removed)} removido(s)")
+
+    # O CSV não guarda o arquivo de origem: arquivos que geram o mesmo nome de empreendimento são
+    # reprocessados juntos (em geral direto do cache) para que as linhas de um não apaguem as do outro
+    touched = {development_name(file) for file in [*changed, *removed]}
+    siblings = [file for file in manifest["arquivos"]
+                if file not in changed and file not in removed and development_name(file) in touched]
+    if siblings:
+        logging.warning(f"Empreendimento(s) gerado(s) por mais de um arquivo; reprocessando também "
+                        f"{', '.join(siblings)} para regravar as linhas de cada um")
+
+    order = {file: index for index, file in enumerate(list_pdfs(input_dir))}
+    files = sorted([*changed, *siblings], key=lambda file: order.get(file, len(order)))
+    rows_by_file = {}
+    failed = set()
+    parquet = ParquetDatasetWriter(parquet_dir) if parquet_dir else None
+    processed = []
+    for file, status, rows, stats in process_files(input_dir, files, cpu_workers, llm_workers, queue_size):
+        # Com erro, as linhas anteriores do empreendimento são mantidas
+        if status == "erro":
+            failed.add(development_name(file))
+        else:
+            rows_by_file[file] = rows
+        if file not in changed:
+            continue
+        if status != "erro" and parquet:
+            parquet.write_document(development_name(file), file, rows)
+        if on_progress:
+            on_progress(file, status, dict(stats, linhas=len(rows)))
+
+    # Arquivos alterados só são registrados se as linhas do seu empreendimento forem regravadas
+    for file in changed:
+        if file in rows_by_file and development_name(file) not in failed:
+            manifest["arquivos"][file] = _file_entry(input_dir, file, len(rows_by_file[file]), changed[file])
+            processed.append(file)
+
+    developments = {name: [] for name in touched if name not in failed}
+    for file in files:
+        if development_name(file) in developments and file in rows_by_file:
+            developments[development_name(file)].extend(rows_by_file[file])
+
+    for file in removed:
+        if development_name(file) in failed:
+            continue  # As linhas do empreendimento não foram regravadas; a remoção fica para a próxima
+        if parquet:
+            parquet.delete_document(development_name(file), file)
+        del manifest["arquivos"][file]
+
+    total = replace_developments(output_csv_path, developments)
+    _save_manifest(output_csv_path, manifest)
+    logging.info(f"CSV consolidado atualizado em: {output_csv_path} ({total} linhas)")
+    return {"alterados": processed, "removidos": [file for file in removed if file not in manifest["arquivos"]],
+            "linhas": total}
+
+
+def watch(input_dir, output_csv_path, interval=WATCH_INTERVAL, settle=WATCH_SETTLE_SECONDS, stop_event=None, **kwargs):
+    """
+    Modo de observação: sincroniza a pasta a cada `interval` segundos até `stop_event` ser definido.
+    Cada varredura custa apenas o `stat` dos arquivos; o processamento acontece só para o que mudou.
+    """
+    stop_event = stop_event or threading.Event()
+    logging.info(f"Observando {input_dir} a cada {interval:g}s; CSV consolidado em {output_csv_path}")
+
+    while not stop_event.is_set():
+        try:
+            sync_directory(input_dir, output_csv_path, settle=settle, **kwargs)
+        except Exception:
+            logging.exception(f"Erro ao sincronizar {input_dir}")
+        stop_event.wait(interval)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Processa apenas os PDFs novos ou alterados de uma pasta.")
+    parser.add_argument("pdf_path", help="Diretório com os arquivos PDF")
+    parser.add_argument("output_dir", help="Diretório onde o CSV consolidado é mantido")
+    parser.add_argument("--interval", type=float, default=WATCH_INTERVAL, help="Segundos entre as varreduras")
+    parser.add_argument("--once", action="store_true", help="Sincroniza uma única vez e encerra")
+    parser.add_argument("--parquet", action="store_true", help="Mantém também o conjunto Parquet particionado")
+    args = parser.parse_args(argv)
+
+    output_csv_path = os.path.join(args.output_dir, "resultado_imoveis.csv")
+    parquet_dir = os.path.join(args.output_dir, PARQUET_DIR_NAME) if args.parquet else None
+    if args.once:
+        result = sync_directory(args.pdf_path, output_csv_path, parquet_dir=parquet_dir)
+        print(json.dumps(result, ensure_ascii=False))
+        return 0
+
+    try:
+        watch(args.pdf_path, output_csv_path, interval=args.interval, parquet_dir=parquet_dir)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
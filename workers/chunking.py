@@ -0,0 +1,134 @@
+import os
+import logging
+import unicodedata
+from llm_client import batch_stream, count_tokens
+from workers.prompts import EXTRACTION_TOOL, extraction_prompt, extraction_inputs, row_to_unit
+
+# Orçamento de tokens de conteúdo por chamada. O limite real é a saída do modelo (4096 tokens
+# no gpt-4-turbo): cada unidade devolvida custa ~15 tokens (linha compacta), então blocos menores evitam respostas cortadas.
+DEFAULT_CHUNK_TOKENS = int(os.getenv("PDF_CHUNK_TOKENS", 3000))
+
+# Chamadas simultâneas à IA para os blocos de um mesmo documento
+DEFAULT_CHUNK_CONCURRENCY = int(os.getenv("PDF_CHUNK_CONCURRENCY", 4))
+
+
+def _clean_cell(cell):
+    return " ".join(str(cell).split()) if cell else ""
+
+
+def table_to_text(table):
+    """ Serializa uma tabela em linhas `;`-separadas (bem mais barato em tokens que JSON indentado). """
+    return "\n".join(";".join(_clean_cell(cell) for cell in row) for row in table)
+
+
+def _split_table(table, budget):
+    """ Divide uma tabela grande em partes dentro do orçamento, repetindo o cabeçalho em cada parte. """
+    header, rows = table[:1], table[1:]
+    header_tokens = count_tokens(table_to_text(header)) if header else 0
+
+    part, part_tokens = [], header_tokens
+    for row in rows:
+        row_tokens = count_tokens(table_to_text([row]))
+        if part and part_tokens + row_tokens > budget:
+            yield header + part
+            part, part_tokens = [], header_tokens
+        part.append(row)
+        part_tokens += row_tokens
+    if part or not rows:
+        yield header + part
+
+
+def _iter_blocks(extracted_data, fields, budget):
+    """ Gera `(campo, texto, tokens)` na ordem do documento, respeitando os limites de página e de tabela. """
+    for field in fields:
+        for item in extracted_data.get(field) or []:
+            if field == "tables":
+                tables = [item]
+                if count_tokens(table_to_text(item)) > budget:
+                    tables = list(_split_table(item, budget))
+                for table in tables:
+                    text = table_to_text(table)
+                    yield field, text, count_tokens(text)
+            else:
+                text = str(item).strip()
+                if text:
+                    yield field, text, count_tokens(text)
+
+
+def chunk_extracted_data(extracted_data, fields, budget=None):
+    """
+    Agrupa o conteúdo extraído (`tables`, `context`, `ocr_text`) em blocos de até `budget` tokens.
+
+    Cada bloco é um dicionário com os mesmos campos, já serializados em texto compacto e prontos
+    para o prompt. Páginas e tabelas nunca são misturadas no meio; apenas tabelas maiores que o
+    orçamento são divididas (por linhas, repetindo o cabeçalho).
+    """
+    budget = budget or DEFAULT_CHUNK_TOKENS
+    chunks = []
+    current = {field: [] for field in fields}
+    current_tokens = 0
+
+    for field, text, tokens in _iter_blocks(extracted_data, fields, budget):
+        if current_tokens and current_tokens + tokens > budget:
+            chunks.append(current)
+            current = {field: [] for field in fields}
+            current_tokens = 0
+        current[field].append(text)
+        current_tokens += tokens
+
+    if current_tokens:
+        chunks.append(current)
+
+    return [{field: "\n\n".join(texts) for field, texts in chunk.items()} for chunk in chunks]
+
+
+def _unit_key(row):
+    unit = unicodedata.normalize("NFKD", str(row.get("unidade") or "")).encode("ASCII", "ignore").decode()
+    return "".join(unit.split()).upper()
+
+
+def _completeness(row):
+    """ Quantos campos da unidade vieram preenchidos (usado para escolher entre duplicatas). """
+    return sum([
+        row.get("valor") not in (None, "", "Indisponível", "Indeterminado"),
+        row.get("disponibilidade") not in (None, "", "Indeterminado"),
+    ])
+
+
+def merge_units(responses):
+    """ Une as respostas dos blocos, removendo unidades duplicadas e mantendo a mais completa. """
+    merged = {}
+    order = []
+    for response in responses:
+        if isinstance(response, dict):
+            response = next((value for value in response.values() if isinstance(value, list)), [response])
+        for row in response or []:
+            if not isinstance(row, dict):
+                continue
+            key = _unit_key(row)
+            if not key:
+                continue
+            if key not in merged:
+                order.append(key)
+                merged[key] = row
+            elif _completeness(row) > _completeness(merged[key]):
+                merged[key] = row
+
+    return [merged[key] for key in order]
+
+
+def invoke_chunked(extracted_data, fields, budget=None, max_concurrency=None):
+    """
+    Divide o conteúdo em blocos por orçamento de tokens, envia os blocos à IA em paralelo com
+    streaming (`llm_client.batch_stream`) e une as unidades retornadas. Todas as chamadas usam o
+    prompt compartilhado de `workers.prompts` e a IA responde chamando a função de extração com
+    linhas compactas, convertidas aqui em unidades.
+    """
+    chunks = chunk_extracted_data(extracted_data, fields, budget)
+    if not chunks:
+        return []
+
+    logging.info(f"Enviando {len(chunks)} bloco(s) à IA ({', '.join(fields)})")
+    responses = batch_stream(extraction_prompt(), [extraction_inputs(chunk) for chunk in chunks],
+                             max_concurrency or DEFAULT_CHUNK_CONCURRENCY, tool=EXTRACTION_TOOL)
+    return merge_units([[unit for unit in map(row_to_unit, rows) if unit] for rows in responses])
@@ -0,0 +1,193 @@
+import logging
+import numpy as np
+import pytesseract
+from functools import partial
+import metrics
+from document import document_session
+from workers.layout import detect_text_blocks, strip_lines
+from workers.ocr_pool import map_pages, ocr_workers
+from workers.preprocessing import local_ink_mask, to_gray
+
+# Imagens menores que esta fração da página (logotipos, ícones) não passam pelo OCR
+MIN_REGION_COVERAGE = 0.05
+
+# Palavras do OCR abaixo desta confiança (0-100) costumam ser ruído de fotos e plantas
+MIN_OCR_CONFIDENCE = 30
+
+# Palavras do OCR que se sobrepõem a uma palavra da camada de texto acima desta fração são duplicatas
+MAX_WORD_OVERLAP = 0.5
+
+MASK_PADDING = 2  # px ao redor de cada palavra da camada de texto ao mascarar a imagem
+OCR_DPI = 300
+OCR_CONFIG = "--psm 11"  # Texto esparso: as palavras são reordenadas pela posição depois
+
+
+def _word_box(word):
+    return word["x0"], word["top"], word["x1"], word["bottom"]
+
+
+def image_regions(page):
+    """ Áreas de imagem da página (coordenadas do PDF) grandes o bastante para conter texto. """
+    page_width, page_height = float(page.width), float(page.height)
+    min_area = page_width * page_height * MIN_REGION_COVERAGE
+
+    regions = []
+    for image in page.images:
+        x0, top = max(0.0, float(image["x0"])), max(0.0, float(image["top"]))
+        x1, bottom = min(page_width, float(image["x1"])), min(page_height, float(image["bottom"]))
+        if (x1 - x0) * (bottom - top) >= min_area:
+            regions.append((x0, top, x1, bottom))
+    return regions
+
+
+def merge_words(words):
+    """
+    Texto único da página em ordem de posição: palavras agrupadas em linhas pela altura
+    (de cima para baixo) e ordenadas da esquerda para a direita dentro de cada linha.
+    """
+    lines = []
+    for word in sorted(words, key=lambda word: (word["top"], word["x0"])):
+        center = (word["top"] + word["bottom"]) / 2
+        if lines and lines[-1]["top"] <= center <= lines[-1]["bottom"]:
+            lines[-1]["words"].append(word)
+        else:
+            lines.append({"top": word["top"], "bottom": word["bottom"], "words": [word]})
+
+    return "\n".join(
+        " ".join(word["text"] for word in sorted(line["words"], key=lambda word: word["x0"])) for line in lines
+    )
+
+
+def _drop_covered(ocr_words, text_words):
+    """ Remove palavras do OCR que repetem uma palavra já presente na camada de texto. """
+    if not ocr_words or not text_words:
+        return ocr_words
+
+    covered = np.array([_word_box(word) for word in text_words])
+    kept = []
+    for word in ocr_words:
+        x0, top, x1, bottom = _word_box(word)
+        overlap_w = np.clip(np.minimum(covered[:, 2], x1) - np.maximum(covered[:, 0], x0), 0, None)
+        overlap_h = np.clip(np.minimum(covered[:, 3], bottom) - np.maximum(covered[:, 1], top), 0, None)
+        area = max((x1 - x0) * (bottom - top), 1e-6)
+        if (overlap_w * overlap_h).max() / area <= MAX_WORD_OVERLAP:
+            kept.append(word)
+    return kept
+
+
+def ocr_uncovered_regions(pdf_path, task, dpi=OCR_DPI, lang="por"):
+    """
+    Rasteriza uma página e lê pelo OCR apenas o que a camada de texto não cobre: dentro de cada
+    região de imagem, as palavras do pdfplumber são apagadas e só os blocos com forma de texto
+    restantes vão ao tesseract (uma chamada por região). `task` é `(pagina, regioes, palavras)`.
+    Retorna as palavras do OCR em coordenadas do PDF.
+    """
+    page_number, regions, text_boxes = task
+    scale = dpi / 72
+
+    with metrics.span("ocr_pagina", paginas=1) as span, document_session(pdf_path) as document:
+        image = document.bitmap(page_number, dpi=dpi)
+        document.release(page_number)
+        if image is None:
+            return []
+        gray = to_gray(image)
+        del image
+
+        words = []
+        for x0, top, x1, bottom in regions:
+            left, upper = int(x0 * scale), int(top * scale)
+            crop = gray[upper:int(bottom * scale), left:int(x1 * scale)].copy()
+
+            for box in text_boxes:
+                bx0, btop, bx1, bbottom = (int(value * scale) for value in box)
+                crop[
+                    max(0, btop - upper - MASK_PADDING):max(0, bbottom - upper + MASK_PADDING),
+                    max(0, bx0 - left - MASK_PADDING):max(0, bx1 - left + MASK_PADDING),
+                ] = 255
+
+            # Limiar local: sobre fotos e gradientes, um limiar global marcaria a imagem inteira como tinta
+            mask = strip_lines(local_ink_mask(crop))
+            blocks = detect_text_blocks(mask)
+            if not blocks:
+                continue
+
+            # Só os blocos de texto vão ao tesseract (preto sobre branco), numa única chamada por região
+            keep = np.zeros(mask.shape, dtype=bool)
+            for bx, by, bw, bh in blocks:
+                keep[by:by + bh, bx:bx + bw] = True
+            crop = np.where(keep & (mask > 0), 0, 255).astype(np.uint8)
+
+            data = pytesseract.image_to_data(crop, lang=lang, config=OCR_CONFIG, output_type=pytesseract.Output.DICT)
+            for text, conf, wl, wt, ww, wh in zip(
+                    data["text"], data["conf"], data["left"], data["top"], data["width"], data["height"]):
+                text = str(text).strip()
+                if not text or float(conf) < MIN_OCR_CONFIDENCE:
+                    continue
+                words.append({
+                    "text": text,
+                    "x0": (left + wl) / scale,
+                    "top": (upper + wt) / scale,
+                    "x1": (left + wl + ww) / scale,
+                    "bottom": (upper + wt + wh) / scale,
+                })
+
+        span["caracteres"] = sum(len(word["text"]) for word in words)
+    return words
+
+
+def extract_hybrid(pdf_path, pages=None, max_workers=None, window=None):
+    """
+    Extração de páginas mistas sem extrair o mesmo texto duas vezes.
+
+    Uma passada do pdfplumber obtém as tabelas, as palavras da camada de texto (com posição)
+    e as áreas de imagem de cada página. Só as áreas de imagem vão ao OCR, com as palavras da
+    camada de texto mascaradas; as palavras do OCR que ainda coincidem com a camada de texto
+    são descartadas. Cada página vira um único texto ordenado pela posição.
+
+    Retorna `(tabelas, textos_por_pagina, paginas_somente_imagem)`; as páginas sem camada de
+    texto ficam para o OCR por layout (`extract_text_ocr`), que lê tabelas célula a célula.
+
+    Como em `workers.ocr_pool.ocr_pdf_pages`, cada página ocupa uma vaga de OCR da máquina enquanto
+    é rasterizada (a 300 DPI) e lida, e `window` limita as páginas do documento em andamento.
+    """
+    tables = []
+    page_words = {}
+    tasks = []
+    image_only_pages = []
+
+    with metrics.span("pdfplumber") as span, document_session(pdf_path) as document:
+        pages = list(pages) if pages is not None else range(1, document.page_count + 1)
+        for number in pages:
+            words = document.words(number)
+            regions = image_regions(document.page(number))
+
+            if words:
+                table = document.table(number)
+                if table:
+                    tables.append(table)
+
+                page_words[number] = words
+                if regions:
+                    tasks.append((number, regions, [_word_box(word) for word in words]))
+            elif regions:
+                image_only_pages.append(number)
+
+            # As palavras ficam em `page_words`; o layout da página já pode ser descartado
+            document.release(number)
+
+        span.update(paginas=len(pages), tabelas=len(tables), caracteres=sum(
+            len(word["text"]) for words in page_words.values() for word in words
+        ))
+
+    if tasks:
+        logging.info(f"OCR das áreas de imagem não cobertas pela camada de texto em {len(tasks)} página(s): {pdf_path}")
+        max_workers = ocr_workers(len(tasks), max_workers)
+        with metrics.span("ocr", paginas=len(tasks)) as span:
+            ocr_words = map_pages(partial(ocr_uncovered_regions, document), tasks, max_workers, window)
+            span["caracteres"] = sum(len(word["text"]) for words in ocr_words for word in words)
+
+        for (page_number, _, _), words in zip(tasks, ocr_words):
+            page_words[page_number] = page_words[page_number] + _drop_covered(words, page_words[page_number])
+
+    texts = [merge_words(page_words[page_number]) for page_number in sorted(page_words)]
+    return tables, texts, image_only_pages
@@ -0,0 +1,168 @@
+import os
+import cv2
+import numpy as np
+import pytesseract
+from concurrent.futures import ThreadPoolExecutor
+from workers.preprocessing import ink_mask, estimate_text_height
+
+# Regiões de uma mesma página lidas em paralelo (cada uma é um processo `tesseract`), dentro da vaga de
+# OCR da página: no pico, a máquina roda até `PDF_OCR_WORKERS × PDF_OCR_REGION_WORKERS` tesseracts
+REGION_WORKERS = int(os.getenv("PDF_OCR_REGION_WORKERS", 2))
+
+# Modos de segmentação do tesseract: texto esparso para tabelas (cada palavra é posicionada
+# e depois atribuída à sua célula) e bloco uniforme para os trechos de texto
+TABLE_CONFIG = "--psm 11"
+TEXT_CONFIG = "--psm 6"
+
+MIN_TABLE_WIDTH = 0.2  # fração da largura da página
+MIN_GLYPH_INK = 0.5  # fração da tinta de um bloco que precisa ter forma de caractere
+MAX_BLOCK_DENSITY = 0.45  # blocos mais "cheios" que isso são imagens (fotos, renderizações)
+
+
+def _line_positions(profile, min_length):
+    """ Centros das linhas (grupos de posições consecutivas com `profile >= min_length`). """
+    positions = np.flatnonzero(profile >= min_length)
+    if not len(positions):
+        return []
+    groups = np.split(positions, np.flatnonzero(np.diff(positions) > 1) + 1)
+    return [int(group.mean()) for group in groups]
+
+
+def detect_tables(mask):
+    """
+    Encontra grades de tabela pelas linhas horizontais e verticais (abertura morfológica).
+    Retorna `(grade, tabelas)`, onde cada tabela é `{"bbox", "linhas", "colunas"}` com as
+    posições das linhas da grade relativas ao recorte.
+    """
+    height, width = mask.shape
+    horizontal = cv2.morphologyEx(mask, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (max(20, width // 25), 1)))
+    vertical = cv2.morphologyEx(mask, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(20, height // 50))))
+    grid = cv2.dilate(cv2.bitwise_or(horizontal, vertical), np.ones((3, 3), np.uint8))
+
+    tables = []
+    contours, _ = cv2.findContours(grid, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if w < width * MIN_TABLE_WIDTH:
+            continue
+        rows = _line_positions(np.count_nonzero(horizontal[y:y + h, x:x + w], axis=1), w * 0.5)
+        cols = _line_positions(np.count_nonzero(vertical[y:y + h, x:x + w], axis=0), h * 0.5)
+        if len(rows) >= 2 and len(cols) >= 2:
+            tables.append({"bbox": (x, y, w, h), "linhas": rows, "colunas": cols})
+
+    tables.sort(key=lambda table: (table["bbox"][1], table["bbox"][0]))
+    return grid, tables
+
+
+def strip_lines(mask, min_length=100):
+    """ Remove da máscara linhas retas horizontais/verticais (bordas de fotos, molduras, plantas). """
+    horizontal = cv2.morphologyEx(mask, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (min_length, 1)))
+    vertical = cv2.morphologyEx(mask, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, min_length)))
+    lines = cv2.dilate(cv2.bitwise_or(horizontal, vertical), np.ones((3, 3), np.uint8))
+    return cv2.bitwise_and(mask, cv2.bitwise_not(lines))
+
+
+def detect_text_blocks(mask, text_height=None):
+    """
+    Agrupa palavras em blocos de texto (dilatação proporcional à altura do texto) e descarta
+    blocos que parecem imagens: muito preenchidos ou com pouca tinta em forma de caractere.
+    `mask` já deve estar sem as tabelas. Retorna bboxes na ordem de leitura.
+    """
+    text_height = int(text_height or estimate_text_height(mask) or 20)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(3, int(text_height * 1.5)), max(3, text_height // 2)))
+    blocks = cv2.dilate(mask, kernel)
+
+    _, _, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    stats, centroids = stats[1:], centroids[1:]
+    glyph_heights = stats[:, cv2.CC_STAT_HEIGHT]
+    glyphs = (glyph_heights >= 4) & (glyph_heights <= text_height * 3) & (stats[:, cv2.CC_STAT_WIDTH] <= glyph_heights * 3)
+
+    regions = []
+    contours, _ = cv2.findContours(blocks, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if h < text_height // 2:
+            continue
+        ink = np.count_nonzero(mask[y:y + h, x:x + w])
+        if not ink or ink / (w * h) > MAX_BLOCK_DENSITY:
+            continue
+        inside = (centroids[:, 0] >= x) & (centroids[:, 0] < x + w) & (centroids[:, 1] >= y) & (centroids[:, 1] < y + h)
+        if stats[inside & glyphs, cv2.CC_STAT_AREA].sum() < ink * MIN_GLYPH_INK:
+            continue
+        regions.append((x, y, w, h))
+
+    # Ordem de leitura: de cima para baixo, em faixas da altura do texto
+    regions.sort(key=lambda box: (box[1] // max(1, text_height), box[0]))
+    return regions
+
+
+def words_to_cells(data, rows, cols):
+    """
+    Distribui as palavras de `pytesseract.image_to_data` nas células da grade (pelo centro de
+    cada palavra). Retorna a tabela como lista de linhas, sem linhas vazias.
+    """
+    cells = [[[] for _ in range(len(cols) - 1)] for _ in range(len(rows) - 1)]
+    for text, left, top, width, height in zip(data["text"], data["left"], data["top"], data["width"], data["height"]):
+        text = str(text).strip()
+        if not text:
+            continue
+        row = int(np.searchsorted(rows, top + height / 2)) - 1
+        col = int(np.searchsorted(cols, left + width / 2)) - 1
+        if 0 <= row < len(cells) and 0 <= col < len(cells[row]):
+            cells[row][col].append((top // max(1, height), left, text))
+
+    table = [[" ".join(word for _, _, word in sorted(cell)) for cell in row] for row in cells]
+    return [row for row in table if any(row)]
+
+
+def _read_table(gray, grid, table, lang):
+    x, y, w, h = table["bbox"]
+    crop = gray[y:y + h, x:x + w].copy()
+    crop[grid[y:y + h, x:x + w] > 0] = 255  # Apaga as linhas da grade para o tesseract não lê-las como texto
+    data = pytesseract.image_to_data(crop, lang=lang, config=TABLE_CONFIG, output_type=pytesseract.Output.DICT)
+    return words_to_cells(data, table["linhas"], table["colunas"])
+
+
+def _read_text(gray, box, lang):
+    x, y, w, h = box
+    return pytesseract.image_to_string(gray[y:y + h, x:x + w], lang=lang, config=TEXT_CONFIG).strip()
+
+
+def read_page_layout(gray, lang="por", config=TEXT_CONFIG, region_workers=None):
+    """
+    OCR orientado ao layout de uma página pré-processada: detecta tabelas e blocos de texto e
+    lê apenas essas regiões (em paralelo, com `region_workers` threads; padrão
+    `PDF_OCR_REGION_WORKERS`, também dentro dos processos do pool de OCR), ignorando logotipos,
+    fotos e plantas.
+
+    Retorna `{"tabelas": [[[célula, ...], ...], ...], "texto": "..."}`. Se nenhuma região for
+    detectada, lê a página inteira com `config`, como o OCR de página inteira.
+    """
+    mask = ink_mask(gray)
+    grid, tables = detect_tables(mask)
+
+    text_mask = mask.copy()
+    text_mask[grid > 0] = 0
+    for table in tables:
+        x, y, w, h = table["bbox"]
+        text_mask[y:y + h, x:x + w] = 0
+    blocks = detect_text_blocks(text_mask)
+
+    if not tables and not blocks:
+        return {"tabelas": [], "texto": pytesseract.image_to_string(gray, lang=lang, config=config).strip()}
+
+    with ThreadPoolExecutor(max_workers=max(1, region_workers or REGION_WORKERS)) as executor:
+        table_futures = [executor.submit(_read_table, gray, grid, table, lang) for table in tables]
+        text_futures = [executor.submit(_read_text, gray, box, lang) for box in blocks]
+        tables = [future.result() for future in table_futures]
+        texts = [future.result() for future in text_futures]
+
+    return {"tabelas": [table for table in tables if table], "texto": "\n".join(text for text in texts if text)}
+
+
+def split_layout_pages(pages):
+    """ Separa os resultados de `read_page_layout` em textos por página e lista de tabelas do documento. """
+    pages = [page for page in pages if isinstance(page, dict)]  # Páginas não renderizadas vêm como ""
+    texts = [page["texto"] for page in pages]
+    tables = [table for page in pages for table in page["tabelas"]]
+    return texts, tables
@@ -0,0 +1,70 @@
+import os
+import logging
+import multiprocessing
+from functools import partial
+from contextlib import contextmanager
+import metrics
+
+# Páginas no OCR (rasterização + `tesseract`) ao mesmo tempo na máquina inteira (padrão: nº de CPUs)
+OCR_WORKERS = int(os.getenv("PDF_OCR_WORKERS", os.cpu_count() or 1))
+
+_slots = None
+
+
+def shared_ocr_slots():
+    """
+    Semáforo de OCR compartilhado por todos os processos abertos a partir deste (extração do `engine`
+    e pools de OCR), criado no primeiro uso. Qualquer documento pode usar todas as `OCR_WORKERS`
+    vagas quando está sozinho no OCR; com vários documentos, elas são disputadas página a página.
+    """
+    global _slots
+    if _slots is None:
+        _slots = multiprocessing.BoundedSemaphore(OCR_WORKERS)
+    return _slots
+
+
+def set_ocr_slots(slots):
+    """ Inicializador dos processos filhos: passa a usar o semáforo do processo que os criou. """
+    global _slots
+    _slots = slots
+
+
+@contextmanager
+def ocr_slot():
+    """ Ocupa uma vaga de OCR da máquina durante o bloco (uma página). """
+    with shared_ocr_slots():
+        yield
+
+
+def extract_text_ocr(pdf_path, preprocess, pages=None, **options):
+    """
+    OCR por layout compartilhado pelos extratores de imagem e misto: rasteriza as páginas, aplica
+    `preprocess` e lê, em cada página, apenas as tabelas (célula a célula) e os blocos de texto
+    (ver `workers.layout.read_page_layout`). As páginas são processadas em paralelo no pool de OCR.
+
+    - `pdf_path`: caminho ou sessão (`document.PdfDocument`).
+    - `pages`: números das páginas (base 1); por padrão, todas.
+    - `options`: repassadas a `workers.ocr_pool.ocr_pdf_pages` (ex.: `dpi`, `config`).
+
+    OpenCV, pdf2image e pytesseract só são importados aqui, quando um documento passa pelo OCR, para
+    que documentos com camada de texto não paguem o custo dessas bibliotecas.
+
+    Retorna `{"ocr_text", "tables"}` ou `None` se nada foi lido.
+    """
+    from workers.layout import REGION_WORKERS, read_page_layout, split_layout_pages
+    from workers.ocr_pool import ocr_pdf_pages
+
+    logging.info(f"Convertendo PDF para imagens e extraindo texto OCR: {pdf_path}")
+
+    with metrics.span("ocr") as span:
+        # As threads por região são passadas explicitamente: valem também nos processos do pool de OCR
+        reader = partial(read_page_layout, region_workers=REGION_WORKERS)
+        pages_layout = ocr_pdf_pages(pdf_path, preprocess, pages=pages, reader=reader, **options)
+        extracted_text, tables = split_layout_pages(pages_layout)
+        span.update(paginas=len(pages_layout), tabelas=len(tables), caracteres=sum(len(text) for text in extracted_text))
+
+    if not any(extracted_text) and not tables:
+        logging.warning("Nenhum texto extraído do PDF via OCR.")
+        return None
+
+    return {"ocr_text": extracted_text, "tables": tables}
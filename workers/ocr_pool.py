@@ -0,0 +1,186 @@
+import os
+import logging
+import pdf2image
+import pytesseract
+from collections import deque
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+import metrics
+from document import document_session
+from workers.ocr import OCR_WORKERS, ocr_slot, set_ocr_slots, shared_ocr_slots
+
+# Páginas no OCR ao mesmo tempo na máquina inteira (ver `workers.ocr.shared_ocr_slots`); um documento
+# abre até esse número de processos de OCR, e as vagas são disputadas página a página entre os documentos
+DEFAULT_OCR_WORKERS = OCR_WORKERS
+
+# Máximo de páginas de um documento em andamento ao mesmo tempo (limite de memória, não de paralelismo:
+# o padrão, o dobro dos processos de OCR, mantém todos ocupados)
+DEFAULT_PAGE_WINDOW = int(os.getenv("PDF_PAGE_WINDOW", 2 * DEFAULT_OCR_WORKERS))
+
+# Pico de memória do OCR: as páginas são renderizadas já em escala de cinza (1 byte por pixel),
+# cada processo rasteriza apenas a página que vai ler e ela é descartada logo após o OCR. Como a
+# rasterização acontece dentro da vaga de OCR, o pico **não depende do número de páginas nem de
+# documentos**, só do número de vagas (no modo em série, do bloco de `window` páginas renderizado
+# de uma vez):
+#
+#     pico na máquina ≈ PDF_OCR_WORKERS × (largura_pol × dpi) × (altura_pol × dpi) × 3   (página + cópias do pré-processamento)
+#
+# Exemplo: A3 a 300 DPI = 3508 × 4961 px ≈ 17 MB por página em cinza (52 MB em RGB), ou seja,
+# cerca de 52 MB por vaga: ≈420 MB com 8 vagas, seja o PDF de 10 ou de 1000 páginas.
+
+
+def _init_ocr_worker(ocr_slots):
+    """
+    Limita o Tesseract a uma thread por processo para não competir com o paralelismo por página, e
+    usa o semáforo de OCR da máquina (cada página ocupa uma vaga).
+    """
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+    set_ocr_slots(ocr_slots)
+
+
+def ocr_workers(count, max_workers=None):
+    """ Processos de OCR para `count` páginas: no máximo `PDF_OCR_WORKERS` (as vagas limitam o total na máquina). """
+    return max(1, min(max_workers or DEFAULT_OCR_WORKERS, DEFAULT_OCR_WORKERS, count))
+
+
+def _with_slot(task, item):
+    with ocr_slot():
+        return task(item)
+
+
+def get_page_count(pdf_path):
+    """ Número de páginas do PDF, sem rasterizar. """
+    return pdf2image.pdfinfo_from_path(os.fspath(pdf_path))["Pages"]
+
+
+def _consecutive_runs(pages, window):
+    """ Agrupa números de página consecutivos em blocos de no máximo `window` páginas. """
+    run = []
+    for page_number in pages:
+        if run and (page_number != run[-1] + 1 or len(run) >= window):
+            yield run
+            run = []
+        run.append(page_number)
+    if run:
+        yield run
+
+
+def iter_page_images(pdf_path, pages=None, dpi=200, grayscale=True, window=None):
+    """
+    Gera `(numero_pagina, imagem)` renderizando no máximo `window` páginas por vez.
+
+    O renderizador (`pdftoppm`) já entrega as páginas em escala de cinza quando `grayscale=True`,
+    e cada imagem deixa de ser referenciada pelo gerador assim que é entregue ao consumidor.
+    """
+    if pages is None:
+        pages = range(1, get_page_count(pdf_path) + 1)
+    window = max(window or DEFAULT_PAGE_WINDOW, 1)
+
+    for run in _consecutive_runs(pages, window):
+        with metrics.span("rasterizacao", paginas=len(run)):
+            images = pdf2image.convert_from_path(
+                pdf_path, dpi=dpi, grayscale=grayscale, first_page=run[0], last_page=run[-1]
+            )
+        images.reverse()
+        for page_number in run:
+            if not images:
+                break
+            yield page_number, images.pop()
+
+
+def read_text(image, lang="por", config=""):
+    """ OCR da página inteira como texto corrido. """
+    return pytesseract.image_to_string(image, lang=lang, config=config).strip()
+
+
+def _count_chars(result):
+    if isinstance(result, dict):
+        cells = sum(len(cell) for table in result.get("tabelas", []) for row in table for cell in row)
+        return len(result.get("texto", "")) + cells
+    return len(result)
+
+
+def ocr_image(image, preprocess, lang="por", config="", reader=None):
+    """ Pré-processa uma página já rasterizada e executa o OCR (`reader`, por padrão `read_text`). """
+    with metrics.span("ocr_pagina", paginas=1) as span:
+        processed_img = preprocess(image)
+        result = (reader or read_text)(processed_img, lang=lang, config=config)
+        span["caracteres"] = _count_chars(result)
+    return result
+
+
+def ocr_page(pdf_path, page_number, preprocess, dpi=200, lang="por", config="", reader=None):
+    """ Rasteriza **apenas uma página** (via `first_page`/`last_page`), pré-processa e executa o OCR. """
+    with document_session(pdf_path) as document:
+        image = document.bitmap(page_number, dpi=dpi)
+        document.release(page_number)
+    if image is None:
+        return ""
+    return ocr_image(image, preprocess, lang=lang, config=config, reader=reader)
+
+
+def ocr_pdf_pages(pdf_path, preprocess, pages=None, dpi=200, lang="por", config="", max_workers=None, window=None,
+                  reader=None):
+    """
+    Executa o OCR das páginas do PDF em um pipeline rasterizar → pré-processar → OCR → descartar.
+
+    - `preprocess`: função de módulo (picklable) aplicada à imagem (em cinza) de cada página.
+    - `reader`: função de módulo (picklable) `(imagem, lang, config)` que lê a página pré-processada;
+      por padrão `read_text` (texto corrido). Ver `workers.layout.read_page_layout`.
+    - `pages`: números das páginas (base 1); por padrão, todas.
+    - `pdf_path`: caminho ou sessão (`document.PdfDocument`); as páginas já renderizadas na sessão
+      nesse DPI são reaproveitadas, e cada uma é liberada logo após o OCR.
+    - `window`: máximo de páginas do documento em andamento ao mesmo tempo (ver o cálculo de pico acima).
+    - `max_workers`: processos de OCR (padrão e máximo: `PDF_OCR_WORKERS`); cada página ocupa uma vaga
+      de OCR da máquina enquanto é rasterizada e lida.
+
+    Retorna a lista de resultados (textos, por padrão) **na ordem das páginas**.
+    """
+    if pages is None:
+        pages = range(1, get_page_count(pdf_path) + 1)
+    pages = list(pages)
+    if not pages:
+        return []
+
+    window = max(window or DEFAULT_PAGE_WINDOW, 1)
+    max_workers = ocr_workers(len(pages), max_workers)
+
+    if max_workers <= 1:
+        results = []
+        with document_session(pdf_path) as document:
+            for page_number, image in document.render(pages, dpi=dpi, window=window):
+                document.release(page_number)
+                with ocr_slot():
+                    results.append(ocr_image(image, preprocess, lang=lang, config=config, reader=reader))
+        return results
+
+    logging.info(f"OCR paralelo de {len(pages)} página(s) com {max_workers} processo(s): {pdf_path}")
+    task = partial(ocr_page, pdf_path, preprocess=preprocess, dpi=dpi, lang=lang, config=config, reader=reader)
+    return map_pages(task, pages, max_workers, window)
+
+
+def map_pages(task, items, max_workers, window=None):
+    """
+    Executa `task(item)` (função de módulo, picklable) para cada item no pool de processos de OCR
+    e retorna os resultados na ordem de `items`. Cada item ocupa uma vaga de OCR da máquina enquanto
+    executa, e no máximo `window` itens ficam em andamento ao mesmo tempo. Com um único processo,
+    executa em série.
+    """
+    if max_workers <= 1 or len(items) <= 1:
+        return [_with_slot(task, item) for item in items]
+
+    window = max(window or DEFAULT_PAGE_WINDOW, 1)
+    results = []
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_ocr_worker,
+                             initargs=(shared_ocr_slots(),)) as pool:
+        running = deque()
+        for item in items:
+            if len(running) >= window:
+                results.append(running.popleft().result())
+            running.append(pool.submit(metrics.call_collecting, partial(_with_slot, task), item))
+        results.extend(future.result() for future in running)
+
+    # Traz para este processo as métricas medidas nos processos de OCR
+    for _, spans in results:
+        metrics.merge(spans)
+    return [result for result, _ in results]
@@ -0,0 +1,115 @@
+import cv2
+import numpy as np
+
+# Altura mediana dos caracteres (px) em que o tesseract lê melhor; páginas acima de
+# `MAX_TEXT_HEIGHT` são reduzidas até `TARGET_TEXT_HEIGHT` antes do OCR
+TARGET_TEXT_HEIGHT = 30
+MAX_TEXT_HEIGHT = 45
+
+# Inclinações abaixo de `MIN_SKEW` são ignoradas; acima de `MAX_SKEW` a estimativa não é confiável
+MIN_SKEW = 0.2  # graus
+MAX_SKEW = 5.0  # graus
+
+# Linhas/colunas com menos que esta fração de pixels escuros contam como margem em branco
+MARGIN_INK_RATIO = 0.002
+MARGIN_PADDING = 16  # px mantidos ao redor do conteúdo
+
+
+def to_gray(image):
+    """
+    Página como array `uint8` em escala de cinza (única cópia da imagem PIL; as etapas
+    seguintes trabalham sobre este array ou sobre recortes dele).
+    """
+    gray = np.array(image, dtype=np.uint8)
+    if gray.ndim == 3:
+        gray = cv2.cvtColor(gray, cv2.COLOR_RGB2GRAY)
+    return gray
+
+
+def ink_mask(gray):
+    """ Máscara binária (255 = tinta) pelo limiar de Otsu. """
+    return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+
+
+def local_ink_mask(gray, block_size=31, offset=15):
+    """
+    Máscara de tinta por limiar adaptativo (média local): destaca texto sobre fotos e
+    gradientes, onde um limiar global marca áreas inteiras da imagem como tinta.
+    """
+    return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, block_size, offset)
+
+
+def crop_margins(gray, mask):
+    """ Recorta as margens em branco (retorna views de `gray` e `mask`, sem copiar). """
+    height, width = mask.shape
+    rows = np.flatnonzero(np.count_nonzero(mask, axis=1) > max(2, width * MARGIN_INK_RATIO))
+    cols = np.flatnonzero(np.count_nonzero(mask, axis=0) > max(2, height * MARGIN_INK_RATIO))
+    if not len(rows) or not len(cols):
+        return gray, mask
+
+    top, bottom = max(0, rows[0] - MARGIN_PADDING), min(height, rows[-1] + MARGIN_PADDING + 1)
+    left, right = max(0, cols[0] - MARGIN_PADDING), min(width, cols[-1] + MARGIN_PADDING + 1)
+    return gray[top:bottom, left:right], mask[top:bottom, left:right]
+
+
+def estimate_text_height(mask):
+    """
+    Altura mediana (px) dos componentes conexos com proporções de caractere, ou `None`
+    se a página não tiver texto suficiente. Linhas de tabela e ruído são descartados.
+    """
+    _, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    widths, heights, areas = stats[1:, cv2.CC_STAT_WIDTH], stats[1:, cv2.CC_STAT_HEIGHT], stats[1:, cv2.CC_STAT_AREA]
+    glyphs = (heights >= 6) & (heights <= mask.shape[0] // 10) & (widths <= heights * 3) & (areas >= 12)
+    if np.count_nonzero(glyphs) < 20:
+        return None
+    return float(np.median(heights[glyphs]))
+
+
+def estimate_skew(mask):
+    """ Inclinação (graus) do bloco de conteúdo, pelo retângulo mínimo que envolve a tinta. """
+    points = cv2.findNonZero(mask)
+    if points is None or len(points) < 100:
+        return 0.0
+    angle = cv2.minAreaRect(points)[-1]
+    if angle > 45:
+        angle -= 90
+    elif angle < -45:
+        angle += 90
+    return angle if MIN_SKEW <= abs(angle) <= MAX_SKEW else 0.0
+
+
+def deskew(gray, angle):
+    """ Gira a página para alinhar as linhas de texto (fundo branco). """
+    height, width = gray.shape
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(gray, matrix, (width, height), flags=cv2.INTER_LINEAR, borderValue=255)
+
+
+def preprocess_page(image, binarize=True, contrast=None):
+    """
+    Prepara uma página para o OCR: escala de cinza, recorte de margens, redução de páginas com
+    resolução acima do necessário para o tesseract, correção de inclinação e, por fim,
+    binarização (Otsu) ou ajuste de contraste `(alpha, beta)`, feitos no próprio array.
+    """
+    gray = to_gray(image)
+    gray, mask = crop_margins(gray, ink_mask(gray))
+
+    text_height = estimate_text_height(mask)
+    if text_height and text_height > MAX_TEXT_HEIGHT:
+        scale = TARGET_TEXT_HEIGHT / text_height
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        mask = cv2.resize(mask, None, fx=scale, fy=scale, interpolation=cv2.INTER_NEAREST)
+
+    angle = estimate_skew(mask)
+    if angle:
+        gray = deskew(gray, angle)
+
+    # Os recortes são views da página original; copia antes de alterar no lugar
+    if not gray.flags.c_contiguous:
+        gray = np.ascontiguousarray(gray)
+    if contrast:
+        alpha, beta = contrast
+        cv2.convertScaleAbs(gray, dst=gray, alpha=alpha, beta=beta)
+    if binarize:
+        cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=gray)
+    return gray
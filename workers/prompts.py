@@ -0,0 +1,87 @@
+import logging
+from functools import lru_cache
+
+# Colunas de cada linha devolvida pela IA (array compacto, na ordem abaixo). O nome do
+# empreendimento não é pedido: ele vem do nome do arquivo (ver `process.development_name`).
+ROW_COLUMNS = ["unidade", "disponibilidade", "valor"]
+
+DISPONIBILIDADES = ["Disponível", "Reservado", "Permuta", "Indeterminado"]
+
+# Função que a IA é obrigada a chamar (saída restrita ao esquema, `strict`)
+TOOL_NAME = "registrar_unidades"
+EXTRACTION_TOOL = {
+    "type": "function",
+    "function": {
+        "name": TOOL_NAME,
+        "description": "Registra as unidades imobiliárias encontradas no conteúdo.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "linhas": {
+                    "type": "array",
+                    "description": "Uma linha por unidade: [unidade, disponibilidade, valor].",
+                    "items": {"type": "array", "items": {"type": "string"}},
+                },
+            },
+            "required": ["linhas"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# Prefixo estático, idêntico em todas as chamadas de extração (pdfplumber, OCR e misto): fica no
+# início da requisição, junto da definição da função, para ser reaproveitado pelo cache de prompt
+# da OpenAI. Tudo o que varia por documento vai na mensagem seguinte.
+SYSTEM_PROMPT = f"""Você organiza dados de tabelas de preços de empreendimentos imobiliários extraídos de PDFs.
+O conteúdo pode vir de tabelas (uma linha por registro, colunas separadas por `;`), do texto do PDF e de OCR; \
+tabelas podem estar desalinhadas ou incompletas, o OCR pode ter erros e parte das informações pode estar só no texto.
+
+Chame `{TOOL_NAME}` com uma linha por unidade, no formato [unidade, disponibilidade, valor]:
+- unidade: número ou identificação da unidade, como no documento (ex.: "204-205").
+- disponibilidade: um de {", ".join(f'"{value}"' for value in DISPONIBILIDADES)}.
+- valor: valor de venda no formato 000.000,00 (ex.: "492.030,00"); "Indisponível" se não houver.
+
+Regras:
+- Combine informações da mesma unidade quebradas em várias linhas ou espalhadas entre tabela, texto e OCR.
+- Ignore cabeçalhos, rodapés, legendas e qualquer linha que não seja uma unidade.
+- Não repita unidades nem invente valores."""
+
+# Títulos das seções do conteúdo variável, na ordem em que aparecem na mensagem
+SECTION_TITLES = {
+    "tables": "Tabelas",
+    "context": "Texto do PDF",
+    "ocr_text": "Texto extraído via OCR",
+}
+
+
+@lru_cache(maxsize=None)
+def extraction_prompt():
+    """ Template compartilhado pelas chamadas de extração (montado uma única vez por processo). """
+    from langchain_core.prompts import ChatPromptTemplate
+
+    return ChatPromptTemplate.from_messages([("system", SYSTEM_PROMPT), ("human", "{conteudo}")])
+
+
+def extraction_inputs(chunk):
+    """ Entradas do template para um bloco de `workers.chunking`: só as seções com conteúdo. """
+    sections = [f"### {SECTION_TITLES.get(field, field)}\n{text}" for field, text in chunk.items() if text]
+    return {"conteudo": "\n\n".join(sections)}
+
+
+def row_to_unit(row):
+    """
+    Converte uma linha compacta (`[unidade, disponibilidade, valor]`) no dicionário usado pelo CSV.
+    Linhas fora do formato são descartadas (retorna `None`) sem invalidar o restante do documento.
+    """
+    if isinstance(row, dict):
+        return row  # Formato antigo (objeto por unidade)
+    if not isinstance(row, list) or not row or len(row) > len(ROW_COLUMNS):
+        logging.warning(f"Linha fora do formato descartada: {str(row)[:80]}")
+        return None
+
+    unit = dict(zip(ROW_COLUMNS, (str(value).strip() if value is not None else "" for value in row)))
+    if not unit["unidade"]:
+        return None
+    unit["disponibilidade"] = unit.get("disponibilidade") or "Indeterminado"
+    unit["valor"] = unit.get("valor") or "Indisponível"
+    return unit
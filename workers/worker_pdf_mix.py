@@ -1,101 +1,73 @@
-import os
-import json
 import logging
-import cv2
-import pdfplumber
-import pdf2image
-import pytesseract
-import numpy as np
-from dotenv import load_dotenv
-from langchain.prompts import PromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
-from langchain_openai import ChatOpenAI
-
-# Carregar variáveis do .env
-load_dotenv()
-openai_api_key = os.getenv("OPENAI_API_KEY")
-
-# Configuração do logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[logging.StreamHandler()]
-)
+from document import document_session
+from workers import ocr
+from workers.chunking import invoke_chunked
 
 
 def preprocess_image(image):
     """
-    Aplica pré-processamento na imagem para melhorar a extração OCR.
+    Aplica pré-processamento na imagem para melhorar a extração OCR (ver `workers.preprocessing`).
     """
-    gray = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2GRAY)  # Converter para escala de cinza
-    enhanced = cv2.convertScaleAbs(gray, alpha=1.2, beta=10)  # Melhorar contraste
-    return enhanced
+    from workers.preprocessing import preprocess_page
+    return preprocess_page(image, binarize=False, contrast=(1.2, 10))  # Melhorar contraste
 
 
-def extract_text_ocr(pdf_path):
+def extract_text_ocr(pdf_path, pages=None):
+    """ OCR por layout (ver `workers.ocr`) das páginas de imagem, a 300 DPI e com contraste realçado. """
+    return ocr.extract_text_ocr(pdf_path, preprocess_image, pages=pages, dpi=300, config="--psm 6")
+
+
+def extract_pdf_combined(pdf_path):
     """
-    Converte PDF para imagens e extrai texto usando OCR.
+    Extrai **TABELAS, IMAGENS e TEXTOS** de todas as páginas do PDF, sem chamar a IA.
     """
-    logging.info(f"Convertendo PDF para imagens e extraindo texto OCR: {pdf_path}")
+    from workers.hybrid import extract_hybrid
 
-    extracted_text = []
-    images = pdf2image.convert_from_path(pdf_path, dpi=300)  # Aumenta DPI para melhor precisão
+    logging.info(f"Extraindo PDF (Misto): {pdf_path}")
 
-    for img in images:
-        processed_img = preprocess_image(img)
-        text = pytesseract.image_to_string(processed_img, lang="por", config="--psm 6")
-        extracted_text.append(text.strip())
+    # **Camada de texto e OCR combinados por página, sem extrair o mesmo texto duas vezes**
+    with document_session(pdf_path) as document:
+        tables, texts, image_pages = extract_hybrid(document)
+        ocr_data = extract_text_ocr(document, pages=image_pages) if image_pages else None
 
-    if not extracted_text:
-        logging.warning("Nenhum texto extraído do PDF via OCR.")
-        return None
+    return _merge_extracted_data(pdf_path, {"tables": tables, "context": texts}, ocr_data)
 
-    return {"ocr_text": extracted_text}
 
-
-def extract_tables_from_pdf(pdf_path):
-    """
-    Extrai tabelas e contexto do PDF usando pdfplumber.
+def extract_pdf_by_page(pdf_path, classification):
     """
-    logging.info(f"Extraindo tabelas do PDF: {pdf_path}")
-    extracted_tables = []
-    context_info = []
+    Extrai PDFs mistos **página a página**, usando a classificação de `process.classify_pdf`.
 
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            text = page.extract_text()
-            table = page.extract_table()
-
-            if text:
-                context_info.append(text.strip())
-
-            if table:
-                cleaned_table = [[cell.strip() if cell else "" for cell in row] for row in table]
-                extracted_tables.append(cleaned_table)
-
-    if not extracted_tables and not context_info:
-        logging.warning("Nenhuma tabela ou texto extraído do PDF.")
-        return None
+    - Páginas com camada de texto (`TEXTO`/`MIX`) passam pela extração híbrida (`workers.hybrid`):
+      tabelas e palavras do pdfplumber, mais o OCR apenas das áreas de imagem que a camada de
+      texto não cobre, em um único texto por página ordenado pela posição.
+    - Páginas somente-imagem (`IMAGEM`) passam pelo OCR por layout.
+    - Páginas vazias são ignoradas.
+    """
+    from workers.hybrid import extract_hybrid
 
-    return {"tables": extracted_tables, "context": context_info}
+    text_pages = [page["pagina"] for page in classification["paginas"] if page["tipo"] in ("TEXTO", "MIX")]
+    image_pages = [page["pagina"] for page in classification["paginas"] if page["tipo"] == "IMAGEM"]
 
+    logging.info(
+        f"Extraindo PDF (Misto) por página: {pdf_path} "
+        f"({len(text_pages)} com texto, {len(image_pages)} para OCR)"
+    )
 
-def process_pdf_combined(pdf_path):
-    """
-    Processa PDFs que contêm **TABELAS, IMAGENS e TEXTOS** misturados.
-    """
-    logging.info(f"Processando PDF (Misto): {pdf_path}")
+    table_data = None
+    with document_session(pdf_path) as document:
+        if text_pages:
+            tables, texts, image_only_pages = extract_hybrid(document, pages=text_pages)
+            table_data = {"tables": tables, "context": texts}
+            image_pages = sorted(image_pages + image_only_pages)
+        ocr_data = extract_text_ocr(document, pages=image_pages) if image_pages else None
 
-    # Nome do arquivo PDF sem extensão
-    file_name = os.path.splitext(os.path.basename(pdf_path))[0]
+    return _merge_extracted_data(pdf_path, table_data, ocr_data)
 
-    # **Extração de todos os formatos possíveis**
-    table_data = extract_tables_from_pdf(pdf_path)
-    ocr_data = extract_text_ocr(pdf_path)
 
-    # Unificação dos dados extraídos
+def _merge_extracted_data(pdf_path, table_data, ocr_data):
+    """ Unifica os dados do pdfplumber e do OCR no formato esperado pela IA. """
     extracted_data = {
-        "tables": table_data["tables"] if table_data else [],
+        "tables": (table_data["tables"] if table_data else []) + (ocr_data.get("tables", []) if ocr_data else []),
         "context": table_data["context"] if table_data else [],
         "ocr_text": ocr_data["ocr_text"] if ocr_data else []
     }
@@ -104,88 +76,16 @@ def process_pdf_combined(pdf_path):
         logging.warning(f"Nenhum dado relevante extraído do PDF {pdf_path}.")
         return None
 
-    logging.info("Enviando dados extraídos para IA via LangChain...")
+    return extracted_data
 
-    # Modelo de IA usando OpenAI via LangChain
-    llm = ChatOpenAI(model="gpt-4-turbo", openai_api_key=openai_api_key, temperature=0)
-
-    # Define o modelo de saída (JSON)
-    parser = JsonOutputParser()
-
-    prompt = PromptTemplate(
-        template="""
-            O seguinte conjunto de informações foi extraído de um PDF imobiliário contendo múltiplos formatos de dados (Tabelas, Imagens e Textos). 
-            Sua tarefa é interpretar, organizar e reestruturar esses dados corretamente.
-
-            ⚠ **ATENÇÃO**:
-            - Algumas tabelas podem estar desalinhadas ou incompletas.
-            - Algumas informações podem estar no OCR em vez da tabela.
-            - Todos os campos devem seguir um padrão fixo e, caso algum valor esteja ausente, deve ser preenchido como `"Indeterminado"` ou `null`.
-
-            ### **Dados extraídos do PDF**
-            **Tabelas extraídas:**
-            ```json
-            {tables}
-            ```
-
-            **Texto complementar extraído do PDF:**
-            ```json
-            {context}
-            ```
-
-            **Texto extraído via OCR do PDF:**
-            ```json
-            {ocr_text}
-            ```
-
-            ### **Tarefa**
-            - Identifique e organize corretamente os dados de cada unidade imobiliária.
-            - Combine informações da tabela, contexto e OCR para garantir a extração correta.
-            - Caso algum campo esteja ausente, use `"Indeterminado"`, exceto onde especificado que deve ser `null`.
-            - Formate os valores corretamente.
-            - **Unidades sem valor de venda devem ser registradas no CSV com o valor `"Indisponível"`**.
-            - **O script deve ignorar informações irrelevantes, como cabeçalhos, rodapés e legendas desnecessárias**.
-
-            ### **Formato de saída esperado (JSON)**
-            ```json
-            [
-                {{
-                    "nome_empreendimento": "Nome do Empreendimento",
-                    "unidade": "204-205",
-                    "disponibilidade": "Disponível",
-                    "valor": "492.030,00"
-                }},
-                {{
-                    "nome_empreendimento": "Nome do Empreendimento",
-                    "unidade": "304-305",
-                    "disponibilidade": "Reservado",
-                    "valor": "499.590,00"
-                }}
-            ]
-            ```
-
-            ### **Regras IMPORTANTES:**
-            - O JSON **DEVE** seguir o formato exato acima, sem campos extras.
-            - **Colunas e seus formatos obrigatórios**:
-                - `"nome_empreendimento"`: Nome do empreendimento imobiliário. **(string)**
-                - `"unidade"`: Número da unidade. **(string)**
-                - `"disponibilidade"`: Estado da unidade (`"Disponível"`, `"Reservado"`, `"Permuta"`, ou `"Indeterminado"` caso não especificado). **(string)**
-                - `"valor"`: Valor do imóvel, **sempre no formato `000.000,00`** (exemplo: `"492.030,00"`).
-                  - Se não existir, preencha com `"Indisponível"`. **(string)**
-            - O JSON deve ser **100% válido** e **sem explicações adicionais**.
-            """,
-        input_variables=["tables", "context", "ocr_text"]
-    )
 
-    # Criar a cadeia do LangChain
-    chain = prompt | llm | parser
+def process_combined_with_langchain(extracted_data):
+    """
+    Usa LangChain + OpenAI para organizar tabelas, contexto e texto OCR já extraídos.
+    """
+    logging.info("Enviando dados extraídos para IA via LangChain...")
 
-    # Gerar resposta da IA
-    response = chain.invoke({
-        "tables": json.dumps(extracted_data["tables"], indent=2, ensure_ascii=False),
-        "context": json.dumps(extracted_data["context"], indent=2, ensure_ascii=False),
-        "ocr_text": json.dumps(extracted_data["ocr_text"], indent=2, ensure_ascii=False)
-    })
+    response = invoke_chunked(extracted_data, ["tables", "context", "ocr_text"])
 
     logging.info("✅ Dados processados com sucesso pela IA.")
     return response
@@ -0,0 +1,205 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import unicodedata
+from decimal import Decimal, InvalidOperation
+
+# Sinônimos de cabeçalho para cada coluna de saída. Pode ser estendido por um JSON
+# (mesmo formato) indicado em `PDF_TABLE_SYNONYMS`.
+HEADER_SYNONYMS = {
+    "unidade": ["unidade", "unid", "un", "apto", "apartamento", "apt", "ap", "sala", "loja", "lote", "casa",
+                "box", "numero", "n", "no", "nro"],
+    "disponibilidade": ["disponibilidade", "situacao", "status", "disp", "estado"],
+    "valor": ["valor", "preco", "valor total", "preco total", "total", "valor de venda", "preco de venda",
+              "valor a vista", "preco a vista", "a vista", "valor r", "preco r"],
+}
+
+# Valores normalizados de disponibilidade (prefixo do texto da célula → valor de saída)
+AVAILABILITY_VALUES = {
+    "disp": "Disponível",
+    "livre": "Disponível",
+    "a venda": "Disponível",
+    "reserv": "Reservado",
+    "permut": "Permuta",
+}
+
+# Textos que indicam unidade sem valor de venda
+UNAVAILABLE_MARKERS = {"", "-", "--", "x", "vendido", "vendida", "indisponivel", "bloqueado", "bloqueada"}
+
+# Confiança mínima (fração de linhas mapeadas sem ambiguidade) para dispensar a IA
+MIN_CONFIDENCE = float(os.getenv("PDF_TABLE_MIN_CONFIDENCE", 0.9))
+
+# Linhas iniciais de cada tabela em que o cabeçalho é procurado
+HEADER_SEARCH_ROWS = 5
+
+
+def _load_synonyms():
+    synonyms = {column: set(names) for column, names in HEADER_SYNONYMS.items()}
+    path = os.getenv("PDF_TABLE_SYNONYMS")
+    if path:
+        with open(path, "r", encoding="utf-8") as file:
+            for column, names in json.load(file).items():
+                synonyms.setdefault(column, set()).update(_normalize_text(name) for name in names)
+    return synonyms
+
+
+def _normalize_text(text):
+    """ Minúsculas, sem acentos, pontuação ou espaços repetidos. """
+    text = unicodedata.normalize("NFKD", str(text or "")).encode("ASCII", "ignore").decode().lower()
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text).split())
+
+
+_SYNONYMS = None
+
+
+def _synonyms():
+    global _SYNONYMS
+    if _SYNONYMS is None:
+        _SYNONYMS = _load_synonyms()
+    return _SYNONYMS
+
+
+def mapper_fingerprint():
+    """
+    Impressão da configuração do mapeamento (confiança mínima, sinônimos e valores normalizados),
+    usada na versão do cache das linhas: mudar `PDF_TABLE_MIN_CONFIDENCE` ou `PDF_TABLE_SYNONYMS`
+    invalida as linhas já mapeadas.
+    """
+    config = {
+        "min_confidence": MIN_CONFIDENCE,
+        "synonyms": {column: sorted(names) for column, names in _synonyms().items()},
+        "availability": AVAILABILITY_VALUES,
+        "unavailable": sorted(UNAVAILABLE_MARKERS),
+        "header_rows": HEADER_SEARCH_ROWS,
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+def _header_mapping(row):
+    """ Mapeia índices de coluna → campo de saída, se a linha parecer um cabeçalho. """
+    mapping = {}
+    for index, cell in enumerate(row):
+        name = _normalize_text(cell)
+        for column, names in _synonyms().items():
+            if name in names and column not in mapping.values():
+                mapping[index] = column
+                break
+
+    if "unidade" in mapping.values() and "valor" in mapping.values():
+        return mapping
+    return None
+
+
+def parse_brl(text):
+    """
+    Converte um valor em reais (`"R$ 492.030,00"`, `"492030"`, `"492.030"`) para `Decimal`.
+    Retorna `None` se o texto não for um valor monetário.
+    """
+    digits = re.sub(r"[^0-9.,]", "", str(text or ""))
+    if not re.search(r"\d", digits):
+        return None
+
+    if "," in digits:
+        digits = digits.replace(".", "").replace(",", ".")
+    elif digits.count(".") > 1 or re.search(r"\.\d{3}$", digits):
+        digits = digits.replace(".", "")
+
+    try:
+        return Decimal(digits)
+    except InvalidOperation:
+        return None
+
+
+def format_brl(value):
+    """ Formata um `Decimal` no padrão `000.000,00` usado no restante do pipeline. """
+    return f"{value:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def _normalize_availability(text):
+    name = _normalize_text(text)
+    for prefix, value in AVAILABILITY_VALUES.items():
+        if name.startswith(prefix):
+            return value
+    return "Indeterminado"
+
+
+def _map_row(row, mapping):
+    """ Converte uma linha da tabela; retorna `(linha, confiavel)` ou `(None, False)` se não for unidade. """
+    cells = {column: (row[index] if index < len(row) else "") for index, column in mapping.items()}
+
+    unit = " ".join(str(cells.get("unidade") or "").split())
+    if not unit or not re.search(r"\d", unit) or len(unit) > 20:
+        return None, False
+
+    raw_value = cells.get("valor") or ""
+    value = parse_brl(raw_value)
+    if value is not None and value > 0:
+        formatted_value, reliable = format_brl(value), True
+    else:
+        formatted_value = "Indisponível"
+        reliable = _normalize_text(raw_value) in UNAVAILABLE_MARKERS
+
+    availability = _normalize_availability(cells["disponibilidade"]) if "disponibilidade" in cells else "Indeterminado"
+
+    return {
+        "nome_empreendimento": "",
+        "unidade": unit,
+        "disponibilidade": availability,
+        "valor": formatted_value,
+    }, reliable
+
+
+def map_tables_to_rows(tables, min_confidence=None, pages=None):
+    """
+    Extrai as unidades das tabelas do pdfplumber **sem IA**, a partir dos cabeçalhos.
+
+    - Procura o cabeçalho nas primeiras linhas de cada tabela; tabelas sem cabeçalho
+      (continuação na página seguinte) reaproveitam o último cabeçalho com o mesmo número de colunas.
+    - Normaliza valores em reais e a disponibilidade.
+    - Com `pages` (página de origem de cada tabela), cada unidade recebe a sua `pagina`.
+
+    Retorna a lista de unidades, ou `None` quando a confiança (fração de linhas mapeadas sem
+    ambiguidade) fica abaixo de `min_confidence` — nesse caso o documento deve ir para a IA.
+    """
+    min_confidence = MIN_CONFIDENCE if min_confidence is None else min_confidence
+    rows = []
+    reliable_rows = 0
+    candidate_rows = 0
+    last_mapping, last_width = None, None
+
+    for table_index, table in enumerate(tables or []):
+        mapping, start = None, 0
+        for index, row in enumerate(table[:HEADER_SEARCH_ROWS]):
+            mapping = _header_mapping(row)
+            if mapping:
+                start = index + 1
+                break
+
+        if mapping is None and table and len(table[0]) == last_width:
+            mapping = last_mapping
+        if mapping is None:
+            # Tabela sem cabeçalho reconhecível: conta como linhas não mapeadas
+            candidate_rows += sum(1 for row in table if any(row))
+            continue
+
+        last_mapping, last_width = mapping, len(table[max(start - 1, 0)])
+
+        for row in table[start:]:
+            if not any(row) or _header_mapping(row):
+                continue
+            candidate_rows += 1
+            mapped, reliable = _map_row(row, mapping)
+            if mapped:
+                if pages:
+                    mapped["pagina"] = pages[table_index]
+                rows.append(mapped)
+                reliable_rows += reliable
+
+    confidence = reliable_rows / candidate_rows if candidate_rows else 0.0
+    logging.info(f"Mapeamento de tabelas: {len(rows)} unidade(s), confiança {confidence:.0%}")
+
+    if not rows or confidence < min_confidence:
+        return None
+    return rows